@@ -1,5 +1,6 @@
 from flask import request, jsonify
 from flask_restful import Resource
+from flask_jwt_extended import jwt_required
 from models.job import Job
 from services.job_service import JobService
 from services.routing_service import RoutingService
@@ -51,6 +52,15 @@ class JobResource(Resource):
         updated = job_service.update_job(job_id, data)
         if not updated:
             return {"message": "Failed to update job"}, 400
+        
+        # A started, finished or cancelled job moves the technician's later stops
+        if 'status' in data and job.get('technician_id'):
+            try:
+                etas = routing_service.refresh_etas(job['technician_id'])
+            except Exception as e:
+                print(f"Error refreshing ETAs: {e}")
+                etas = None
+            return {"message": "Job updated successfully", "etas": etas}, 200
         return {"message": "Job updated successfully"}, 200
     
     @admin_required
@@ -102,9 +112,16 @@ class JobListResource(Resource):
         # Create job
         job_id = job_service.create_job(data)
         
-        # Trigger route optimization if auto-assign is requested
+        # Insert the job into the current routes if auto-assign is requested
         if data.get('auto_assign', False):
-            routing_service.optimize_routes_for_date(data['scheduled_date'])
+            try:
+                assignment = routing_service.insert_job(job_id)
+            except Exception as e:
+                # The job exists either way; it stays pending for the next optimization
+                print(f"Error inserting job into routes: {e}")
+                return {"message": "Job created successfully", "job_id": job_id, "assignment": None,
+                        "error": "Job could not be inserted into the current routes"}, 201
+            return {"message": "Job created successfully", "job_id": job_id, "assignment": assignment}, 201
         
         return {"message": "Job created successfully", "job_id": job_id}, 201
 
@@ -1,39 +1,372 @@
-from flask import request, jsonify
+import json
+import os
+import time
+from datetime import datetime
+from flask import request, jsonify, Response, stream_with_context
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from services.routing_service import RoutingService
+from services.optimization_queue_service import OptimizationQueueService, QueueFullError, FINAL_STATUSES
 
 routing_service = RoutingService()
+optimization_queue = OptimizationQueueService()
+
+# Event streams poll the queue store this often, in seconds
+STREAM_POLL_INTERVAL = 0.25
+
+# Comment lines keep idle streams open through proxies, in seconds
+STREAM_KEEPALIVE_INTERVAL = 15
+
+# Longest date range of a batch optimization, in days
+MAX_BATCH_DAYS = int(os.environ.get('OPTIMIZATION_MAX_BATCH_DAYS', 14))
+
+# Most what-if scenarios compared in one request
+MAX_SCENARIOS = int(os.environ.get('OPTIMIZATION_MAX_SCENARIOS', 8))
+
+def _optimization_params(data, date_fields=('date',)):
+    """Validated optimize_routes_for_date arguments from a request body, or (None, error response)"""
+    # Validate required fields
+    for field in date_fields:
+        if not data or field not in data:
+            return None, ({"message": f"Missing required field: {field}"}, 400)
+    
+    # Optional parameters
+    params = {
+        **{field: data[field] for field in date_fields},
+        "technician_ids": data.get('technician_ids', None),  # If None, optimize for all technicians
+        "consider_traffic": data.get('consider_traffic', True),
+        "consider_weather": data.get('consider_weather', True),
+        "decompose": data.get('decompose', False),  # Solve geographic zones in parallel
+        "warm_start": data.get('warm_start', True),  # Start from the date's current assignments
+        "time_limit_seconds": data.get('time_limit_seconds', None),  # Search budget
+        "solution_limit": data.get('solution_limit', None),
+        "plateau_percent": data.get('plateau_percent', None),  # Stop when the objective improves less than this...
+        "plateau_seconds": data.get('plateau_seconds', None),  # ...within this many seconds
+        "sparse_neighbors": data.get('sparse_neighbors', None),  # Exact travel times to this many nearest jobs only
+        "memoize": data.get('memoize', True),  # Reuse the saved plan when nothing changed since
+        "exclude_technician_ids": data.get('exclude_technician_ids', None),  # Plan as if these were off
+        "overtime_minutes": data.get('overtime_minutes', 0),  # Longer shifts for everyone
+        "portfolio": data.get('portfolio', False)  # Race several search configurations in parallel
+    }
+    
+    # Validate search budget
+    for field in ('time_limit_seconds', 'solution_limit', 'plateau_percent', 'plateau_seconds'):
+        value = params[field]
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0):
+            return None, ({"message": f"{field} must be a positive number"}, 400)
+    if params['plateau_percent'] is not None and params['plateau_seconds'] is None:
+        return None, ({"message": "plateau_percent requires plateau_seconds"}, 400)
+    sparse_neighbors = params['sparse_neighbors']
+    if sparse_neighbors is not None and (isinstance(sparse_neighbors, bool) or not isinstance(sparse_neighbors, int)
+                                         or sparse_neighbors <= 0):
+        return None, ({"message": "sparse_neighbors must be a positive integer"}, 400)
+    excluded = params['exclude_technician_ids']
+    if excluded is not None and (not isinstance(excluded, list) or not all(isinstance(tech_id, str)
+                                                                            for tech_id in excluded)):
+        return None, ({"message": "exclude_technician_ids must be a list of technician IDs"}, 400)
+    overtime = params['overtime_minutes']
+    if isinstance(overtime, bool) or not isinstance(overtime, int) or not 0 <= overtime <= 8 * 60:
+        return None, ({"message": "overtime_minutes must be an integer from 0 to 480"}, 400)
+    if not isinstance(params['portfolio'], bool):
+        return None, ({"message": "portfolio must be true or false"}, 400)
+    
+    return params, None
+
+def _event_stream(optimization_id, last_event_id=0, cancel_on_disconnect=False):
+    """Server-Sent Events response relaying an optimization's events until it finishes"""
+    def generate():
+        last_id = last_event_id
+        last_sent = time.monotonic()
+        finished = False
+        try:
+            # Tell EventSource clients how soon to reconnect, in milliseconds
+            yield "retry: 2000\n\n"
+            while not finished:
+                for event in optimization_queue.get_events(optimization_id, last_id):
+                    last_id = event['id']
+                    finished = event['event'] in FINAL_STATUSES
+                    yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+                    last_sent = time.monotonic()
+                    if finished:
+                        break
+                
+                if finished:
+                    break
+                if time.monotonic() - last_sent >= STREAM_KEEPALIVE_INTERVAL:
+                    yield ": keep-alive\n\n"
+                    last_sent = time.monotonic()
+                time.sleep(STREAM_POLL_INTERVAL)
+        finally:
+            # A closed connection surfaces here as GeneratorExit on the next write
+            if not finished and cancel_on_disconnect:
+                optimization_queue.cancel(optimization_id)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 class OptimizeRoutesResource(Resource):
     @jwt_required()
     def post(self):
-        """Optimize routes for technicians"""
+        """Queue a route optimization for technicians"""
+        params, error = _optimization_params(request.get_json())
+        if error:
+            return error
+        
+        # Queue optimization; the solve runs on a background worker
+        try:
+            optimization_id = optimization_queue.enqueue(params)
+        except QueueFullError as e:
+            return {"message": str(e)}, 503
+        except Exception as e:
+            return {"message": f"Failed to queue route optimization: {str(e)}"}, 500
+        
+        return {
+            "message": "Route optimization queued",
+            "optimization_id": optimization_id,
+            "status": "queued"
+        }, 202
+
+class OptimizeRoutesBatchResource(Resource):
+    @jwt_required()
+    def post(self):
+        """Queue a route optimization for every date of a date range"""
+        params, error = _optimization_params(request.get_json(), date_fields=('start_date', 'end_date'))
+        if error:
+            return error
+        params.pop('decompose')  # Days are solved in parallel instead
+        params.pop('sparse_neighbors')  # Nearest jobs would mix up the days of the shared matrix
+        params.pop('memoize')  # Batches always solve
+        params.pop('exclude_technician_ids')  # What-if options are for single dates
+        params.pop('overtime_minutes')
+        params.pop('portfolio')  # Days already use the workers
+        
+        # Validate date range
+        try:
+            start_date = datetime.strptime(params['start_date'], '%Y-%m-%d')
+            end_date = datetime.strptime(params['end_date'], '%Y-%m-%d')
+        except (TypeError, ValueError):
+            return {"message": "start_date and end_date must be YYYY-MM-DD dates"}, 400
+        if end_date < start_date:
+            return {"message": "end_date must not be before start_date"}, 400
+        if (end_date - start_date).days + 1 > MAX_BATCH_DAYS:
+            return {"message": f"A batch can cover at most {MAX_BATCH_DAYS} days"}, 400
+        
+        try:
+            optimization_id = optimization_queue.enqueue(params)
+        except QueueFullError as e:
+            return {"message": str(e)}, 503
+        except Exception as e:
+            return {"message": f"Failed to queue route optimization: {str(e)}"}, 500
+        
+        return {
+            "message": "Route optimization queued",
+            "optimization_id": optimization_id,
+            "status": "queued"
+        }, 202
+
+class RoutingScenariosResource(Resource):
+    @jwt_required()
+    def post(self):
+        """Queue a side-by-side dry run of what-if scenarios for a date"""
         data = request.get_json()
+        scenarios = (data or {}).get('scenarios')
+        if not isinstance(scenarios, list) or not scenarios:
+            return {"message": "scenarios must be a non-empty list"}, 400
+        if len(scenarios) > MAX_SCENARIOS:
+            return {"message": f"At most {MAX_SCENARIOS} scenarios can be compared"}, 400
         
-        # Validate required fields
+        # Every scenario plans the base request's date
         if 'date' not in data:
             return {"message": "Missing required field: date"}, 400
         
-        # Optional parameters
-        technician_ids = data.get('technician_ids', None)  # If None, optimize for all technicians
-        consider_traffic = data.get('consider_traffic', True)
-        consider_weather = data.get('consider_weather', True)
+        # Each scenario overrides the base request's fields
+        base = {key: value for key, value in data.items() if key != 'scenarios'}
+        scenario_params = []
+        for position, scenario in enumerate(scenarios):
+            if not isinstance(scenario, dict):
+                return {"message": "Each scenario must be an object"}, 400
+            if 'date' in scenario:
+                return {"message": "Scenarios share the base request's date"}, 400
+            name = scenario.get('name', f"scenario {position + 1}")
+            params, error = _optimization_params({**base, **scenario})
+            if error:
+                return {"message": f"Scenario {name}: {error[0]['message']}"}, error[1]
+            params.pop('memoize')
+            params.pop('portfolio')  # Scenarios already use the workers
+            scenario_params.append({"name": name, "params": {k: v for k, v in params.items() if k != 'date'}})
+        if len({scenario['name'] for scenario in scenario_params}) != len(scenario_params):
+            return {"message": "Scenario names must be unique"}, 400
+        
+        try:
+            optimization_id = optimization_queue.enqueue({"date": base['date'], "scenarios": scenario_params})
+        except QueueFullError as e:
+            return {"message": str(e)}, 503
+        except Exception as e:
+            return {"message": f"Failed to queue routing scenarios: {str(e)}"}, 500
+        
+        return {
+            "message": "Routing scenarios queued",
+            "optimization_id": optimization_id,
+            "status": "queued"
+        }, 202
+
+class OptimizationCommitResource(Resource):
+    @jwt_required()
+    def post(self, optimization_id):
+        """Save the plan of one scenario of a finished scenario comparison"""
+        data = request.get_json(silent=True) or {}
+        job = optimization_queue.get_job(optimization_id)
+        if not job:
+            return {"message": "Optimization not found"}, 404
+        if job['status'] != 'completed':
+            return {"message": "Optimization has not completed", "status": job['status']}, 409
+        if 'scenarios' not in job['result']:
+            return {"message": "Only scenario comparisons are committed; other optimizations save their plan"}, 400
+        
+        scenario = next((scenario for scenario in job['result']['scenarios']
+                         if scenario['name'] == data.get('scenario')), None)
+        if scenario is None:
+            return {"message": "Scenario not found"}, 404
+        if 'error' in scenario:
+            return {"message": f"Scenario failed: {scenario['error']}"}, 409
+        
+        try:
+            assigned_jobs, skipped_jobs = routing_service.commit_assignments(scenario.get('assignments', []))
+        except Exception as e:
+            return {"message": f"Failed to commit scenario: {str(e)}"}, 500
+        
+        return {
+            "message": "Scenario committed",
+            "scenario": scenario['name'],
+            "assigned_jobs": assigned_jobs,
+            "skipped_jobs": skipped_jobs
+        }, 200
+
+class OptimizeRoutesStreamResource(Resource):
+    @jwt_required()
+    def post(self):
+        """Queue a route optimization and stream its improved solutions as Server-Sent Events"""
+        data = request.get_json()
+        params, error = _optimization_params(data)
+        if error:
+            return error
+        params['stream_routes'] = data.get('include_routes', False)  # Send partial routes with each solution
+        
+        try:
+            optimization_id = optimization_queue.enqueue(params)
+        except QueueFullError as e:
+            return {"message": str(e)}, 503
+        except Exception as e:
+            return {"message": f"Failed to queue route optimization: {str(e)}"}, 500
+        
+        # Nobody else knows the optimization ID, so a closed stream cancels it
+        response = _event_stream(optimization_id, cancel_on_disconnect=data.get('cancel_on_disconnect', True))
+        response.headers['X-Optimization-Id'] = optimization_id
+        return response
+
+class OptimizationEventsResource(Resource):
+    @jwt_required()
+    def get(self, optimization_id):
+        """Stream the events of a queued route optimization as Server-Sent Events"""
+        if not optimization_queue.get_job(optimization_id):
+            return {"message": "Optimization not found"}, 404
         
-        # Run optimization
+        # EventSource resends the last event ID it saw when it reconnects
+        last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id', 0))
         try:
-            result = routing_service.optimize_routes_for_date(
-                date=data['date'],
-                technician_ids=technician_ids,
-                consider_traffic=consider_traffic,
-                consider_weather=consider_weather
-            )
-            
+            last_event_id = int(last_event_id)
+        except ValueError:
+            return {"message": "Invalid Last-Event-ID"}, 400
+        
+        cancel_on_disconnect = request.args.get('cancel_on_disconnect', 'false').lower() == 'true'
+        return _event_stream(optimization_id, last_event_id, cancel_on_disconnect)
+
+class OptimizationCancelResource(Resource):
+    @jwt_required()
+    def post(self, optimization_id):
+        """Cancel a queued or running route optimization"""
+        data = request.get_json(silent=True) or {}
+        job = optimization_queue.get_job(optimization_id)
+        if not job:
+            return {"message": "Optimization not found"}, 404
+        
+        # Keep the best plan found so far instead of discarding it
+        accept_current = data.get('accept_current', False)
+        if not optimization_queue.cancel(optimization_id, accept_current):
+            return {"message": "Optimization has already finished", "status": job['status']}, 409
+        
+        return {
+            "message": "Cancellation requested",
+            "optimization_id": optimization_id,
+            "accept_current": accept_current
+        }, 202
+
+class OptimizationStatusResource(Resource):
+    @jwt_required()
+    def get(self, optimization_id):
+        """Get the status and progress of a queued route optimization"""
+        job = optimization_queue.get_job(optimization_id)
+        if not job:
+            return {"message": "Optimization not found"}, 404
+        
+        return {
+            "optimization_id": job['job_id'],
+            "status": job['status'],
+            "phase": job['phase'],
+            "progress": job['progress'],
+            "error": job['error'],
+            "created_at": job['created_at'],
+            "started_at": job['started_at'],
+            "finished_at": job['finished_at']
+        }, 200
+
+class OptimizationResultResource(Resource):
+    @jwt_required()
+    def get(self, optimization_id):
+        """Get the optimized routes of a finished route optimization"""
+        job = optimization_queue.get_job(optimization_id)
+        if not job:
+            return {"message": "Optimization not found"}, 404
+        
+        if job['status'] == 'failed':
+            return {"message": f"Failed to optimize routes: {job['error']}"}, 500
+        if job['status'] == 'cancelled':
+            return {"message": "Optimization was cancelled", "status": job['status']}, 409
+        if job['status'] != 'completed':
+            return {"message": "Optimization has not finished yet", "status": job['status']}, 409
+        
+        # Scenario comparisons have an unsaved plan per scenario
+        if 'scenarios' in job['result']:
+            return {
+                "message": "Scenarios solved",
+                "date": job['result']['date'],
+                "comparison": job['result']['comparison'],
+                "scenarios": job['result']['scenarios'],
+                "metrics": job['result']['metrics']
+            }, 200
+        
+        # Batch optimizations have a plan per day
+        if 'days' in job['result']:
             return {
                 "message": "Routes optimized successfully",
-                "optimized_routes": result['routes'],
-                "metrics": result['metrics']
+                "days": job['result']['days'],
+                "metrics": job['result']['metrics']
             }, 200
-            
-        except Exception as e:
-            return {"message": f"Failed to optimize routes: {str(e)}"}, 500
+        
+        return {
+            "message": "Routes optimized successfully",
+            "optimized_routes": job['result']['routes'],
+            "metrics": job['result']['metrics']
+        }, 200
+
+class RoutingResultCacheResource(Resource):
+    @jwt_required()
+    def get(self):
+        """Get hit-rate statistics of the optimization result cache"""
+        return routing_service.result_cache.stats(), 200
+    
+    @jwt_required()
+    def delete(self):
+        """Drop stored optimization results, for one date (?date=YYYY-MM-DD) or all"""
+        removed = routing_service.result_cache.invalidate(request.args.get('date'))
+        return {"message": "Optimization results invalidated", "removed": removed}, 200
@@ -2,9 +2,11 @@ from flask import request, jsonify
 from flask_restful import Resource
 from models.technician import Technician
 from services.technician_service import TechnicianService
+from services.routing_service import RoutingService
 from middleware.auth_middleware import token_required, admin_required, technician_required
 
 technician_service = TechnicianService()
+routing_service = RoutingService()
 
 class TechnicianResource(Resource):
     @token_required
@@ -102,7 +104,14 @@ class TechnicianLocationResource(Resource):
         updated = technician_service.update_technician_location(request.user_id, data['location'])
         if not updated:
             return {"message": "Failed to update location"}, 400
-        return {"message": "Location updated successfully"}, 200
+        
+        # Move the ETAs of today's remaining stops along with the technician
+        try:
+            etas = routing_service.refresh_etas(request.user_id, data['location'])
+        except Exception as e:
+            print(f"Error refreshing ETAs: {e}")
+            etas = None
+        return {"message": "Location updated successfully", "etas": etas}, 200
 
 class TechnicianStatusResource(Resource):
     @technician_required
@@ -12,7 +12,18 @@ from api.resources.technician import (
 from api.resources.job import JobResource, JobListResource, JobAssignmentResource
 from api.resources.customer import CustomerResource, CustomerListResource, CustomerProfileResource
 from api.resources.auth import LoginResource, RegisterResource, RefreshTokenResource
-from api.resources.routing import OptimizeRoutesResource
+from api.resources.routing import (
+    OptimizeRoutesResource,
+    OptimizeRoutesStreamResource,
+    OptimizeRoutesBatchResource,
+    OptimizationStatusResource,
+    OptimizationResultResource,
+    OptimizationEventsResource,
+    OptimizationCancelResource,
+    RoutingResultCacheResource,
+    RoutingScenariosResource,
+    OptimizationCommitResource
+)
 
 def register_routes(app):
     # Create API
@@ -43,6 +54,15 @@ def register_routes(app):
     
     # Routing routes
     api.add_resource(OptimizeRoutesResource, '/routing/optimize')
+    api.add_resource(OptimizationStatusResource, '/routing/optimizations/<string:optimization_id>')
+    api.add_resource(OptimizationResultResource, '/routing/optimizations/<string:optimization_id>/result')
+    api.add_resource(OptimizeRoutesStreamResource, '/routing/optimize/stream')
+    api.add_resource(OptimizeRoutesBatchResource, '/routing/optimize/batch')
+    api.add_resource(OptimizationEventsResource, '/routing/optimizations/<string:optimization_id>/events')
+    api.add_resource(OptimizationCancelResource, '/routing/optimizations/<string:optimization_id>/cancel')
+    api.add_resource(RoutingResultCacheResource, '/routing/result-cache')
+    api.add_resource(RoutingScenariosResource, '/routing/scenarios')
+    api.add_resource(OptimizationCommitResource, '/routing/optimizations/<string:optimization_id>/commit')
     
     # Register blueprint
     app.register_blueprint(api_bp)
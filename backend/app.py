@@ -1,5 +1,5 @@
 import os
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
 
@@ -9,6 +9,7 @@ from middleware.error_middleware import ErrorHandler
 
 # Import routes
 from api.routes import register_routes
+from services.metrics_service import metrics_registry
 
 # Load environment variables
 load_dotenv()
@@ -43,6 +44,11 @@ def create_app(test_config=None):
     def health_check():
         return jsonify({"status": "healthy"})
     
+    # Prometheus metrics endpoint
+    @app.route('/metrics')
+    def metrics():
+        return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+    
     # JWT error handlers
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
@@ -0,0 +1,56 @@
+"""Benchmark zone decomposition against the monolithic solve.
+
+Reports wall time, total travel minutes and assigned jobs for both modes
+under the same per-solve time limit.
+Run from the backend directory:
+
+    python -m benchmarks.bench_decomposition
+    python -m benchmarks.bench_decomposition --jobs 200 1000 --time-limit 10 --skip-monolithic-above 1000
+"""
+import argparse
+import time
+from benchmarks.bench_transit_callbacks import random_fleet
+from services.decomposition_service import DecompositionService
+from services.routing_service import RoutingService
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[200, 1000, 3000])
+    parser.add_argument('--jobs-per-technician', type=int, default=4)
+    parser.add_argument('--time-limit', type=int, default=30)
+    parser.add_argument('--zone-size', type=int, default=150)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--skip-monolithic-above', type=int, default=None)
+    args = parser.parse_args()
+
+    service = RoutingService()
+    service.google_maps_api_key = None
+    decomposition = DecompositionService(max_workers=args.workers, zone_size=args.zone_size)
+    search_parameters = service._default_search_parameters()
+    search_parameters.time_limit.seconds = args.time_limit
+
+    print(f"{'jobs':>6} {'mode':>11} {'zones':>6} {'wall (s)':>9} {'travel min':>11} {'assigned':>9}")
+    for num_jobs in args.jobs:
+        technicians, jobs = random_fleet(max(1, num_jobs // args.jobs_per_technician), num_jobs, spread=0.3)
+        distance_matrix, _ = service._build_distance_matrix(jobs, technicians)
+        data = service._create_data_model(distance_matrix, jobs, technicians)
+
+        if args.skip_monolithic_above is None or num_jobs <= args.skip_monolithic_above:
+            start = time.perf_counter()
+            solution = service._solve_vrp(data, search_parameters)
+            sequences = service._extract_sequences(solution, data) if solution else []
+            elapsed = time.perf_counter() - start
+            assigned = sum(len(sequence) for sequence in sequences)
+            travel = decomposition.total_travel_minutes(data, sequences) if sequences else "-"
+            print(f"{num_jobs:>6} {'monolithic':>11} {1:>6} {elapsed:9.1f} {travel:>11} {assigned:>9}")
+
+        start = time.perf_counter()
+        sequences, _ = decomposition.solve(data, jobs, technicians, search_parameters)
+        elapsed = time.perf_counter() - start
+        zones = len(decomposition.build_zones(jobs, technicians)['zones'])
+        assigned = sum(len(sequence) for sequence in sequences)
+        travel = decomposition.total_travel_minutes(data, sequences)
+        print(f"{num_jobs:>6} {'decomposed':>11} {zones:>6} {elapsed:9.1f} {travel:>11} {assigned:>9}")
+
+if __name__ == '__main__':
+    main()
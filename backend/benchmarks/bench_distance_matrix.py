@@ -0,0 +1,71 @@
+"""Benchmark the vectorized haversine travel-time matrix against the old loop.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_distance_matrix
+    python -m benchmarks.bench_distance_matrix --sizes 100 1000 --skip-legacy-above 1000
+"""
+import argparse
+import random
+import time
+import numpy as np
+from haversine import haversine
+from utils.geo_utils import locations_to_arrays, haversine_time_matrix
+
+def random_locations(n, seed=42, center=(14.5995, 120.9842), spread=0.25):
+    """Generate n random locations around a city center"""
+    rng = random.Random(seed)
+    return [
+        {"lat": center[0] + rng.uniform(-spread, spread), "lng": center[1] + rng.uniform(-spread, spread)}
+        for _ in range(n)
+    ]
+
+def legacy_haversine_matrix(locations):
+    """The original pure-Python double loop from RoutingService"""
+    n = len(locations)
+    distance_matrix = [[0 for _ in range(n)] for _ in range(n)]
+    for i in range(n):
+        for j in range(i+1, n):
+            point1 = (locations[i]['lat'], locations[i]['lng'])
+            point2 = (locations[j]['lat'], locations[j]['lng'])
+            distance_km = haversine(point1, point2)
+            time_minutes = round(distance_km / 40 * 60)
+            distance_matrix[i][j] = time_minutes
+            distance_matrix[j][i] = time_minutes
+    return distance_matrix
+
+def vectorized_haversine_matrix(locations):
+    """The vectorized builder used by RoutingService"""
+    lats, lngs = locations_to_arrays(locations)
+    return haversine_time_matrix(lats, lngs)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 5000])
+    parser.add_argument('--skip-legacy-above', type=int, default=None,
+                        help="Don't run the slow loop for sizes larger than this")
+    args = parser.parse_args()
+
+    print(f"{'locations':>10} {'legacy (s)':>12} {'vectorized (s)':>15} {'speedup':>9} {'MB':>8} {'identical':>10}")
+    for n in args.sizes:
+        locations = random_locations(n)
+        vectorized, vectorized_time = timed(vectorized_haversine_matrix, locations)
+
+        if args.skip_legacy_above is not None and n > args.skip_legacy_above:
+            legacy_time, identical = None, "-"
+        else:
+            legacy, legacy_time = timed(legacy_haversine_matrix, locations)
+            identical = str(np.array_equal(np.asarray(legacy, dtype=np.int32), vectorized))
+
+        legacy_col = f"{legacy_time:12.3f}" if legacy_time is not None else f"{'skipped':>12}"
+        speedup_col = f"{legacy_time / vectorized_time:8.1f}x" if legacy_time is not None else f"{'-':>9}"
+        size_mb = vectorized.nbytes / (1024 * 1024)
+        print(f"{n:>10} {legacy_col} {vectorized_time:15.4f} {speedup_col} {size_mb:8.1f} {identical:>10}")
+
+if __name__ == '__main__':
+    main()
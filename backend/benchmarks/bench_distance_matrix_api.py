@@ -0,0 +1,81 @@
+"""Benchmark the batched Distance Matrix provider against one request per pair.
+
+Runs entirely offline against benchmarks.fake_distance_matrix_server.
+Run from the backend directory:
+
+    python -m benchmarks.bench_distance_matrix_api
+    python -m benchmarks.bench_distance_matrix_api --sizes 30 100 300 --latency 0.02 --skip-legacy-above 100
+"""
+import argparse
+import time
+import numpy as np
+import requests
+from benchmarks.bench_distance_matrix import random_locations
+from benchmarks.fake_distance_matrix_server import FakeDistanceMatrixServer
+from services.distance_matrix_service import DistanceMatrixService
+
+def legacy_pairwise_matrix(locations, url, consider_traffic=True):
+    """The original one-origin, one-destination sequential loop"""
+    n = len(locations)
+    distance_matrix = [[0 for _ in range(n)] for _ in range(n)]
+    for i in range(n):
+        for j in range(i+1, n):
+            params = {
+                "origins": f"{locations[i]['lat']},{locations[i]['lng']}",
+                "destinations": f"{locations[j]['lat']},{locations[j]['lng']}",
+                "key": "fake"
+            }
+            if consider_traffic:
+                params["departure_time"] = "now"
+                params["traffic_model"] = "best_guess"
+
+            response = requests.get(url, params=params)
+            if response.status_code == 200:
+                result = response.json()
+                if result["status"] == "OK":
+                    element = result["rows"][0]["elements"][0]
+                    duration = element["duration"]["value"]
+                    if consider_traffic and "duration_in_traffic" in element:
+                        duration = element["duration_in_traffic"]["value"]
+                    distance_matrix[i][j] = round(duration / 60)
+                    distance_matrix[j][i] = round(duration / 60)
+    return distance_matrix
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[30, 100, 300])
+    parser.add_argument('--latency', type=float, default=0.02, help="Simulated seconds per API round trip")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--skip-legacy-above', type=int, default=100)
+    args = parser.parse_args()
+
+    with FakeDistanceMatrixServer(latency=args.latency) as server:
+        print(f"{'locations':>10} {'legacy req':>11} {'legacy (s)':>11} {'batched req':>12} "
+              f"{'batched (s)':>12} {'speedup':>9} {'matches':>8}")
+        for n in args.sizes:
+            locations = random_locations(n)
+
+            legacy, legacy_requests, legacy_time = None, None, None
+            if n <= args.skip_legacy_above:
+                server.reset_counts()
+                start = time.perf_counter()
+                legacy = legacy_pairwise_matrix(locations, server.url)
+                legacy_time = time.perf_counter() - start
+                legacy_requests = server.request_count
+
+            server.reset_counts()
+            service = DistanceMatrixService(api_key="fake", base_url=server.url, max_workers=args.workers)
+            start = time.perf_counter()
+            batched = service.build_matrix(locations)
+            batched_time = time.perf_counter() - start
+
+            matches = np.array_equal(batched, np.asarray(legacy, dtype=np.int32)) if legacy is not None else "-"
+
+            legacy_req_col = f"{legacy_requests:>11}" if legacy_requests is not None else f"{'skipped':>11}"
+            legacy_time_col = f"{legacy_time:11.2f}" if legacy_time is not None else f"{'-':>11}"
+            speedup_col = f"{legacy_time / batched_time:8.1f}x" if legacy_time is not None else f"{'-':>9}"
+            print(f"{n:>10} {legacy_req_col} {legacy_time_col} {server.request_count:>12} "
+                  f"{batched_time:12.2f} {speedup_col} {str(matches):>8}")
+
+if __name__ == '__main__':
+    main()
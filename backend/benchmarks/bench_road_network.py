@@ -0,0 +1,61 @@
+"""Benchmark travel-time matrices from the local road network.
+
+Builds matrices for growing numbers of scenario locations on a road graph
+(the bundled sample by default) and compares them with the straight-line
+haversine estimate. Reports build time, shortest-path searches run,
+locations off the network and how far the two estimates differ.
+Run from the backend directory:
+
+    python -m benchmarks.bench_road_network
+    python -m benchmarks.bench_road_network --locations 500 2000 --graph path/to/graph.json
+"""
+import argparse
+import os
+import time
+import numpy as np
+from benchmarks.scenarios import generate_scenario
+from services.routing_service import RoutingService
+from services.road_network_service import RoadNetworkService
+
+SAMPLE_GRAPH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data",
+                            "sample_road_network.json")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--locations', type=int, nargs='+', default=[100, 1000, 3000])
+    parser.add_argument('--graph', default=SAMPLE_GRAPH)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    service = RoutingService()
+    road_network = RoadNetworkService(graph_path=args.graph)
+    start = time.perf_counter()
+    road_network._load()
+    print(f"Graph loaded in {time.perf_counter() - start:.2f} s\n")
+
+    print(f"{'locations':>10} {'road (s)':>9} {'searches':>9} {'haversine (s)':>14} {'off-network':>12} "
+          f"{'road/haversine':>15} {'asymmetric':>11}")
+    for num_locations in args.locations:
+        scenario = generate_scenario(max(1, num_locations // 10), num_locations - max(1, num_locations // 10),
+                                     seed=args.seed)
+        locations = [tech['location'] for tech in scenario['technicians']] + \
+                    [job['location'] for job in scenario['jobs']]
+
+        searches_before = road_network.search_count
+        start = time.perf_counter()
+        road = road_network.build_matrix(locations)
+        road_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        haversine = service._build_haversine_distance_matrix(locations)
+        haversine_seconds = time.perf_counter() - start
+
+        _, access_minutes = road_network.snap(locations)
+        routed = (road > 0) & (haversine > 0)
+        ratio = np.median(road[routed] / haversine[routed]) if routed.any() else float('nan')
+        print(f"{num_locations:>10} {road_seconds:>9.3f} {road_network.search_count - searches_before:>9} "
+              f"{haversine_seconds:>14.3f} {int(np.isinf(access_minutes).sum()):>12} {ratio:>15.2f} "
+              f"{(road != road.T).mean():>11.1%}")
+
+if __name__ == '__main__':
+    main()
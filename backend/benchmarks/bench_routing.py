@@ -0,0 +1,155 @@
+"""Benchmark the RoutingService pipeline on seeded synthetic scenarios.
+
+Each scenario runs the matrix build, data model build, solve and solution
+processing directly on in-memory inputs (no MongoDB, haversine travel
+times) in a fresh process, and the report is written as JSON so runs from
+different commits can be compared.
+Run from the backend directory:
+
+    python -m benchmarks.bench_routing
+    python -m benchmarks.bench_routing --scenarios small medium --time-limit 5 --output before.json
+    python -m benchmarks.bench_routing --technicians 40 --jobs 160 --seed 3
+    python -m benchmarks.bench_routing --output after.json --compare before.json
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.scenarios import PRESETS, generate_scenario
+
+def _measure(phases, name, func, *args):
+    """Run one phase, recording wall time, CPU time and peak Python memory"""
+    tracemalloc.reset_peak()
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    result = func(*args)
+    phases[name] = {
+        "wall_seconds": round(time.perf_counter() - wall_start, 4),
+        "cpu_seconds": round(time.process_time() - cpu_start, 4),
+        "peak_python_mb": round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+    }
+    return result
+
+def run_scenario(name, num_technicians, num_jobs, seed, time_limit):
+    """Run the pipeline on one scenario; meant to be called in a fresh process"""
+    from services.routing_service import RoutingService
+
+    scenario = generate_scenario(num_technicians, num_jobs, seed=seed)
+    technicians, jobs = scenario['technicians'], scenario['jobs']
+
+    service = RoutingService()
+    service.google_maps_api_key = None
+    search_parameters = service._search_parameters(time_limit_seconds=time_limit)
+
+    phases = {}
+    tracemalloc.start()
+    distance_matrix, locations = _measure(phases, "matrix", service._build_distance_matrix, jobs, technicians, False)
+    data = _measure(phases, "model", service._create_data_model, distance_matrix, jobs, technicians)
+    solution = _measure(phases, "solve", service._solve_vrp, data, search_parameters)
+    routes = _measure(phases, "process", service._process_solution, solution, data, jobs, technicians, locations)
+    tracemalloc.stop()
+
+    assigned = sum(len(route['jobs']) for route in routes)
+    return {
+        "name": name,
+        "seed": seed,
+        "technicians": num_technicians,
+        "jobs": num_jobs,
+        "time_limit_seconds": time_limit,
+        "phases": phases,
+        "total_wall_seconds": round(sum(phase['wall_seconds'] for phase in phases.values()), 4),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "objective": solution.ObjectiveValue() if solution else None,
+        "stop_reason": solution.solve_metrics['stop_reason'] if solution else "no_solution",
+        "assigned_jobs": assigned,
+        "assigned_ratio": round(assigned / num_jobs, 4) if num_jobs else 1.0
+    }
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+def _environment():
+    import numpy
+    import ortools
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": numpy.__version__,
+        "ortools": ortools.__version__
+    }
+
+def compare(report, baseline):
+    """Print wall time and objective changes against a baseline report"""
+    baseline_runs = {(run['name'], run['seed']): run for run in baseline['scenarios']}
+    print(f"\nAgainst {baseline.get('commit') or 'baseline'}:")
+    print(f"{'scenario':>12} {'phase':>8} {'before (s)':>11} {'after (s)':>10} {'change':>8}")
+    for run in report['scenarios']:
+        before = baseline_runs.get((run['name'], run['seed']))
+        if not before:
+            continue
+        for phase, timing in run['phases'].items():
+            previous = before['phases'].get(phase)
+            if not previous:
+                continue
+            change = (timing['wall_seconds'] / previous['wall_seconds'] - 1) * 100 if previous['wall_seconds'] else 0
+            print(f"{run['name']:>12} {phase:>8} {previous['wall_seconds']:>11.3f} {timing['wall_seconds']:>10.3f} "
+                  f"{change:>7.1f}%")
+        print(f"{run['name']:>12} {'objective':>8} {str(before['objective']):>11} {str(run['objective']):>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(PRESETS), default=["small", "medium", "large"])
+    parser.add_argument('--technicians', type=int, help="Custom scenario instead of the presets")
+    parser.add_argument('--jobs', type=int, help="Custom scenario instead of the presets")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--time-limit', type=float, default=10)
+    parser.add_argument('--output', default="routing_benchmark.json")
+    parser.add_argument('--compare', help="Earlier report to compare against")
+    args = parser.parse_args()
+
+    if args.technicians or args.jobs:
+        if not (args.technicians and args.jobs):
+            parser.error("--technicians and --jobs go together")
+        scenarios = [(f"{args.technicians}x{args.jobs}", args.technicians, args.jobs)]
+    else:
+        scenarios = [(name, *PRESETS[name]) for name in args.scenarios]
+
+    runs = []
+    print(f"{'scenario':>12} {'matrix':>8} {'model':>8} {'solve':>8} {'process':>8} {'rss MB':>8} "
+          f"{'objective':>10} {'assigned':>9}")
+    for name, num_technicians, num_jobs in scenarios:
+        # A fresh process per scenario keeps peak RSS attributable to it
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            run = executor.submit(run_scenario, name, num_technicians, num_jobs, args.seed, args.time_limit).result()
+        runs.append(run)
+        phases = run['phases']
+        print(f"{name:>12} {phases['matrix']['wall_seconds']:>8.3f} {phases['model']['wall_seconds']:>8.3f} "
+              f"{phases['solve']['wall_seconds']:>8.2f} {phases['process']['wall_seconds']:>8.3f} "
+              f"{run['peak_rss_mb']:>8.1f} {str(run['objective']):>10} {run['assigned_ratio']:>9.1%}")
+
+    report = {
+        "commit": _git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": _environment(),
+        "scenarios": runs
+    }
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"\nReport written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(report, json.load(baseline_file))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Benchmark allowed-vehicle skill constraints on a mixed-skill fleet.
+
+The same skill rules are enforced two ways: with per-skill capacity
+dimensions (technicians without a skill have zero capacity for it) and with
+the skill index's allowed-vehicle constraints. Reports the objective after
+the time limit and how long each search took to get within 1% of it.
+Run from the backend directory:
+
+    python -m benchmarks.bench_skills
+    python -m benchmarks.bench_skills --jobs 120 400 --time-limit 10
+"""
+import argparse
+import random
+from benchmarks.bench_transit_callbacks import random_fleet
+from services.routing_service import RoutingService
+from utils.search_utils import SearchTracker
+
+SKILLS = ["fiber_installation", "cable_installation", "router_setup", "troubleshooting"]
+
+def mixed_skill_fleet(num_technicians, num_jobs, seed=7):
+    """Random fleet where each technician has two of SKILLS and each job needs one"""
+    technicians, jobs = random_fleet(num_technicians, num_jobs, seed=seed)
+    rng = random.Random(seed)
+    for tech in technicians:
+        tech['skills'] = rng.sample(SKILLS, 2)
+    for job in jobs:
+        job['service_type'] = rng.choice(SKILLS)
+    return technicians, jobs
+
+def capacity_routing_model(service, data, technicians):
+    """The same model, with skills enforced through one capacity dimension per skill"""
+    unrestricted = dict(data, allowed_vehicles=[None] * len(data['allowed_vehicles']))
+    manager, routing = service._build_routing_model(unrestricted)
+
+    num_jobs = len(data['job_requirements']) - data['num_vehicles']
+    for skill in sorted({skill for requirement in data['job_requirements'] for skill in requirement}):
+        demands = [1 if skill in requirement else 0 for requirement in data['job_requirements']]
+        capacities = [num_jobs if skill in tech.get('skills', []) else 0 for tech in technicians]
+        callback_index = routing.RegisterUnaryTransitVector(demands)
+        routing.AddDimensionWithVehicleCapacity(callback_index, 0, capacities, True, f"Skill_{skill}")
+    return manager, routing
+
+def run(routing, search_parameters):
+    tracker = SearchTracker(routing)
+    tracker.attach()
+    solution = routing.SolveWithParameters(search_parameters)
+    if not solution:
+        return None, None
+    objective = solution.ObjectiveValue()
+    converged = next(seconds for seconds, value in tracker.trajectory if value <= objective * 1.01)
+    return objective, converged
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[120, 400])
+    parser.add_argument('--jobs-per-technician', type=int, default=4)
+    parser.add_argument('--time-limit', type=int, default=10)
+    args = parser.parse_args()
+
+    service = RoutingService()
+    service.google_maps_api_key = None
+    search_parameters = service._default_search_parameters()
+    search_parameters.time_limit.seconds = args.time_limit
+
+    print(f"{'jobs':>6} {'version':>15} {'objective':>10} {'within 1% (s)':>14}")
+    for num_jobs in args.jobs:
+        technicians, jobs = mixed_skill_fleet(max(1, num_jobs // args.jobs_per_technician), num_jobs)
+        distance_matrix, _ = service._build_distance_matrix(jobs, technicians)
+        data = service._create_data_model(distance_matrix, jobs, technicians)
+
+        for version, builder in (("capacity", lambda: capacity_routing_model(service, data, technicians)),
+                                 ("allowed-vehicle", lambda: service._build_routing_model(data))):
+            _, routing = builder()
+            objective, converged = run(routing, search_parameters)
+            converged = f"{converged:.2f}" if converged is not None else "-"
+            print(f"{num_jobs:>6} {version:>15} {str(objective):>10} {converged:>14}")
+
+if __name__ == '__main__':
+    main()
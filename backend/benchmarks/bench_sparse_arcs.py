@@ -0,0 +1,87 @@
+"""Benchmark the k-nearest-neighbor sparse arc model against the dense one.
+
+Each scenario is solved both ways in a fresh process under the same time
+limit. Reports how many location pairs needed a travel-time lookup (what
+the Distance Matrix API would be asked for), phase times, peak Python
+memory and RSS, total travel minutes (without sparse penalties) and how
+many routed arcs fell outside the candidate set.
+Run from the backend directory:
+
+    python -m benchmarks.bench_sparse_arcs
+    python -m benchmarks.bench_sparse_arcs --jobs 500 2000 --neighbors 10 20 --time-limit 20
+"""
+import argparse
+import multiprocessing
+import resource
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.bench_routing import _measure
+from benchmarks.scenarios import generate_scenario
+
+def run_mode(num_jobs, jobs_per_technician, neighbors, time_limit, seed):
+    """Solve one scenario densely (neighbors=None) or sparsely; meant to run in a fresh process"""
+    from services.decomposition_service import DecompositionService
+    from services.routing_service import RoutingService
+
+    scenario = generate_scenario(max(1, num_jobs // jobs_per_technician), num_jobs, seed=seed)
+    technicians, jobs = scenario['technicians'], scenario['jobs']
+    service = RoutingService()
+    service.google_maps_api_key = None
+    search_parameters = service._search_parameters(time_limit_seconds=time_limit)
+
+    phases = {}
+    tracemalloc.start()
+    if neighbors:
+        candidate_arcs = _measure(phases, "arcs", service._candidate_arcs, jobs, technicians, neighbors)
+        distance_matrix, _ = _measure(phases, "matrix", service._build_sparse_distance_matrix, jobs, technicians,
+                                      candidate_arcs, False)
+        lookups = int(candidate_arcs.sum()) // 2
+    else:
+        candidate_arcs = None
+        distance_matrix, _ = _measure(phases, "matrix", service._build_distance_matrix, jobs, technicians, False)
+        lookups = len(distance_matrix) * (len(distance_matrix) - 1) // 2
+    data = _measure(phases, "model", service._create_data_model, distance_matrix, jobs, technicians,
+                    scenario['date'], candidate_arcs)
+    solution = _measure(phases, "solve", service._solve_vrp, data, search_parameters)
+    tracemalloc.stop()
+
+    sequences = service._extract_sequences(solution, data) if solution else []
+    return {
+        "lookups": lookups,
+        "phases": phases,
+        "peak_python_mb": max(phase['peak_python_mb'] for phase in phases.values()),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "travel_minutes": DecompositionService().total_travel_minutes(data, sequences) if sequences else None,
+        "assigned": sum(len(sequence) for sequence in sequences),
+        "non_candidate_arcs": (service._count_non_candidate_arcs(sequences, candidate_arcs)
+                               if candidate_arcs is not None and sequences else 0)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[500, 1000, 2000])
+    parser.add_argument('--jobs-per-technician', type=int, default=5)
+    parser.add_argument('--neighbors', type=int, nargs='+', default=[20])
+    parser.add_argument('--time-limit', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'jobs':>6} {'mode':>7} {'lookups':>9} {'matrix (s)':>11} {'model (s)':>10} {'solve (s)':>10} "
+          f"{'py MB':>7} {'rss MB':>7} {'travel min':>11} {'assigned':>9} {'off-arcs':>9}")
+    for num_jobs in args.jobs:
+        for neighbors in [None] + args.neighbors:
+            # A fresh process per run keeps peak RSS attributable to it
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                run = executor.submit(run_mode, num_jobs, args.jobs_per_technician, neighbors, args.time_limit,
+                                      args.seed).result()
+            phases = run['phases']
+            matrix_seconds = phases['matrix']['wall_seconds'] + phases.get('arcs', {}).get('wall_seconds', 0)
+            mode = f"k={neighbors}" if neighbors else "dense"
+            print(f"{num_jobs:>6} {mode:>7} {run['lookups']:>9} {matrix_seconds:>11.3f} "
+                  f"{phases['model']['wall_seconds']:>10.3f} {phases['solve']['wall_seconds']:>10.2f} "
+                  f"{run['peak_python_mb']:>7.1f} {run['peak_rss_mb']:>7.1f} {str(run['travel_minutes']):>11} "
+                  f"{run['assigned']:>9} {run['non_candidate_arcs']:>9}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark Python transit callbacks against precomputed native transit matrices.
+
+Both models are solved with the same search parameters and time limit; the
+number of local-search neighbors accepted and branches explored shows how
+much search each version completes in that budget.
+Run from the backend directory:
+
+    python -m benchmarks.bench_transit_callbacks
+    python -m benchmarks.bench_transit_callbacks --jobs 60 240 --time-limit 5
+"""
+import argparse
+import random
+import time
+from ortools.constraint_solver import pywrapcp
+from services.routing_service import (
+    RoutingService,
+    MINUTES_PER_DAY,
+    MAX_ROUTE_MINUTES,
+    MAX_WAITING_MINUTES
+)
+
+def random_fleet(num_technicians, num_jobs, seed=7, center=(14.5995, 120.9842), spread=0.15):
+    """Generate technicians and pending jobs scattered around a city center"""
+    rng = random.Random(seed)
+
+    def location():
+        return {"lat": center[0] + rng.uniform(-spread, spread), "lng": center[1] + rng.uniform(-spread, spread)}
+
+    technicians = [
+        {"_id": f"tech{i}", "name": f"Technician {i}", "status": "available", "skills": [],
+         "location": location(), "working_hours": {}}
+        for i in range(num_technicians)
+    ]
+    jobs = []
+    for i in range(num_jobs):
+        start_hour = rng.choice([9, 9, 11, 13])
+        jobs.append({
+            "_id": f"job{i}", "customer_id": f"customer{i}", "service_type": "repair",
+            "location": location(), "status": "pending", "estimated_duration": rng.choice([30, 45, 60]),
+            "scheduled_time_window": {"start": f"{start_hour:02d}:00", "end": "17:00"}
+        })
+    return technicians, jobs
+
+def legacy_routing_model(data):
+    """The same model, with per-arc Python callbacks instead of native matrices"""
+    manager = pywrapcp.RoutingIndexManager(
+        len(data['distance_matrix']), data['num_vehicles'], data['starts'], data['ends']
+    )
+    routing = pywrapcp.RoutingModel(manager)
+    distance_matrix = data['distance_matrix'].tolist()
+    service_times = data['service_times']
+
+    def distance_callback(from_index, to_index):
+        from_node = manager.IndexToNode(from_index)
+        to_node = manager.IndexToNode(to_index)
+        return distance_matrix[from_node][to_node]
+
+    def time_callback(from_index, to_index):
+        from_node = manager.IndexToNode(from_index)
+        to_node = manager.IndexToNode(to_index)
+        return distance_matrix[from_node][to_node] + service_times[from_node]
+
+    routing.SetArcCostEvaluatorOfAllVehicles(routing.RegisterTransitCallback(distance_callback))
+    routing.AddDimension(routing.RegisterTransitCallback(time_callback),
+                         MAX_WAITING_MINUTES, MINUTES_PER_DAY, False, 'Time')
+    time_dimension = routing.GetDimensionOrDie('Time')
+    for location_idx in range(data['num_vehicles'], len(data['time_windows'])):
+        time_window = data['time_windows'][location_idx]
+        time_dimension.CumulVar(manager.NodeToIndex(location_idx)).SetRange(*time_window)
+    for vehicle_id in range(data['num_vehicles']):
+        time_window = data['time_windows'][data['starts'][vehicle_id]]
+        time_dimension.CumulVar(routing.Start(vehicle_id)).SetRange(*time_window)
+        time_dimension.CumulVar(routing.End(vehicle_id)).SetRange(*time_window)
+        time_dimension.SetSpanUpperBoundForVehicle(MAX_ROUTE_MINUTES, vehicle_id)
+    return manager, routing
+
+def run(routing, search_parameters):
+    solutions = []
+    routing.AddAtSolutionCallback(lambda: solutions.append(routing.CostVar().Value()))
+    start = time.perf_counter()
+    solution = routing.SolveWithParameters(search_parameters)
+    elapsed = time.perf_counter() - start
+    solver = routing.solver()
+    return {
+        "objective": solution.ObjectiveValue() if solution else None,
+        "solutions": len(solutions),
+        "accepted_neighbors": solver.AcceptedNeighbors(),
+        "branches": solver.Branches(),
+        "seconds": elapsed
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[60, 240, 600])
+    parser.add_argument('--jobs-per-technician', type=int, default=4)
+    parser.add_argument('--time-limit', type=int, default=10)
+    args = parser.parse_args()
+
+    service = RoutingService()
+    service.google_maps_api_key = None
+    search_parameters = service._default_search_parameters()
+    search_parameters.time_limit.seconds = args.time_limit
+
+    print(f"{'jobs':>6} {'version':>9} {'neighbors':>10} {'branches':>10} {'solutions':>10} {'objective':>10}")
+    for num_jobs in args.jobs:
+        technicians, jobs = random_fleet(max(1, num_jobs // args.jobs_per_technician), num_jobs)
+        distance_matrix, _ = service._build_distance_matrix(jobs, technicians)
+        data = service._create_data_model(distance_matrix, jobs, technicians)
+
+        for version, builder in (("callback", legacy_routing_model), ("native", service._build_routing_model)):
+            _, routing = builder(data)
+            result = run(routing, search_parameters)
+            print(f"{num_jobs:>6} {version:>9} {result['accepted_neighbors']:>10} {result['branches']:>10} "
+                  f"{result['solutions']:>10} {str(result['objective']):>10}")
+
+if __name__ == '__main__':
+    main()
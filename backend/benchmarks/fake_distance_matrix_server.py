@@ -0,0 +1,137 @@
+"""Local stand-in for the Google Distance Matrix API.
+
+Durations are haversine distances driven at 40 km/h, so results can be
+compared against the offline matrix. Each request sleeps for a configurable
+latency to mimic a network round trip, and the API's per-request element
+limits are enforced so batching bugs show up as MAX_ELEMENTS_EXCEEDED.
+
+    server = FakeDistanceMatrixServer(latency=0.05)
+    server.start()
+    service = DistanceMatrixService(api_key="fake", base_url=server.url)
+    ...
+    server.stop()
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from utils.geo_utils import haversine_distance_km, AVERAGE_SPEED_KMH
+from services.distance_matrix_service import (
+    MAX_ORIGINS_PER_REQUEST,
+    MAX_DESTINATIONS_PER_REQUEST,
+    MAX_ELEMENTS_PER_REQUEST
+)
+
+API_PATH = "/maps/api/distancematrix/json"
+
+def _parse_points(value):
+    points = []
+    for pair in value.split("|"):
+        lat, lng = pair.split(",")
+        points.append((float(lat), float(lng)))
+    return points
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server.fake
+        url = urlparse(self.path)
+        if url.path != API_PATH:
+            self.send_error(404)
+            return
+
+        with server.lock:
+            server.request_count += 1
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        params = parse_qs(url.query)
+        body = self._build_response(params, server)
+        payload = json.dumps(body).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _build_response(self, params, server):
+        if "key" not in params:
+            return {"status": "REQUEST_DENIED", "rows": []}
+
+        origins = _parse_points(params["origins"][0])
+        destinations = _parse_points(params["destinations"][0])
+        if (len(origins) > MAX_ORIGINS_PER_REQUEST or len(destinations) > MAX_DESTINATIONS_PER_REQUEST
+                or len(origins) * len(destinations) > MAX_ELEMENTS_PER_REQUEST):
+            return {"status": "MAX_ELEMENTS_EXCEEDED", "rows": []}
+
+        with server.lock:
+            server.element_count += len(origins) * len(destinations)
+
+        distance_km = haversine_distance_km(
+            [p[0] for p in origins], [p[1] for p in origins],
+            [p[0] for p in destinations], [p[1] for p in destinations]
+        )
+        with_traffic = "departure_time" in params
+
+        rows = []
+        for row in distance_km:
+            elements = []
+            for km in row:
+                seconds = int(round(km / AVERAGE_SPEED_KMH * 3600))
+                element = {
+                    "status": "OK",
+                    "distance": {"value": int(round(km * 1000))},
+                    "duration": {"value": seconds}
+                }
+                if with_traffic:
+                    element["duration_in_traffic"] = {"value": int(round(seconds * server.traffic_factor))}
+                elements.append(element)
+            rows.append({"elements": elements})
+        return {"status": "OK", "rows": rows}
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+class FakeDistanceMatrixServer:
+    """Threaded local HTTP server that answers Distance Matrix requests"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, traffic_factor=1.0):
+        self.latency = latency
+        self.traffic_factor = traffic_factor
+        self.request_count = 0
+        self.element_count = 0
+        self.lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{API_PATH}"
+
+    def reset_counts(self):
+        with self.lock:
+            self.request_count = 0
+            self.element_count = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
@@ -0,0 +1,99 @@
+"""Seeded synthetic routing scenarios for benchmarks.
+
+A scenario is a day of work in a city: technicians with shifts and skills,
+and jobs clustered around a few neighborhoods with realistic time windows.
+The same seed always produces the same scenario.
+"""
+import random
+
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+SKILLS = ["fiber_installation", "cable_installation", "router_setup", "troubleshooting", "network_config"]
+
+# (start, end, weight): morning and afternoon slots, two-hour slots and all-day jobs
+TIME_WINDOWS = [
+    ("08:00", "12:00", 3), ("13:00", "17:00", 3), ("08:00", "17:00", 2),
+    ("09:00", "11:00", 1), ("11:00", "13:00", 1), ("14:00", "16:00", 1)
+]
+
+# (start, end, weight) technician shifts
+SHIFTS = [("08:00", "17:00", 6), ("07:00", "15:00", 2), ("10:00", "18:00", 2)]
+
+DURATIONS = [30, 45, 60, 90, 120]
+
+# Named presets: (technicians, jobs)
+PRESETS = {
+    "small": (5, 20),
+    "medium": (25, 100),
+    "large": (100, 400),
+    "xlarge": (300, 1200)
+}
+
+def generate_scenario(num_technicians, num_jobs, seed=0, center=(14.5995, 120.9842), radius_km=15,
+                      num_clusters=None, date="2024-01-15"):
+    """Generate technicians and pending jobs for one day.
+
+    Jobs are drawn around num_clusters neighborhood centers (default: one per
+    25 jobs) spread within radius_km of the city center; technicians start
+    from random points across the whole city.
+    """
+    rng = random.Random(seed)
+    km_per_degree = 111.32
+    spread = radius_km / km_per_degree
+    num_clusters = num_clusters or max(1, num_jobs // 25)
+
+    def city_point():
+        return {"lat": round(center[0] + rng.uniform(-spread, spread), 6),
+                "lng": round(center[1] + rng.uniform(-spread, spread), 6)}
+
+    clusters = [
+        (city_point(), rng.uniform(0.5, 3.0) / km_per_degree)  # neighborhood center and spread
+        for _ in range(num_clusters)
+    ]
+
+    technicians = []
+    for i in range(num_technicians):
+        start, end, _ = _weighted_choice(rng, SHIFTS)
+        shift = {"start": start, "end": end}
+        technicians.append({
+            "_id": f"tech{i}",
+            "name": f"Technician {i}",
+            "email": f"tech{i}@example.com",
+            "status": "available",
+            "skills": _technician_skills(rng, i),
+            "location": city_point(),
+            "working_hours": {day: shift for day in WEEKDAYS}
+        })
+
+    jobs = []
+    for i in range(num_jobs):
+        cluster_center, cluster_spread = rng.choice(clusters)
+        start, end, _ = _weighted_choice(rng, TIME_WINDOWS)
+        jobs.append({
+            "_id": f"job{i}",
+            "customer_id": f"customer{i}",
+            "service_type": rng.choice(SKILLS),
+            "location": {"lat": round(rng.gauss(cluster_center['lat'], cluster_spread), 6),
+                         "lng": round(rng.gauss(cluster_center['lng'], cluster_spread), 6)},
+            "scheduled_date": date,
+            "scheduled_time_window": {"start": start, "end": end},
+            "status": "pending",
+            "priority": rng.choice(["low", "normal", "normal", "high"]),
+            "estimated_duration": rng.choice(DURATIONS)
+        })
+
+    return {"seed": seed, "date": date, "technicians": technicians, "jobs": jobs}
+
+def preset_scenario(name, seed=0):
+    """Generate a named preset scenario"""
+    num_technicians, num_jobs = PRESETS[name]
+    return generate_scenario(num_technicians, num_jobs, seed=seed)
+
+def _technician_skills(rng, tech_idx):
+    # Round-robin one skill so every skill is covered, plus two or three random ones
+    own = SKILLS[tech_idx % len(SKILLS)]
+    others = rng.sample([skill for skill in SKILLS if skill != own], rng.randint(2, 3))
+    return [own] + others
+
+def _weighted_choice(rng, options):
+    return rng.choices(options, weights=[option[-1] for option in options])[0]
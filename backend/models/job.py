@@ -6,7 +6,8 @@ class Job:
     
     def __init__(self, customer_id, service_type, location, scheduled_date, 
                  scheduled_time_window=None, status="pending", priority="normal",
-                 estimated_duration=60, technician_id=None, notes=None, _id=None):
+                 estimated_duration=60, technician_id=None, notes=None, required_skills=None,
+                 estimated_arrival_time=None, estimated_departure_time=None, _id=None):
         self._id = _id if _id else ObjectId()
         self.customer_id = customer_id
         self.service_type = service_type  # installation, repair, maintenance
@@ -17,6 +18,9 @@ class Job:
         self.priority = priority  # low, normal, high, urgent
         self.estimated_duration = estimated_duration  # in minutes
         self.technician_id = technician_id  # Assigned technician ID
+        self.estimated_arrival_time = estimated_arrival_time  # HH:MM, set when routed
+        self.estimated_departure_time = estimated_departure_time  # HH:MM, set when routed
+        self.required_skills = required_skills or []  # Skills the job needs (defaults to the service type)
         self.notes = notes or ""
         self.actual_start_time = None
         self.actual_end_time = None
@@ -26,7 +30,7 @@ class Job:
     @classmethod
     def from_dict(cls, data):
         """Create a Job instance from a dictionary"""
-        return cls(
+        job = cls(
             _id=data.get('_id'),
             customer_id=data.get('customer_id'),
             service_type=data.get('service_type'),
@@ -37,8 +41,17 @@ class Job:
             priority=data.get('priority', 'normal'),
             estimated_duration=data.get('estimated_duration', 60),
             technician_id=data.get('technician_id'),
-            notes=data.get('notes', "")
+            notes=data.get('notes', ""),
+            required_skills=data.get('required_skills'),
+            estimated_arrival_time=data.get('estimated_arrival_time'),
+            estimated_departure_time=data.get('estimated_departure_time')
         )
+        
+        # Stored jobs keep their timestamps; new ones are stamped now
+        for field in ('created_at', 'updated_at'):
+            if isinstance(data.get(field), datetime):
+                setattr(job, field, data[field])
+        return job
     
     def to_dict(self):
         """Convert Job instance to a dictionary"""
@@ -53,7 +66,10 @@ class Job:
             "priority": self.priority,
             "estimated_duration": self.estimated_duration,
             "technician_id": self.technician_id,
+            "estimated_arrival_time": self.estimated_arrival_time,
+            "estimated_departure_time": self.estimated_departure_time,
             "notes": self.notes,
+            "required_skills": self.required_skills,
             "actual_start_time": self.actual_start_time.isoformat() if self.actual_start_time else None,
             "actual_end_time": self.actual_end_time.isoformat() if self.actual_end_time else None,
             "created_at": self.created_at.isoformat(),
@@ -29,7 +29,7 @@ class Technician:
     @classmethod
     def from_dict(cls, data):
         """Create a Technician instance from a dictionary"""
-        return cls(
+        technician = cls(
             _id=data.get('_id'),
             name=data.get('name'),
             email=data.get('email'),
@@ -40,6 +40,12 @@ class Technician:
             current_location=data.get('current_location'),
             working_hours=data.get('working_hours')
         )
+        
+        # Stored technicians keep their timestamps; new ones are stamped now
+        for field in ('created_at', 'updated_at'):
+            if isinstance(data.get(field), datetime):
+                setattr(technician, field, data[field])
+        return technician
     
     def to_dict(self):
         """Convert Technician instance to a dictionary"""
@@ -0,0 +1,190 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+from services.distance_matrix_service import MISSING
+
+# Load environment variables
+load_dotenv()
+
+class DayMatrix:
+    """Travel times between the locations of one day, kept across optimizations.
+
+    Locations are keyed by identity (e.g. a job ID and its coordinates) and
+    each has a slot in a square matrix that grows by doubling. Adding a
+    location fills in its row and column only, and removing one frees its
+    slot, so a day's matrix changes in O(n) as jobs come and go.
+    """
+
+    def __init__(self):
+        self.slots = {}
+        self.free_slots = []
+        self.matrix = np.full((0, 0), MISSING, dtype=np.int32)
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_matrix(cls, keys, matrix):
+        """A DayMatrix of keys with matrix (keys x keys) as their travel times"""
+        day_matrix = cls()
+        day_matrix._reserve(len(keys))
+        for key in keys:
+            day_matrix.slots[key] = day_matrix.free_slots.pop()
+        day_matrix.matrix[:len(keys), :len(keys)] = matrix
+        return day_matrix
+
+    def compact(self):
+        """(keys, keys x keys matrix) of the known locations, in slot order"""
+        keys = sorted(self.slots, key=self.slots.get)
+        slots = self.positions(keys)
+        return keys, self.matrix[np.ix_(slots, slots)]
+
+    def positions(self, keys):
+        """Slot of each key, or -1 where the location is not known"""
+        return np.array([self.slots.get(key, -1) for key in keys], dtype=np.int64)
+
+    def update(self, keys, matrix, new):
+        """Make keys the day's locations and return their matrix in keys order.
+
+        matrix is keys x keys with valid rows and columns wherever new is set;
+        its other cells are ignored and the stored travel times are used
+        (matrix may be None when nothing is new).
+        Locations not in keys are dropped.
+        """
+        wanted = set(keys)
+        self.discard([key for key in self.slots if key not in wanted])
+
+        new_positions = np.flatnonzero(new)
+        self._reserve(len(self.slots) + len(new_positions))
+        for position in new_positions:
+            self.slots[keys[position]] = self.free_slots.pop()
+
+        slots = self.positions(keys)
+        if len(new_positions):
+            new_slots = slots[new_positions]
+            self.matrix[np.ix_(new_slots, slots)] = matrix[new_positions, :]
+            self.matrix[np.ix_(slots, new_slots)] = matrix[:, new_positions]
+        return self.matrix[np.ix_(slots, slots)]
+
+    def discard(self, keys):
+        """Forget keys, so their travel times are looked up again"""
+        for key in keys:
+            if key in self.slots:
+                self.free_slots.append(self.slots.pop(key))
+
+    def _reserve(self, size):
+        """Grow the matrix (doubling) until it has size slots"""
+        capacity = len(self.matrix)
+        if size <= capacity:
+            return
+        new_capacity = max(size, 2 * capacity, 16)
+        grown = np.full((new_capacity, new_capacity), MISSING, dtype=np.int32)
+        grown[:capacity, :capacity] = self.matrix
+        self.matrix = grown
+        # Lowest slots are handed out first
+        self.free_slots = sorted(set(self.free_slots) | set(range(capacity, new_capacity)), reverse=True)
+
+class DayMatrixCache:
+    """DayMatrix per (date, travel-time setting), least recently used first out.
+
+    Saved matrices are kept in a SQLite store shared by web and worker
+    processes, so a date optimized in one queue worker is extended, not
+    rebuilt, by the next optimization or job insertion in any process. Each
+    process keeps the matrices it uses in memory and reloads one only when
+    another process has saved a newer version. Matrices older than `ttl`
+    seconds are rebuilt, so travel times refreshed in the travel-time cache
+    are picked up again.
+    """
+
+    def __init__(self, db_path=None, max_days=None, ttl=None):
+        self.db_path = db_path or os.environ.get('ROUTING_DAY_MATRIX_PATH', 'routing_day_matrices.sqlite3')
+        self.max_days = max_days or int(os.environ.get('ROUTING_DAY_MATRIX_MAX_DAYS', 3))
+        self.ttl = ttl if ttl is not None else int(os.environ.get('ROUTING_DAY_MATRIX_TTL', 3600))
+        # key -> (created_at, saved version or None, DayMatrix)
+        self._days = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS day_matrices (
+                    key TEXT PRIMARY KEY,
+                    date TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    keys TEXT NOT NULL,
+                    matrix BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+
+    def get(self, key):
+        """The DayMatrix for key: the latest saved one, or an empty one when missing or expired"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT version, created_at FROM day_matrices WHERE key = ?", (self._store_key(key),)
+            ).fetchone()
+            entry = self._days.get(key)
+            if row and now - row[1] <= self.ttl:
+                if entry is None or entry[1] != row[0]:
+                    entry = (row[1], row[0], self._load(key))
+                self._conn.execute("UPDATE day_matrices SET last_used = ? WHERE key = ?",
+                                   (now, self._store_key(key)))
+            elif entry is None or entry[1] is not None or now - entry[0] > self.ttl:
+                # Never saved, expired, or invalidated by another process
+                entry = (now, None, DayMatrix())
+            self._days[key] = entry
+            self._days.move_to_end(key)
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+            return entry[2]
+
+    def save(self, key, day_matrix):
+        """Store day_matrix as the latest version for key, for every process"""
+        keys, matrix = day_matrix.compact()
+        version = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            entry = self._days.get(key)
+            created_at = entry[0] if entry and entry[2] is day_matrix else now
+            self._conn.execute(
+                "INSERT OR REPLACE INTO day_matrices (key, date, version, keys, matrix, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._store_key(key), key[0], version, json.dumps(keys),
+                 np.ascontiguousarray(matrix, dtype=np.int32).tobytes(), created_at, now)
+            )
+            self._days[key] = (created_at, version, day_matrix)
+            self._days.move_to_end(key)
+            # Least recently used days first out
+            self._conn.execute(
+                "DELETE FROM day_matrices WHERE key NOT IN "
+                "(SELECT key FROM day_matrices ORDER BY last_used DESC LIMIT ?)",
+                (self.max_days,)
+            )
+
+    def invalidate(self, date=None):
+        """Drop the matrices of date, or all of them"""
+        with self._lock, self._conn:
+            for key in [key for key in self._days if date is None or key[0] == date]:
+                del self._days[key]
+            if date is None:
+                self._conn.execute("DELETE FROM day_matrices")
+            else:
+                self._conn.execute("DELETE FROM day_matrices WHERE date = ?", (date,))
+
+    def _load(self, key):
+        keys, blob = self._conn.execute(
+            "SELECT keys, matrix FROM day_matrices WHERE key = ?", (self._store_key(key),)
+        ).fetchone()
+        keys = [tuple(location_key) if isinstance(location_key, list) else location_key
+                for location_key in json.loads(keys)]
+        matrix = np.frombuffer(blob, dtype=np.int32).reshape(len(keys), len(keys))
+        return DayMatrix.from_matrix(keys, matrix)
+
+    def _store_key(self, key):
+        return json.dumps(list(key))
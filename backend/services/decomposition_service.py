@@ -0,0 +1,388 @@
+import math
+import multiprocessing
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from utils.geo_utils import locations_to_arrays, project_equirectangular, kmeans
+from utils.route_utils import schedule_route, route_travel_minutes, best_insertion, removal_gain
+from utils.shared_memory_utils import SharedMatrix
+
+# Load environment variables
+load_dotenv()
+
+# A job is a boundary job when its second-closest zone is at most this much farther than its own
+BOUNDARY_MARGIN = 0.25
+
+# Per-process state of worker processes; the matrix is attached by _init_zone_worker
+_worker_routing_service = None
+_worker_shared_matrix = None
+
+def _init_zone_worker(matrix_handle):
+    """Attach to the day's shared matrix so zone tasks only carry node lists"""
+    global _worker_shared_matrix
+    _worker_shared_matrix = SharedMatrix.attach(matrix_handle)
+
+def _solve_zone(zone_jobs, zone_technicians, nodes, search_parameters, plateau=None, date=None,
+                overtime_minutes=0, initial_routes=None):
+    """Solve one zone's sub-VRP inside a worker process.
+
+    nodes are the zone's technicians and jobs in the shared matrix's numbering;
+    initial_routes, in the zone's numbering, seed the search.
+    Returns (sequences, solve_metrics) with (node, arrival) sequences in the
+    zone's numbering, or (None, None) when no solution was found.
+    """
+    global _worker_routing_service
+
+    if _worker_routing_service is None:
+        # Imported here so the MongoDB client is created inside the worker
+        from services.routing_service import RoutingService
+        _worker_routing_service = RoutingService()
+
+    service = _worker_routing_service
+    zone_matrix = _worker_shared_matrix.array[np.ix_(nodes, nodes)]
+    data = service._create_data_model(zone_matrix, zone_jobs, zone_technicians, date,
+                                      overtime_minutes=overtime_minutes)
+    solution = service._solve_vrp(data, search_parameters, initial_routes, plateau=plateau)
+    if not solution:
+        return None, None
+    return service._extract_sequences(solution, data), solution.solve_metrics
+
+class DecompositionService:
+    """Service for solving large routing days as geographic zones in parallel.
+
+    Jobs are clustered into zones of roughly `zone_size` jobs, technicians
+    are shared out between zones in proportion to their workload (closest
+    technicians first), each zone's sub-VRP is solved in its own process
+    against the day's matrix in shared memory,
+    and a repair pass moves jobs near zone edges, or left unassigned, into
+    a neighboring zone's route when that is feasible and cheaper. Jobs still
+    unassigned are re-inserted by re-solving only the zones around them.
+    """
+
+    def __init__(self, max_workers=None, zone_size=None, seed=0):
+        self.max_workers = max_workers or int(os.environ.get('ROUTING_MAX_WORKERS', os.cpu_count() or 1))
+        self.zone_size = zone_size or int(os.environ.get('ROUTING_ZONE_SIZE', 150))
+        self.seed = seed
+
+    def solve(self, data, jobs, technicians, search_parameters, plateau=None, reinsertion_parameters=None):
+        """Solve the full data model zone by zone.
+
+        plateau is passed on to every zone's solve as its early-stop rule.
+        Returns (sequences, solve_metrics): per-technician (node, arrival)
+        lists in the full model's node numbering, and the zones' combined
+        metrics. The search ends with the zone that finishes last, so its
+        stop_reason and solve_seconds are the plan's. Each zone of
+        solve_metrics['decomposition']['zones'] gives its size, objective, stop
+        reason and the jobs it left unassigned before the repair pass.
+        With reinsertion_parameters, servable jobs still unassigned after the
+        repair are re-inserted by re-solving their zones under those parameters
+        (see reinsert); solve_metrics['decomposition']['reinsertion'] reports it.
+        """
+        num_technicians = len(technicians)
+        layout = self.build_zones(jobs, technicians)
+
+        tasks = []
+        unassigned = []
+        zone_metrics = []
+        for zone_technicians, zone_jobs in layout['zones']:
+            if not zone_jobs:
+                continue
+            zone_metrics.append({"technicians": len(zone_technicians), "jobs": len(zone_jobs), "objective": None,
+                                 "solve_seconds": None, "stop_reason": "no_solution",
+                                 "unassigned_jobs": len(zone_jobs)})
+            if not zone_technicians:
+                unassigned.extend(num_technicians + job_idx for job_idx in zone_jobs)
+                continue
+
+            # Jobs no technician of the zone is qualified for are left to the repair pass
+            qualified = []
+            for job_idx in zone_jobs:
+                if self._has_qualified_technician(data, num_technicians + job_idx, zone_technicians):
+                    qualified.append(job_idx)
+                else:
+                    unassigned.append(num_technicians + job_idx)
+            zone_jobs = qualified
+            if not zone_jobs:
+                continue
+
+            nodes = zone_technicians + [num_technicians + job_idx for job_idx in zone_jobs]
+            tasks.append((nodes, zone_technicians, zone_jobs, zone_metrics[-1]))
+
+        sequences = [[] for _ in range(num_technicians)]
+        reinsertion = None
+        if not tasks:
+            sequences, _ = self.repair_boundaries(data, layout, sequences, unassigned, num_technicians)
+            return sequences, self._combined_metrics(zone_metrics, reinsertion)
+
+        workers = min(self.max_workers, len(tasks))
+        with SharedMatrix.create(data['distance_matrix']) as shared_matrix, \
+                ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                    initializer=_init_zone_worker,
+                                    initargs=(shared_matrix.handle,)) as executor:
+            futures = [
+                executor.submit(
+                    _solve_zone,
+                    [jobs[job_idx] for job_idx in zone_jobs],
+                    [technicians[tech_idx] for tech_idx in zone_technicians],
+                    nodes,
+                    search_parameters,
+                    plateau,
+                    data.get('date'),
+                    data.get('overtime_minutes', 0)
+                )
+                for nodes, zone_technicians, zone_jobs, _ in tasks
+            ]
+
+            for (nodes, zone_technicians, zone_jobs, metrics), future in zip(tasks, futures):
+                try:
+                    zone_sequences, solve_metrics = future.result()
+                except Exception as e:
+                    print(f"Error solving routing zone: {e}")
+                    zone_sequences = None
+
+                if zone_sequences is None:
+                    unassigned.extend(num_technicians + job_idx for job_idx in zone_jobs)
+                    continue
+
+                # Map zone-local nodes back to the full model
+                routed = set()
+                for local_vehicle, zone_sequence in enumerate(zone_sequences):
+                    sequences[zone_technicians[local_vehicle]] = [
+                        (nodes[node], arrival) for node, arrival in zone_sequence
+                    ]
+                    routed.update(nodes[node] for node, _ in zone_sequence)
+                # The solver may drop jobs the zone cannot fit
+                dropped = [num_technicians + job_idx for job_idx in zone_jobs
+                           if num_technicians + job_idx not in routed]
+                unassigned.extend(dropped)
+                metrics.update({
+                    "objective": solve_metrics['objective'],
+                    "solve_seconds": solve_metrics['solve_seconds'],
+                    "stop_reason": solve_metrics['stop_reason'],
+                    "unassigned_jobs": metrics['jobs'] - len(zone_jobs) + len(dropped),
+                    "solutions": solve_metrics['solutions']
+                })
+
+            sequences, unassigned = self.repair_boundaries(data, layout, sequences, unassigned, num_technicians)
+            dropped = [node for node in unassigned if node not in data['unservable']]
+            if dropped and reinsertion_parameters is not None:
+                sequences, reinsertion = self.reinsert(executor, data, layout, jobs, technicians, sequences, dropped,
+                                                       reinsertion_parameters, plateau)
+
+        return sequences, self._combined_metrics(zone_metrics, reinsertion)
+
+    def reinsert(self, executor, data, layout, jobs, technicians, sequences, dropped, search_parameters,
+                 plateau=None):
+        """Re-solve the zones around jobs still unassigned after the repair pass.
+
+        Every dropped job brings in its own zone and its closest neighbor, or
+        only its own zone when the neighbors would cover the whole day; a
+        region that is still the whole day is not re-solved. The region's
+        technicians, routed jobs and the dropped jobs are solved as one model,
+        seeded with the current routes. The region's routes replace the current ones when
+        they place more jobs, or as many for less travel.
+        Returns (sequences, reinsertion metrics).
+        """
+        num_technicians = len(technicians)
+        centroid_distances = np.linalg.norm(
+            layout['job_points'][:, None, :] - layout['centroids'][None, :, :], axis=2
+        )
+        closest_zones = np.argsort(centroid_distances[[node - num_technicians for node in dropped]], axis=1)[:, :2]
+        zones = set(int(zone) for zone in closest_zones.ravel())
+        if len(zones) >= len(layout['zones']):
+            # Without the neighbors when they would make the region the whole day
+            zones = set(int(zone) for zone in closest_zones[:, 0])
+        if len(zones) >= len(layout['zones']):
+            return sequences, None
+        region_technicians = sorted(tech_idx for zone in zones for tech_idx in layout['zones'][zone][0])
+        if not region_technicians:
+            return sequences, None
+
+        job_nodes = [node for tech_idx in region_technicians for node, _ in sequences[tech_idx]] + list(dropped)
+        nodes = region_technicians + job_nodes
+        local = {node: local_node for local_node, node in enumerate(nodes)}
+        initial_routes = [[local[node] for node, _ in sequences[tech_idx]] for tech_idx in region_technicians]
+
+        metrics = {"zones": len(zones), "technicians": len(region_technicians), "jobs": len(job_nodes),
+                   "reinserted_jobs": 0, "solve_seconds": None, "stop_reason": "no_solution"}
+        try:
+            region_sequences, solve_metrics = executor.submit(
+                _solve_zone,
+                [jobs[node - num_technicians] for node in job_nodes],
+                [technicians[tech_idx] for tech_idx in region_technicians],
+                nodes,
+                search_parameters,
+                plateau,
+                data.get('date'),
+                data.get('overtime_minutes', 0),
+                initial_routes
+            ).result()
+        except Exception as e:
+            print(f"Error re-solving routing zones: {e}")
+            region_sequences = None
+        if region_sequences is None:
+            return sequences, metrics
+        metrics.update({"solve_seconds": solve_metrics['solve_seconds'], "stop_reason": solve_metrics['stop_reason']})
+
+        candidate = list(sequences)
+        for local_vehicle, region_sequence in enumerate(region_sequences):
+            candidate[region_technicians[local_vehicle]] = [(nodes[node], arrival) for node, arrival in region_sequence]
+        placed = sum(len(candidate[tech_idx]) - len(sequences[tech_idx]) for tech_idx in region_technicians)
+        if placed > 0 or (placed == 0 and self.total_travel_minutes(data, candidate)
+                          < self.total_travel_minutes(data, sequences)):
+            metrics['reinserted_jobs'] = placed
+            return candidate, metrics
+        return sequences, metrics
+
+    def _combined_metrics(self, zone_metrics, reinsertion=None):
+        """Plan-level stop reason, time and solution count of the zone solves, with the zones themselves"""
+        solved = [metrics for metrics in zone_metrics if metrics['solve_seconds'] is not None]
+        last = max(solved, key=lambda metrics: metrics['solve_seconds']) if solved else None
+        return {
+            "solve_seconds": last['solve_seconds'] if last else 0.0,
+            "stop_reason": last['stop_reason'] if last else "no_solution",
+            "solutions": sum(metrics.pop('solutions') for metrics in solved),
+            "decomposition": {"zones": zone_metrics, "reinsertion": reinsertion}
+        }
+
+    def build_zones(self, jobs, technicians):
+        """Split jobs and technicians into zones.
+
+        Returns a layout dict with 'zones' ([(technician indices, job indices)]),
+        the zone 'centroids' and the projected 'job_points'.
+        """
+        num_zones = max(1, min(math.ceil(len(jobs) / self.zone_size), len(technicians)))
+        job_lats, job_lngs = locations_to_arrays([job['location'] for job in jobs])
+        reference_lat = job_lats.mean()
+        job_points = project_equirectangular(job_lats, job_lngs, reference_lat)
+        labels, centroids = kmeans(job_points, num_zones, seed=self.seed)
+        num_zones = len(centroids)
+
+        zone_jobs = [[int(job_idx) for job_idx in np.flatnonzero(labels == zone)] for zone in range(num_zones)]
+        quotas = self._technician_quotas([len(members) for members in zone_jobs], len(technicians))
+
+        # Closest technician-zone pairs first until each zone's quota is filled
+        tech_lats, tech_lngs = locations_to_arrays([self._technician_location(tech) for tech in technicians])
+        tech_points = project_equirectangular(tech_lats, tech_lngs, reference_lat)
+        distances = np.linalg.norm(tech_points[:, None, :] - centroids[None, :, :], axis=2)
+        zone_technicians = [[] for _ in range(num_zones)]
+        assigned = set()
+        for flat in np.argsort(distances, axis=None):
+            tech_idx, zone = divmod(int(flat), num_zones)
+            if tech_idx in assigned or len(zone_technicians[zone]) >= quotas[zone]:
+                continue
+            zone_technicians[zone].append(tech_idx)
+            assigned.add(tech_idx)
+
+        return {
+            "zones": [(sorted(zone_technicians[zone]), zone_jobs[zone]) for zone in range(num_zones)],
+            "centroids": centroids,
+            "job_points": job_points
+        }
+
+    def repair_boundaries(self, data, layout, sequences, unassigned, num_technicians):
+        """Move boundary and unassigned jobs to a neighboring zone's route when feasible and cheaper.
+
+        A move is only made when both routes it touches can still be timed;
+        otherwise the previous routes and arrivals are kept.
+        """
+        routes = [[node for node, _ in sequence] for sequence in sequences]
+        arrivals = [[arrival for _, arrival in sequence] for sequence in sequences]
+
+        vehicle_zones = {}
+        for zone, (zone_technicians, _) in enumerate(layout['zones']):
+            for tech_idx in zone_technicians:
+                vehicle_zones[tech_idx] = zone
+
+        # The two closest zones of every job
+        centroids = layout['centroids']
+        centroid_distances = np.linalg.norm(layout['job_points'][:, None, :] - centroids[None, :, :], axis=2)
+        closest_zones = np.argsort(centroid_distances, axis=1)[:, :2]
+
+        candidates = list(unassigned)
+        if len(centroids) > 1:
+            job_indices = np.arange(len(centroid_distances))
+            own = centroid_distances[job_indices, closest_zones[:, 0]]
+            second = centroid_distances[job_indices, closest_zones[:, 1]]
+            boundary = np.flatnonzero(second <= own * (1 + BOUNDARY_MARGIN))
+            candidates.extend(num_technicians + int(job_idx) for job_idx in boundary)
+
+        vehicle_of = {}
+        for vehicle_id, route in enumerate(routes):
+            for node in route:
+                vehicle_of[node] = vehicle_id
+
+        unassigned_nodes = set(unassigned)
+        for node in candidates:
+            job_zones = set(int(zone) for zone in closest_zones[node - num_technicians])
+            current_vehicle = vehicle_of.get(node)
+
+            gain = None
+            if current_vehicle is not None:
+                route = routes[current_vehicle]
+                gain = removal_gain(data, current_vehicle, route, route.index(node))
+
+            best = None
+            for vehicle_id, zone in vehicle_zones.items():
+                if vehicle_id == current_vehicle or zone not in job_zones:
+                    continue
+                insertion = best_insertion(data, vehicle_id, routes[vehicle_id], node)
+                if insertion and (best is None or insertion[0] < best[0]):
+                    best = (insertion[0], insertion[1], vehicle_id)
+
+            if best is None or (gain is not None and best[0] >= gain):
+                continue
+
+            # Re-time both routes first; a move either route cannot be timed for is rejected
+            added, position, vehicle_id = best
+            target_route = routes[vehicle_id][:position] + [node] + routes[vehicle_id][position:]
+            target_arrivals = schedule_route(data, vehicle_id, target_route)
+            if target_arrivals is None:
+                continue
+            if current_vehicle is not None:
+                source_route = [stop for stop in routes[current_vehicle] if stop != node]
+                source_arrivals = schedule_route(data, current_vehicle, source_route)
+                if source_arrivals is None:
+                    continue
+                routes[current_vehicle], arrivals[current_vehicle] = source_route, source_arrivals
+            routes[vehicle_id], arrivals[vehicle_id] = target_route, target_arrivals
+            vehicle_of[node] = vehicle_id
+            unassigned_nodes.discard(node)
+
+        sequences = [list(zip(routes[vehicle_id], arrivals[vehicle_id])) for vehicle_id in range(len(routes))]
+        return sequences, sorted(unassigned_nodes)
+
+    def total_travel_minutes(self, data, sequences):
+        """Total travel minutes over all technicians' routes"""
+        return sum(
+            route_travel_minutes(data, vehicle_id, [node for node, _ in sequence])
+            for vehicle_id, sequence in enumerate(sequences)
+        )
+
+    def _technician_quotas(self, zone_loads, num_technicians):
+        """Share technicians between zones in proportion to jobs (largest remainder, at least one each)"""
+        total = sum(zone_loads) or 1
+        shares = [load * num_technicians / total for load in zone_loads]
+        quotas = [max(1, int(share)) if load else 0 for share, load in zip(shares, zone_loads)]
+
+        by_remainder = sorted(range(len(shares)), key=lambda zone: shares[zone] - int(shares[zone]), reverse=True)
+        by_remainder = [zone for zone in by_remainder if zone_loads[zone]]
+        while by_remainder and sum(quotas) < num_technicians:
+            for zone in by_remainder:
+                if sum(quotas) >= num_technicians:
+                    break
+                quotas[zone] += 1
+
+        while sum(quotas) > num_technicians:
+            zone = max((zone for zone in range(len(quotas)) if quotas[zone] > 1),
+                       key=lambda zone: quotas[zone] - shares[zone])
+            quotas[zone] -= 1
+        return quotas
+
+    def _has_qualified_technician(self, data, node, technician_indices):
+        allowed_vehicles = data['allowed_vehicles'][node]
+        return allowed_vehicles is None or any(tech_idx in allowed_vehicles for tech_idx in technician_indices)
+
+    def _technician_location(self, tech):
+        return tech.get('current_location') or tech.get('location') or {"lat": 0, "lng": 0}
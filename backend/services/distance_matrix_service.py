@@ -0,0 +1,192 @@
+import os
+import random
+import time
+import numpy as np
+import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+GOOGLE_DISTANCE_MATRIX_URL = "https://maps.googleapis.com/maps/api/distancematrix/json"
+
+# Per-request limits of the Distance Matrix API
+MAX_ORIGINS_PER_REQUEST = 25
+MAX_DESTINATIONS_PER_REQUEST = 25
+MAX_ELEMENTS_PER_REQUEST = 100
+
+# Marker for cells the API did not return a duration for
+MISSING = -1
+
+# Marker for cells whose request failed even after retries; unlike MISSING, a later request may answer them
+UNAVAILABLE = -2
+
+# Response statuses worth retrying after a pause
+RETRYABLE_STATUSES = ("OVER_QUERY_LIMIT", "UNKNOWN_ERROR")
+
+class DistanceMatrixService:
+    """Service for fetching travel-time matrices from the Google Distance Matrix API.
+
+    Many origins and destinations are packed into each request (within the
+    API's element limits) and the batches run concurrently on a bounded
+    thread pool sharing one pooled HTTP session. Requests that hit the rate
+    limit or a transient server or network error are retried up to
+    max_retries times with exponential backoff.
+    """
+
+    def __init__(self, api_key=None, base_url=None, max_workers=None, timeout=10,
+                 max_origins=MAX_ORIGINS_PER_REQUEST, max_destinations=MAX_DESTINATIONS_PER_REQUEST,
+                 max_elements=MAX_ELEMENTS_PER_REQUEST, max_retries=None, retry_backoff=None):
+        self.api_key = api_key or os.environ.get('GOOGLE_MAPS_API_KEY')
+        self.base_url = base_url or os.environ.get('DISTANCE_MATRIX_API_URL', GOOGLE_DISTANCE_MATRIX_URL)
+        self.max_workers = max_workers or int(os.environ.get('DISTANCE_MATRIX_MAX_WORKERS', 8))
+        self.timeout = timeout
+        self.max_origins = max_origins
+        self.max_destinations = max_destinations
+        self.max_elements = max_elements
+        self.max_retries = (
+            max_retries if max_retries is not None else int(os.environ.get('DISTANCE_MATRIX_MAX_RETRIES', 3))
+        )
+        self.retry_backoff = (
+            retry_backoff if retry_backoff is not None else float(os.environ.get('DISTANCE_MATRIX_RETRY_BACKOFF', 1.0))
+        )
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+
+        # One session with a connection pool large enough for every worker
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def build_matrix(self, locations, consider_traffic=True, mask=None, symmetric=True, departure_time=None):
+        """Build a travel-time matrix (minutes, int32) between all locations.
+
+        mask is an optional boolean n x n array of the cells to fetch; by
+        default only the upper triangle is requested. Cells that were not
+        fetched or that the API could not route are set to MISSING, and cells
+        whose request failed (after retries) to UNAVAILABLE. With
+        symmetric=True the upper triangle is mirrored onto the lower one,
+        matching how the matrix was built one pair at a time. With traffic,
+        durations are for departure_time (a datetime, default now).
+        """
+        n = len(locations)
+        matrix = np.full((n, n), MISSING, dtype=np.int32)
+        np.fill_diagonal(matrix, 0)
+
+        if mask is None:
+            mask = np.triu(np.ones((n, n), dtype=bool), 1)
+
+        batches = self._plan_batches(mask)
+        if batches:
+            coords = [f"{loc['lat']},{loc['lng']}" for loc in locations]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [
+                    executor.submit(self._fetch_batch, coords, origins, destinations, consider_traffic,
+                                    departure_time)
+                    for origins, destinations in batches
+                ]
+                for (origins, destinations), future in zip(batches, futures):
+                    block = future.result()
+                    matrix[np.ix_(origins, destinations)] = UNAVAILABLE if block is None else block
+
+        if symmetric:
+            upper = np.triu_indices(n, 1)
+            matrix.T[upper] = matrix[upper]
+
+        return matrix
+
+    def _plan_batches(self, mask):
+        """Cover the requested cells with (origins, destinations) blocks within the API limits.
+
+        Each group of origins either requests the union of its rows' columns
+        or, for sparse masks such as a single new location, groups rows that
+        need exactly the same columns, whichever takes fewer requests.
+        """
+        batches = []
+        n = mask.shape[0]
+        for row_start in range(0, n, self.max_origins):
+            rows = np.arange(row_start, min(row_start + self.max_origins, n))
+            rows = rows[mask[rows].any(axis=1)]
+            if len(rows) == 0:
+                continue
+
+            union = self._blocks(rows, np.flatnonzero(mask[rows].any(axis=0)))
+
+            groups = {}
+            for row in rows:
+                groups.setdefault(mask[row].tobytes(), []).append(row)
+            grouped = []
+            for group_rows in groups.values():
+                group_rows = np.array(group_rows)
+                grouped.extend(self._blocks(group_rows, np.flatnonzero(mask[group_rows[0]])))
+
+            batches.extend(grouped if len(grouped) < len(union) else union)
+        return batches
+
+    def _blocks(self, rows, columns):
+        """Split columns into chunks so rows x chunk stays within the element limit"""
+        per_request = min(self.max_destinations, max(1, self.max_elements // len(rows)))
+        return [(rows, columns[start:start + per_request]) for start in range(0, len(columns), per_request)]
+
+    def _fetch_batch(self, coords, origins, destinations, consider_traffic, departure_time=None):
+        """Fetch one block of durations, retrying transient failures; returns a minutes array or None on failure"""
+        params = {
+            "origins": "|".join(coords[i] for i in origins),
+            "destinations": "|".join(coords[j] for j in destinations),
+            "key": self.api_key
+        }
+
+        if consider_traffic:
+            # Traffic predictions for the planned departure, not the time the plan is made
+            params["departure_time"] = int(departure_time.timestamp()) if departure_time else "now"
+            params["traffic_model"] = "best_guess"
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                # Jitter keeps concurrent batches from retrying in lockstep
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+            block, retryable = self._request_batch(params, len(origins), len(destinations), consider_traffic)
+            if block is not None or not retryable:
+                return block
+
+        print(f"Error fetching distance matrix batch: giving up after {self.max_retries + 1} attempts")
+        return None
+
+    def _request_batch(self, params, num_origins, num_destinations, consider_traffic):
+        """One request for a block; returns (minutes array or None, whether a failure is worth retrying)"""
+        try:
+            with self._count_lock:
+                self.request_count += 1
+            response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+            if response.status_code != 200:
+                print(f"Distance Matrix API returned HTTP {response.status_code}")
+                return None, response.status_code >= 500 or response.status_code == 429
+
+            result = response.json()
+            if result["status"] != "OK":
+                print(f"Distance Matrix API returned status {result['status']}")
+                return None, result["status"] in RETRYABLE_STATUSES
+
+            block = np.full((num_origins, num_destinations), MISSING, dtype=np.int32)
+            for row_idx, row in enumerate(result["rows"]):
+                for col_idx, element in enumerate(row["elements"]):
+                    if element.get("status") != "OK":
+                        continue
+
+                    # Get duration in seconds, preferring traffic-aware duration
+                    duration = element["duration"]["value"]
+                    if consider_traffic and "duration_in_traffic" in element:
+                        duration = element["duration_in_traffic"]["value"]
+
+                    block[row_idx, col_idx] = round(duration / 60)
+            return block, False
+        except (requests.ConnectionError, requests.Timeout) as e:
+            print(f"Error fetching distance matrix batch: {e}")
+            return None, True
+        except Exception as e:
+            print(f"Error fetching distance matrix batch: {e}")
+            return None, False
@@ -1,5 +1,8 @@
 from bson import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from models.job import Job
 from services.db_service import DatabaseService
 
@@ -99,6 +102,65 @@ class JobService:
             print(f"Error assigning job: {e}")
             return False
     
+    def bulk_assign_jobs(self, assignments):
+        """Apply a whole route plan in one unordered bulk write.
+        
+        Each assignment is a dict with job_id, technician_id, estimated_arrival_time,
+        estimated_departure_time and expected: the fields (e.g. {"status": "pending"})
+        the job must still have, so jobs changed since the plan was made are skipped.
+        Returns {"requested", "matched", "modified", "skipped_job_ids"}.
+        """
+        requested = len(assignments)
+        if not assignments:
+            return {"requested": 0, "matched": 0, "modified": 0, "skipped_job_ids": []}
+        
+        # One timestamp for the batch marks which jobs this write touched
+        updated_at = datetime.utcnow()
+        operations, object_ids, invalid_ids = [], [], []
+        for assignment in assignments:
+            try:
+                object_id = ObjectId(assignment['job_id'])
+            except (InvalidId, TypeError):
+                invalid_ids.append(assignment['job_id'])
+                continue
+            object_ids.append(object_id)
+            operations.append(UpdateOne(
+                {"_id": object_id, **assignment.get('expected', {})},
+                {"$set": {
+                    "technician_id": assignment['technician_id'],
+                    "status": "assigned",
+                    "estimated_arrival_time": assignment['estimated_arrival_time'],
+                    "estimated_departure_time": assignment['estimated_departure_time'],
+                    "updated_at": updated_at
+                }}
+            ))
+        
+        matched = modified = 0
+        if operations:
+            try:
+                result = self.collection.bulk_write(operations, ordered=False)
+                matched, modified = result.matched_count, result.modified_count
+            except BulkWriteError as e:
+                print(f"Error bulk assigning jobs: {e.details.get('writeErrors')}")
+                matched, modified = e.details.get('nMatched', 0), e.details.get('nModified', 0)
+            except Exception as e:
+                print(f"Error bulk assigning jobs: {e}")
+        
+        # Only look up which jobs were skipped when some were
+        skipped = list(invalid_ids)
+        if matched < len(operations):
+            try:
+                written = {
+                    job_data['_id'] for job_data in
+                    self.collection.find({"_id": {"$in": object_ids}, "updated_at": updated_at}, {"_id": 1})
+                }
+                skipped.extend(str(object_id) for object_id in object_ids if object_id not in written)
+            except Exception as e:
+                print(f"Error checking skipped jobs: {e}")
+                skipped.extend(str(object_id) for object_id in object_ids)
+        
+        return {"requested": requested, "matched": matched, "modified": modified, "skipped_job_ids": skipped}
+    
     def update_job_status(self, job_id, status, actual_start_time=None, actual_end_time=None):
         """Update a job's status"""
         try:
@@ -122,14 +184,34 @@ class JobService:
             print(f"Error updating job status: {e}")
             return False
     
-    def get_jobs_for_date_range(self, start_date, end_date, technician_id=None):
-        """Get jobs for a date range with optional technician filtering"""
+    def get_technician_route(self, technician_id, date):
+        """A technician's assigned and in-progress jobs of a date, in ETA order"""
+        jobs = []
+        try:
+            cursor = self.collection.find({
+                "technician_id": technician_id,
+                "scheduled_date": date,
+                "status": {"$in": ["assigned", "in_progress"]}
+            })
+            for job_data in cursor:
+                job = Job.from_dict(job_data)
+                jobs.append(job.to_dict())
+            jobs.sort(key=lambda job: job.get('estimated_arrival_time') or '23:59')
+            return jobs
+        except Exception as e:
+            print(f"Error getting technician route: {e}")
+            return []
+    
+    def get_jobs_for_date_range(self, start_date, end_date, technician_id=None, status=None):
+        """Get jobs for a date range with optional technician and status filtering"""
         query = {
             "scheduled_date": {"$gte": start_date, "$lte": end_date}
         }
         
         if technician_id:
             query["technician_id"] = technician_id
+        if status:
+            query["status"] = status
         
         jobs = []
         try:
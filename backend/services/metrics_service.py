@@ -0,0 +1,154 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram buckets for phase durations, in seconds
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+class MetricsRegistry:
+    """Process-wide counters, gauges and histograms rendered in Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._values = {}
+        self._gauge_callbacks = {}
+
+    def describe(self, name, metric_type, help_text, buckets=None):
+        """Declare a metric; types are counter, gauge and histogram"""
+        with self._lock:
+            self._metrics[name] = {"type": metric_type, "help": help_text, "buckets": buckets or DURATION_BUCKETS}
+            self._values.setdefault(name, {})
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values[name]
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._values[name][self._key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            buckets = self._metrics[name]['buckets']
+            series = self._values[name].setdefault(key, {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0})
+            for position, bound in enumerate(buckets):
+                if value <= bound:
+                    series['buckets'][position] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def register_gauge_callback(self, name, help_text, callback):
+        """A gauge whose value is read from callback() at scrape time"""
+        self.describe(name, "gauge", help_text)
+        with self._lock:
+            self._gauge_callbacks[name] = callback
+
+    def record_optimization(self, metrics, status="completed"):
+        """Fold one optimization's response metrics into the registry"""
+        self.inc("routing_optimizations_total", status=status)
+        if not metrics:
+            return
+
+        for phase, timing in metrics.get('phases', {}).items():
+            self.observe("routing_phase_wall_seconds", timing['wall_seconds'], phase=phase)
+            self.inc("routing_phase_cpu_seconds_total", timing['cpu_seconds'], phase=phase)
+            if timing.get('api_calls'):
+                self.inc("routing_distance_matrix_api_calls_total", timing['api_calls'])
+            if timing.get('matrix_locations'):
+                self.set("routing_last_matrix_locations", timing['matrix_locations'])
+
+        self.inc("routing_jobs_total", metrics.get('total_jobs', 0))
+        self.inc("routing_jobs_assigned_total", metrics.get('assigned_jobs', 0))
+        if metrics.get('objective') is not None:
+            self.set("routing_last_objective", metrics['objective'])
+        if metrics.get('portfolio'):
+            self.inc("routing_portfolio_wins_total", configuration=metrics['portfolio']['winner']['name'])
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            values = {name: dict(series) for name, series in self._values.items()}
+            callbacks = dict(self._gauge_callbacks)
+
+        for name, callback in callbacks.items():
+            try:
+                values[name] = {(): callback()}
+            except Exception as e:
+                print(f"Error reading gauge {name}: {e}")
+
+        lines = []
+        for name, metric in sorted(metrics.items()):
+            lines.append(f"# HELP {name} {metric['help']}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for key, value in sorted(values.get(name, {}).items()):
+                if metric['type'] == "histogram":
+                    # Bucket counts are kept cumulative by observe()
+                    for bound, count in zip(metric['buckets'], value['buckets']):
+                        lines.append(f"{name}_bucket{self._labels(key, le=self._number(bound))} {count}")
+                    lines.append(f"{name}_bucket{self._labels(key, le='+Inf')} {value['count']}")
+                    lines.append(f"{name}_sum{self._labels(key)} {self._number(value['sum'])}")
+                    lines.append(f"{name}_count{self._labels(key)} {value['count']}")
+                else:
+                    lines.append(f"{name}{self._labels(key)} {self._number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _key(self, labels):
+        return tuple(sorted(labels.items()))
+
+    def _labels(self, key, **extra):
+        pairs = list(key) + list(extra.items())
+        if not pairs:
+            return ""
+        escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+        return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(pairs, escaped)) + "}"
+
+    def _number(self, value):
+        if isinstance(value, float) and math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(float(value)) if isinstance(value, float) else str(value)
+
+class PhaseRecorder:
+    """Wall time, CPU time and extra counters for each phase of one optimization"""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block; yields a dict for extra per-phase values"""
+        extra = {}
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield extra
+        finally:
+            self.phases[name] = {
+                "wall_seconds": round(time.perf_counter() - wall_start, 4),
+                "cpu_seconds": round(time.process_time() - cpu_start, 4),
+                **extra
+            }
+
+def _create_registry():
+    registry = MetricsRegistry()
+    registry.describe("routing_optimizations_total", "counter", "Route optimizations finished, by status")
+    registry.describe("routing_phase_wall_seconds", "histogram", "Wall time of each optimization phase")
+    registry.describe("routing_phase_cpu_seconds_total", "counter", "CPU time spent in each optimization phase")
+    registry.describe("routing_distance_matrix_api_calls_total", "counter", "Distance Matrix API requests made")
+    registry.describe("routing_last_matrix_locations", "gauge", "Locations in the most recent travel-time matrix")
+    registry.describe("routing_jobs_total", "counter", "Jobs considered by optimizations")
+    registry.describe("routing_jobs_assigned_total", "counter", "Jobs assigned by optimizations")
+    registry.describe("routing_last_objective", "gauge", "Solver objective (travel minutes plus penalties)")
+    registry.describe("routing_portfolio_wins_total", "counter", "Portfolio races won, by search configuration")
+
+    # Counters without labels are exported from zero
+    for name in ("routing_distance_matrix_api_calls_total", "routing_jobs_total", "routing_jobs_assigned_total"):
+        registry.inc(name, 0)
+    return registry
+
+# Shared by everything in this process
+metrics_registry = _create_registry()
@@ -0,0 +1,115 @@
+import multiprocessing
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from utils.shared_memory_utils import SharedMatrix
+
+# Load environment variables
+load_dotenv()
+
+# Per-process state of worker processes, set once by _init_day_worker
+_worker_routing_service = None
+_worker_shared_matrix = None
+_worker_matrix = None
+_worker_jobs = None
+_worker_technicians = None
+
+def _init_day_worker(matrix_handle, jobs, technicians):
+    """Attach to the batch's shared matrix and keep its inputs in the worker so day tasks only carry indices"""
+    global _worker_shared_matrix, _worker_matrix, _worker_jobs, _worker_technicians
+    _worker_shared_matrix = SharedMatrix.attach(matrix_handle)
+    _worker_matrix = _worker_shared_matrix.array
+    _worker_jobs = jobs
+    _worker_technicians = technicians
+
+def _solve_day(date, job_indices, search_parameters, plateau=None, warm_start=True, time_dependent=False):
+    """Solve one day inside a worker process (with the travel-time profile when time_dependent).
+
+    Returns (sequences, solve_metrics) with sequences in the day's own node
+    numbering (technicians first, then the day's jobs in job_indices order),
+    or (None, None) when no solution was found.
+    """
+    global _worker_routing_service
+
+    if _worker_routing_service is None:
+        # Imported here so the MongoDB client is created inside the worker
+        from services.routing_service import RoutingService
+        _worker_routing_service = RoutingService()
+
+    service = _worker_routing_service
+    num_technicians = len(_worker_technicians)
+    nodes = list(range(num_technicians)) + [num_technicians + job_idx for job_idx in job_indices]
+    day_matrix = _worker_matrix[np.ix_(nodes, nodes)]
+    day_jobs = [_worker_jobs[job_idx] for job_idx in job_indices]
+
+    data = service._create_data_model(day_matrix, day_jobs, _worker_technicians, date)
+    time_dependent = time_dependent and service.travel_time_profile is not None
+    if time_dependent:
+        service._apply_travel_time_profile(data)
+    initial_routes = service._initial_routes(data, day_jobs, _worker_technicians) if warm_start else None
+    solve = service._solve_time_dependent if time_dependent else service._solve_vrp
+    solution = solve(data, search_parameters, initial_routes, plateau)
+    if not solution:
+        return None, None
+    sequences = service._extract_sequences(solution, data)
+    routes = service._build_routes(sequences, day_jobs, _worker_technicians)
+    solution.solve_metrics.update(service._screening_metrics(data, day_jobs, _worker_technicians, routes))
+    return sequences, solution.solve_metrics
+
+class MultiDayService:
+    """Service for solving several days of the same fleet in parallel.
+
+    The travel-time matrix covers every technician and every job of all the
+    days. It is placed in shared memory once, every worker maps it read-only
+    when it starts, and each day's solve slices its own sub-matrix out of it,
+    so neither workers nor day tasks get a pickled copy.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or int(os.environ.get('ROUTING_MAX_WORKERS', os.cpu_count() or 1))
+
+    def solve(self, distance_matrix, jobs, technicians, days, search_parameters, plateau=None, warm_start=True,
+              time_dependent=False):
+        """Solve each day of days ({date: job indices}) against the shared matrix.
+
+        Returns {date: (sequences, solve_metrics)}; sequences map back to the
+        full matrix's node numbering, and are None for days without a solution.
+        """
+        num_technicians = len(technicians)
+        results = {}
+        if not days:
+            return results
+
+        workers = min(self.max_workers, len(days))
+        with SharedMatrix.create(distance_matrix) as shared_matrix, \
+                ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                    initializer=_init_day_worker,
+                                    initargs=(shared_matrix.handle, jobs, technicians)) as executor:
+            futures = {
+                date: executor.submit(_solve_day, date, job_indices, search_parameters, plateau, warm_start,
+                                      time_dependent)
+                for date, job_indices in days.items()
+            }
+
+            for date, future in futures.items():
+                try:
+                    day_sequences, solve_metrics = future.result()
+                except Exception as e:
+                    print(f"Error solving routing day {date}: {e}")
+                    day_sequences, solve_metrics = None, None
+
+                if day_sequences is None:
+                    results[date] = (None, None)
+                    continue
+
+                # Map day-local job nodes back to the full matrix
+                job_indices = days[date]
+                sequences = [
+                    [(node if node < num_technicians else num_technicians + job_indices[node - num_technicians],
+                      arrival) for node, arrival in sequence]
+                    for sequence in day_sequences
+                ]
+                results[date] = (sequences, solve_metrics)
+
+        return results
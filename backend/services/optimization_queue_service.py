@@ -0,0 +1,382 @@
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from dotenv import load_dotenv
+from services.metrics_service import metrics_registry
+
+# Load environment variables
+load_dotenv()
+
+# Statuses an optimization can end in, each published as the stream's last event
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# Stream events are kept this long, in seconds
+EVENT_RETENTION_SECONDS = 3600
+
+class QueueFullError(Exception):
+    """Raised when too many optimizations are already waiting"""
+
+class OptimizationJobStore:
+    """SQLite-backed record of queued route optimizations, shared by web and worker processes"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS optimization_jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    owner_pid INTEGER,
+                    phase TEXT,
+                    progress REAL NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_optimization_jobs_status ON optimization_jobs (status)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS optimization_events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    event TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_optimization_events_job ON optimization_events (job_id, id)")
+            
+            # Stores created before cancellation existed lack the column
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(optimization_jobs)")}
+            if "cancel_requested" not in columns:
+                conn.execute("ALTER TABLE optimization_jobs ADD COLUMN cancel_requested TEXT")
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def create(self, params, owner_pid):
+        job_id = uuid.uuid4().hex
+        with self._connection() as conn:
+            conn.execute("DELETE FROM optimization_events WHERE created_at < ?",
+                         (time.time() - EVENT_RETENTION_SECONDS,))
+            conn.execute(
+                "INSERT INTO optimization_jobs (id, status, params, owner_pid, phase, created_at) "
+                "VALUES (?, 'queued', ?, ?, 'queued', ?)",
+                (job_id, json.dumps(params), owner_pid, time.time())
+            )
+        return job_id
+
+    def get(self, job_id):
+        row = self._connection().execute("SELECT * FROM optimization_jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "params": json.loads(row["params"]),
+            "phase": row["phase"],
+            "progress": row["progress"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "cancel_requested": row["cancel_requested"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"]
+        }
+
+    def count(self, status):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM optimization_jobs WHERE status = ?", (status,)
+        ).fetchone()[0]
+
+    def unfinished(self):
+        rows = self._connection().execute(
+            "SELECT id, status, params, owner_pid FROM optimization_jobs "
+            "WHERE status IN ('queued', 'running') ORDER BY created_at"
+        ).fetchall()
+        return [
+            {"job_id": row["id"], "status": row["status"], "params": json.loads(row["params"]),
+             "owner_pid": row["owner_pid"]}
+            for row in rows
+        ]
+
+    def claim(self, job_id, previous_owner_pid, owner_pid):
+        """Take ownership of a queued job; False if another process got there first"""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE optimization_jobs SET owner_pid = ? WHERE id = ? AND status = 'queued' AND owner_pid IS ?",
+                (owner_pid, job_id, previous_owner_pid)
+            )
+        return cursor.rowcount == 1
+
+    def mark_running(self, job_id):
+        """Start a queued job; False if it was cancelled while it waited"""
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE optimization_jobs SET status = 'running', phase = 'starting', started_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            )
+        return cursor.rowcount == 1
+
+    def update_progress(self, job_id, phase, progress):
+        self._update(job_id, phase=phase, progress=progress)
+        self.publish(job_id, "progress", {"phase": phase, "progress": progress})
+
+    def mark_completed(self, job_id, result):
+        self._update(job_id, status="completed", phase="done", progress=1.0,
+                     result=json.dumps(result), finished_at=time.time())
+        self.publish(job_id, "completed", result)
+
+    def mark_failed(self, job_id, error):
+        self._update(job_id, status="failed", error=error, finished_at=time.time())
+        self.publish(job_id, "failed", {"error": error})
+
+    def mark_cancelled(self, job_id):
+        self._update(job_id, status="cancelled", finished_at=time.time())
+        self.publish(job_id, "cancelled", {})
+
+    def request_cancel(self, job_id, accept_current=False):
+        """Ask for an unfinished job to stop; False if it has already finished.
+        
+        Queued jobs are cancelled at once. A running job stops its search at the
+        next check and either saves its best plan so far (accept_current) or
+        discards it.
+        """
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE optimization_jobs SET status = 'cancelled', finished_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            )
+            if cursor.rowcount == 1:
+                conn.execute(
+                    "INSERT INTO optimization_events (job_id, event, data, created_at) VALUES (?, 'cancelled', '{}', ?)",
+                    (job_id, time.time())
+                )
+                return True
+            cursor = conn.execute(
+                "UPDATE optimization_jobs SET cancel_requested = ? WHERE id = ? AND status = 'running'",
+                ("accept" if accept_current else "discard", job_id)
+            )
+        return cursor.rowcount == 1
+
+    def cancel_requested(self, job_id):
+        """'accept', 'discard' or None"""
+        row = self._connection().execute(
+            "SELECT cancel_requested FROM optimization_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return row["cancel_requested"] if row else None
+
+    def publish(self, job_id, event, data):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO optimization_events (job_id, event, data, created_at) VALUES (?, ?, ?, ?)",
+                (job_id, event, json.dumps(data), time.time())
+            )
+
+    def events(self, job_id, after_id=0):
+        """Events of a job published after the given event ID, oldest first"""
+        rows = self._connection().execute(
+            "SELECT id, event, data FROM optimization_events WHERE job_id = ? AND id > ? ORDER BY id",
+            (job_id, after_id)
+        ).fetchall()
+        return [{"id": row["id"], "event": row["event"], "data": json.loads(row["data"])} for row in rows]
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connection() as conn:
+            conn.execute(f"UPDATE optimization_jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+def _process_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+# Per-process state of worker processes
+_worker_store = None
+_worker_routing_service = None
+
+def _run_optimization(db_path, job_id, params):
+    """Run one optimization inside a worker process and record the outcome.
+    
+    Every improved solution is published as a 'solution' event, with its
+    routes when params has stream_routes. Returns (status, metrics) so the web
+    process can update its metrics registry.
+    """
+    global _worker_store, _worker_routing_service
+
+    if _worker_store is None or _worker_store.db_path != db_path:
+        _worker_store = OptimizationJobStore(db_path)
+    store = _worker_store
+    if not store.mark_running(job_id):
+        return "cancelled", None
+
+    params = dict(params)
+    stream_routes = params.pop('stream_routes', False)
+
+    def publish_solution(solution):
+        if not stream_routes:
+            solution = {key: value for key, value in solution.items() if key != 'routes'}
+        store.publish(job_id, "solution", solution)
+
+    try:
+        # Imported here so the MongoDB client is created inside the worker
+        from services.routing_service import RoutingService, OptimizationCancelled
+        if _worker_routing_service is None:
+            _worker_routing_service = RoutingService()
+
+        # Batches cover a date range instead of a single date, scenario sets compare dry runs
+        if 'start_date' in params:
+            optimize = _worker_routing_service.optimize_routes_for_date_range
+        elif 'scenarios' in params:
+            optimize = _worker_routing_service.compare_scenarios
+        else:
+            optimize = _worker_routing_service.optimize_routes_for_date
+
+        result = optimize(
+            progress_callback=lambda phase, progress: store.update_progress(job_id, phase, progress),
+            solution_callback=publish_solution,
+            cancel_check=lambda: store.cancel_requested(job_id),
+            **params
+        )
+        store.mark_completed(job_id, result)
+        return "completed", result.get('metrics')
+    except OptimizationCancelled:
+        store.mark_cancelled(job_id)
+        return "cancelled", None
+    except Exception as e:
+        print(f"Error running queued optimization {job_id}: {e}")
+        store.mark_failed(job_id, str(e))
+        return "failed", None
+
+class OptimizationQueueService:
+    """Service for running route optimizations in the background.
+
+    Requests are recorded in a local SQLite store and solved on a bounded
+    pool of worker processes (OR-Tools holds the GIL while it searches, so
+    threads would still block the web worker). Callers poll the store for
+    status, progress and results, or read its event stream.
+    """
+
+    def __init__(self, db_path=None, max_workers=None, max_queued=None):
+        self.db_path = db_path or os.environ.get('OPTIMIZATION_QUEUE_PATH', 'optimization_queue.sqlite3')
+        self.max_workers = max_workers or int(os.environ.get('OPTIMIZATION_MAX_WORKERS', 2))
+        self.max_queued = max_queued or int(os.environ.get('OPTIMIZATION_MAX_QUEUED', 100))
+        self.store = OptimizationJobStore(self.db_path)
+        self._executor = None
+        self._lock = threading.Lock()
+        
+        metrics_registry.register_gauge_callback(
+            "routing_optimizations_queued", "Optimizations waiting for a worker", lambda: self.store.count('queued')
+        )
+        metrics_registry.register_gauge_callback(
+            "routing_optimizations_running", "Optimizations being solved", lambda: self.store.count('running')
+        )
+
+    def _get_executor(self):
+        # Created lazily so importing the API module does not spawn processes
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._recover_interrupted()
+            return self._executor
+
+    def _recover_interrupted(self):
+        """Take over jobs whose web process has died: resubmit queued ones, fail running ones"""
+        for job in self.store.unfinished():
+            if _process_alive(job['owner_pid']):
+                continue
+            if job['status'] == 'running':
+                self.store.mark_failed(job['job_id'], "Interrupted by a server restart")
+            elif self.store.claim(job['job_id'], job['owner_pid'], os.getpid()):
+                self._submit(job['job_id'], job['params'], self._executor)
+
+    def enqueue(self, params):
+        """Queue an optimization; params are keyword arguments of the RoutingService method it runs"""
+        if self.store.count('queued') >= self.max_queued:
+            raise QueueFullError("Too many optimizations are already queued")
+
+        job_id = self.store.create(params, os.getpid())
+        try:
+            executor = self._get_executor()
+            try:
+                self._submit(job_id, params, executor)
+            except BrokenProcessPool:
+                # A worker died since the last submission; retry on a new pool
+                self._discard_executor(executor)
+                self._submit(job_id, params, self._get_executor())
+        except Exception as e:
+            self.store.mark_failed(job_id, f"Could not queue the optimization: {e}")
+            raise
+        return job_id
+
+    def _submit(self, job_id, params, executor):
+        future = executor.submit(_run_optimization, self.db_path, job_id, params)
+        future.add_done_callback(partial(self._record_outcome, job_id, executor))
+    
+    def _record_outcome(self, job_id, executor, future):
+        """Fold a finished worker's phase metrics into this process's registry.
+        
+        A worker that died (killed, out of memory) leaves its job unfinished,
+        so the job is failed here, and the pool it broke is replaced.
+        """
+        try:
+            status, metrics = future.result()
+        except Exception as e:
+            print(f"Error running queued optimization {job_id}: {e}")
+            status, metrics = "failed", None
+            job = self.store.get(job_id)
+            if job and job['status'] in ('queued', 'running'):
+                self.store.mark_failed(job_id, f"Optimization worker stopped unexpectedly: {e}")
+            if isinstance(e, BrokenProcessPool):
+                self._discard_executor(executor)
+        metrics_registry.record_optimization(metrics, status=status)
+
+    def _discard_executor(self, executor):
+        """Drop a pool broken by a dead worker so the next optimization starts a new one"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def get_job(self, job_id):
+        return self.store.get(job_id)
+
+    def cancel(self, job_id, accept_current=False):
+        return self.store.request_cancel(job_id, accept_current)
+
+    def get_events(self, job_id, after_id=0):
+        return self.store.events(job_id, after_id)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
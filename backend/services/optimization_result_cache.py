@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+def fingerprint(payload):
+    """SHA-256 of a JSON-compatible payload in canonical form (sorted keys, ObjectIds and datetimes as strings)"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class OptimizationResultCache:
+    """Persistent SQLite store of optimization results keyed by a fingerprint of their inputs.
+
+    Shared by web and worker processes. Entries expire after `ttl` seconds,
+    the least recently used ones are evicted past `max_entries`, and storing
+    a result drops the older ones of its date, whose inputs have since been
+    rewritten. Hit and miss counts live in the store so they cover every
+    process.
+    """
+
+    def __init__(self, db_path=None, ttl=None, max_entries=None):
+        self.db_path = db_path or os.environ.get('ROUTING_RESULT_CACHE_PATH', 'routing_result_cache.sqlite3')
+        self.ttl = ttl if ttl is not None else int(os.environ.get('ROUTING_RESULT_CACHE_TTL', 3600))
+        self.max_entries = max_entries or int(os.environ.get('ROUTING_RESULT_CACHE_MAX_ENTRIES', 100))
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS optimization_results (
+                    fingerprint TEXT PRIMARY KEY,
+                    date TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_optimization_results_date ON optimization_results (date)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS result_cache_counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            """)
+            self._conn.executemany("INSERT OR IGNORE INTO result_cache_counters (name, value) VALUES (?, 0)",
+                                   [("hits",), ("misses",)])
+
+    def get(self, key):
+        """The unexpired result stored under key, or None"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT result FROM optimization_results WHERE fingerprint = ? AND created_at >= ?",
+                (key, now - self.ttl)
+            ).fetchone()
+            if row:
+                self._conn.execute("UPDATE optimization_results SET last_used = ? WHERE fingerprint = ?", (now, key))
+            self._conn.execute("UPDATE result_cache_counters SET value = value + 1 WHERE name = ?",
+                               ("hits" if row else "misses",))
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, date, result):
+        """Store result under key, replacing the earlier results of date"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM optimization_results WHERE date = ?", (date,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO optimization_results (fingerprint, date, result, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, date, json.dumps(result, default=str), now, now)
+            )
+        self.evict()
+
+    def invalidate(self, date=None):
+        """Drop the results of date, or every result"""
+        with self._lock, self._conn:
+            if date is None:
+                return self._conn.execute("DELETE FROM optimization_results").rowcount
+            return self._conn.execute("DELETE FROM optimization_results WHERE date = ?", (date,)).rowcount
+
+    def evict(self):
+        """Drop expired results, then the least recently used ones beyond max_entries"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM optimization_results WHERE created_at < ?", (time.time() - self.ttl,))
+            self._conn.execute("""
+                DELETE FROM optimization_results WHERE fingerprint IN (
+                    SELECT fingerprint FROM optimization_results ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def stats(self):
+        """Hit/miss counters of every process and the number of stored results"""
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM result_cache_counters").fetchall())
+            entries = self._conn.execute("SELECT COUNT(*) FROM optimization_results").fetchone()[0]
+        total = counters['hits'] + counters['misses']
+        return {
+            "hits": counters['hits'],
+            "misses": counters['misses'],
+            "hit_rate": counters['hits'] / total if total else 0.0,
+            "entries": entries
+        }
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM optimization_results")
+            self._conn.execute("UPDATE result_cache_counters SET value = 0")
@@ -0,0 +1,251 @@
+import multiprocessing
+import os
+import time
+import numpy as np
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from ortools.constraint_solver import routing_enums_pb2
+from dotenv import load_dotenv
+from utils.shared_memory_utils import SharedMatrix
+
+# Load environment variables
+load_dotenv()
+
+# Search configurations raced by a portfolio, in order of preference (the first keeps the warm start).
+# OR-Tools routing has no random seed, so a seed shuffles the order of the job nodes instead, which
+# changes how the first solution heuristic and the local search break ties.
+PORTFOLIO_CONFIGURATIONS = [
+    {"name": "insertion-gls", "first_solution_strategy": "PARALLEL_CHEAPEST_INSERTION",
+     "metaheuristic": "GUIDED_LOCAL_SEARCH", "seed": 0},
+    {"name": "arc-gls", "first_solution_strategy": "PATH_CHEAPEST_ARC",
+     "metaheuristic": "GUIDED_LOCAL_SEARCH", "seed": 0},
+    {"name": "local-insertion-annealing", "first_solution_strategy": "LOCAL_CHEAPEST_INSERTION",
+     "metaheuristic": "SIMULATED_ANNEALING", "seed": 0},
+    {"name": "insertion-tabu", "first_solution_strategy": "PARALLEL_CHEAPEST_INSERTION",
+     "metaheuristic": "TABU_SEARCH", "seed": 0},
+    {"name": "insertion-gls-shuffled", "first_solution_strategy": "PARALLEL_CHEAPEST_INSERTION",
+     "metaheuristic": "GUIDED_LOCAL_SEARCH", "seed": 1},
+    {"name": "savings-gls", "first_solution_strategy": "SAVINGS",
+     "metaheuristic": "GUIDED_LOCAL_SEARCH", "seed": 0},
+    {"name": "arc-tabu-shuffled", "first_solution_strategy": "PATH_CHEAPEST_ARC",
+     "metaheuristic": "TABU_SEARCH", "seed": 2},
+    {"name": "global-insertion-gls", "first_solution_strategy": "GLOBAL_CHEAPEST_INSERTION",
+     "metaheuristic": "GUIDED_LOCAL_SEARCH", "seed": 0},
+]
+
+# Share of the time budget after which a configuration trailing the best one is cancelled
+LOSER_GRACE_SHARE = 0.5
+
+# How far, in percent, a configuration may trail the best objective before it is cancelled
+LOSER_MARGIN_PERCENT = 2.0
+
+# Longest wait for the workers to start before the race starts without the missing ones
+STARTUP_TIMEOUT_SECONDS = float(os.environ.get('ROUTING_PORTFOLIO_STARTUP_TIMEOUT', 120))
+
+# Per-process state of worker processes, set once by _init_portfolio_worker
+_worker_routing_service = None
+_worker_shared_matrices = None
+_worker_best_objective = None
+_worker_stop_event = None
+_worker_race = None
+
+def _init_portfolio_worker(matrix_handle, arcs_handle, best_objective, stop_event, race):
+    """Attach to the shared matrices and the race's shared best objective, stop flag and start signal"""
+    global _worker_shared_matrices, _worker_best_objective, _worker_stop_event, _worker_race
+    _worker_shared_matrices = (
+        SharedMatrix.attach(matrix_handle), SharedMatrix.attach(arcs_handle) if arcs_handle else None
+    )
+    _worker_best_objective = best_objective
+    _worker_stop_event = stop_event
+    _worker_race = race
+
+def _solve_configuration(configuration, jobs, technicians, date, overtime_minutes, search_parameters,
+                         plateau=None, initial_routes=None):
+    """Solve the shared model with one configuration inside a worker process.
+
+    Once its model is built, the worker reports ready and waits for the race
+    to start; the search then ends by the race's deadline, so process start-up
+    does not count against the budget. Returns (sequences, solve_metrics) with
+    sequences in the shared matrix's node numbering, or (None, None) when no
+    solution was found.
+    """
+    global _worker_routing_service
+
+    if _worker_routing_service is None:
+        # Imported here so the MongoDB client is created inside the worker
+        from services.routing_service import RoutingService
+        _worker_routing_service = RoutingService()
+
+    service = _worker_routing_service
+    num_technicians = len(technicians)
+
+    # Shuffle the job nodes for seeded configurations
+    order = np.arange(len(jobs))
+    if configuration['seed']:
+        order = np.random.default_rng(configuration['seed']).permutation(len(jobs))
+    nodes = list(range(num_technicians)) + [num_technicians + int(job_idx) for job_idx in order]
+    local_nodes = {node: local_node for local_node, node in enumerate(nodes)}
+
+    matrix_share, arcs_share = _worker_shared_matrices
+    data = service._create_data_model(
+        matrix_share.array[np.ix_(nodes, nodes)], [jobs[job_idx] for job_idx in order], technicians, date,
+        arcs_share.array[np.ix_(nodes, nodes)] if arcs_share else None, overtime_minutes
+    )
+
+    # Every configuration searches from the same start
+    ready_count, start_event, deadline = _worker_race
+    with ready_count.get_lock():
+        ready_count.value += 1
+    start_event.wait()
+    search_parameters = service._with_time_limit(search_parameters, deadline.value - time.time())
+    search_parameters.first_solution_strategy = getattr(
+        routing_enums_pb2.FirstSolutionStrategy, configuration['first_solution_strategy']
+    )
+    search_parameters.local_search_metaheuristic = getattr(
+        routing_enums_pb2.LocalSearchMetaheuristic, configuration['metaheuristic']
+    )
+    if initial_routes:
+        initial_routes = [[local_nodes[node] for node in route] for route in initial_routes]
+
+    # Publish improvements to the race, and give up once clearly beaten
+    start = time.perf_counter()
+    budget_seconds = search_parameters.time_limit.ToMilliseconds() / 1000
+    own_best = [None]
+
+    def on_objective(objective):
+        own_best[0] = objective
+        with _worker_best_objective.get_lock():
+            if _worker_best_objective.value < 0 or objective < _worker_best_objective.value:
+                _worker_best_objective.value = objective
+
+    def should_stop():
+        if _worker_stop_event.is_set():
+            return True
+        best = _worker_best_objective.value
+        return (time.perf_counter() - start >= budget_seconds * LOSER_GRACE_SHARE and own_best[0] is not None
+                and own_best[0] > best * (1 + LOSER_MARGIN_PERCENT / 100.0))
+
+    # Every improvement counts, so that a configuration is not judged on a stale objective;
+    # only the objective is read, not the routes
+    solution = service._solve_vrp(data, search_parameters, initial_routes, plateau, should_stop=should_stop,
+                                  objective_callback=on_objective)
+    if not solution:
+        return None, None
+
+    # Back to the shared numbering
+    sequences = [
+        [(nodes[node], arrival) for node, arrival in sequence]
+        for sequence in service._extract_sequences(solution, data)
+    ]
+    return sequences, solution.solve_metrics
+
+class PortfolioService:
+    """Service for racing several search configurations on one routing model.
+
+    Each configuration pairs a first solution strategy with a local search
+    metaheuristic and a seed, and runs in its own process for the whole time
+    budget against the model's matrix in shared memory. Configurations share
+    their best objective, and one that still trails the best by more than
+    LOSER_MARGIN_PERCENT past LOSER_GRACE_SHARE of the budget stops early.
+    The best plan wins. The budget's clock starts once every worker has
+    started and built its model.
+    """
+
+    def __init__(self, max_workers=None, configurations=None):
+        self.max_workers = max_workers or int(os.environ.get('ROUTING_MAX_WORKERS', os.cpu_count() or 1))
+        self.configurations = configurations or PORTFOLIO_CONFIGURATIONS
+
+    def solve(self, data, jobs, technicians, search_parameters, plateau=None, initial_routes=None,
+              should_stop=None):
+        """Race up to max_workers configurations on a data model.
+
+        initial_routes seed the first configuration only, so the others start
+        from their own first solution strategy. should_stop() cancels every
+        configuration. Returns (sequences, solve_metrics) of the best plan, with
+        solve_metrics['portfolio'] naming the winner, summarizing every
+        configuration and giving the workers' startup_seconds, or (None, None)
+        when none found a solution.
+        """
+        configurations = self.configurations[:max(1, self.max_workers)]
+        context = multiprocessing.get_context('spawn')
+        best_objective = context.Value('q', -1)
+        stop_event = context.Event()
+        race = (context.Value('i', 0), context.Event(), context.Value('d', 0.0))
+        startup_start = time.time()
+
+        outcomes = {}
+        with SharedMatrix.create(data['distance_matrix']) as matrix_share, \
+                (SharedMatrix.create(data['candidate_arcs']) if data.get('candidate_arcs') is not None
+                 else nullcontext()) as arcs_share, \
+                ProcessPoolExecutor(max_workers=len(configurations), mp_context=context,
+                                    initializer=_init_portfolio_worker,
+                                    initargs=(matrix_share.handle, arcs_share.handle if arcs_share else None,
+                                              best_objective, stop_event, race)) as executor:
+            futures = {
+                executor.submit(
+                    _solve_configuration, configuration, jobs, technicians, data.get('date'),
+                    data.get('overtime_minutes', 0), search_parameters, plateau,
+                    initial_routes if position == 0 else None
+                ): configuration['name']
+                for position, configuration in enumerate(configurations)
+            }
+            race_start = self._start_race(race, futures, search_parameters, stop_event, should_stop)
+
+            # Pass a cancellation on to the racing configurations
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+                if should_stop and not stop_event.is_set() and should_stop():
+                    stop_event.set()
+                for future in done:
+                    try:
+                        outcomes[futures[future]] = future.result()
+                    except Exception as e:
+                        print(f"Error solving routing portfolio configuration {futures[future]}: {e}")
+                        outcomes[futures[future]] = (None, None)
+
+        # Best objective wins; ties go to the configuration listed first
+        summary = []
+        winner = None
+        for configuration in configurations:
+            sequences, solve_metrics = outcomes.get(configuration['name'], (None, None))
+            summary.append({
+                "name": configuration['name'],
+                "objective": solve_metrics['objective'] if solve_metrics else None,
+                "solve_seconds": solve_metrics['solve_seconds'] if solve_metrics else None,
+                "stop_reason": solve_metrics['stop_reason'] if solve_metrics else "no_solution"
+            })
+            if solve_metrics and (winner is None or solve_metrics['objective'] < winner[1]['objective']):
+                winner = (sequences, solve_metrics, configuration)
+
+        if winner is None:
+            return None, None
+
+        sequences, solve_metrics, configuration = winner
+        # A loser's early stop is reported as cancelled by its own tracker
+        for row in summary:
+            if row['name'] != configuration['name'] and row['stop_reason'] == 'cancelled' \
+                    and not stop_event.is_set():
+                row['stop_reason'] = 'outpaced'
+        solve_metrics['portfolio'] = {"winner": configuration, "configurations": summary,
+                                      "startup_seconds": round(race_start - startup_start, 3)}
+        return sequences, solve_metrics
+
+    def _start_race(self, race, futures, search_parameters, stop_event, should_stop=None):
+        """Wait until every worker is ready, then start the budget's clock; returns the start time"""
+        ready_count, start_event, deadline = race
+        timeout = time.time() + STARTUP_TIMEOUT_SECONDS
+        try:
+            # A task that ends before the start has failed and never reports ready
+            while ready_count.value < len(futures) and time.time() < timeout \
+                    and not any(future.done() for future in futures):
+                if should_stop and should_stop():
+                    stop_event.set()
+                    break
+                time.sleep(0.05)
+        finally:
+            # Waiting workers are always released
+            start = time.time()
+            deadline.value = start + search_parameters.time_limit.ToMilliseconds() / 1000
+            start_event.set()
+        return start
@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+from dotenv import load_dotenv
+from services.distance_matrix_service import MISSING
+from utils.geo_utils import locations_to_arrays, haversine_km, project_equirectangular
+
+# Load environment variables
+load_dotenv()
+
+# Speed between a location and its nearest graph node (driveways, unmapped side streets)
+ACCESS_SPEED_KMH = 20
+
+# Locations farther than this from every graph node are treated as off the network
+MAX_SNAP_KM = 2.0
+
+# Sources searched together; each batch holds a sources x graph nodes float64 array
+SOURCE_BATCH_SIZE = 64
+
+class RoadNetworkService:
+    """Service for travel-time matrices on a local road graph, with no network calls.
+
+    The graph is a JSON file:
+
+        {"nodes": [[id, lat, lng], ...],
+         "edges": [[from_id, to_id, length_km, speed_kmh, oneway], ...]}
+
+    length_km may be null to use the straight-line length, and oneway is 1
+    for edges that can only be driven from from_id to to_id. Locations are
+    snapped to their nearest node through a k-d tree. A row of the matrix
+    comes from one one-to-many shortest-path search from its origin, and a
+    column from one search from its destination on the reversed graph.
+    """
+
+    def __init__(self, graph_path=None, access_speed_kmh=ACCESS_SPEED_KMH, max_snap_km=MAX_SNAP_KM):
+        self.graph_path = graph_path or os.environ.get('ROAD_NETWORK_PATH')
+        self.access_speed_kmh = access_speed_kmh
+        self.max_snap_km = max_snap_km
+        self.search_count = 0
+        self._graph = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        # Loaded on first use so creating the service stays cheap
+        with self._lock:
+            if self._graph is None:
+                with open(self.graph_path) as graph_file:
+                    self._graph = self._build_graph(json.load(graph_file))
+            return self._graph
+
+    def _build_graph(self, raw):
+        node_ids = [node[0] for node in raw['nodes']]
+        position = {node_id: idx for idx, node_id in enumerate(node_ids)}
+        lats = np.array([node[1] for node in raw['nodes']], dtype=np.float64)
+        lngs = np.array([node[2] for node in raw['nodes']], dtype=np.float64)
+
+        origins, destinations, minutes = [], [], []
+        for from_id, to_id, length_km, speed_kmh, oneway in raw['edges']:
+            origin, destination = position[from_id], position[to_id]
+            if length_km is None:
+                length_km = float(haversine_km(lats[origin], lngs[origin], lats[destination], lngs[destination]))
+            edge_minutes = length_km / speed_kmh * 60
+            origins.append(origin)
+            destinations.append(destination)
+            minutes.append(edge_minutes)
+            if not oneway:
+                origins.append(destination)
+                destinations.append(origin)
+                minutes.append(edge_minutes)
+
+        # csr_matrix sums duplicate edges, so keep only the fastest of parallel edges
+        fastest = {}
+        for origin, destination, edge_minutes in zip(origins, destinations, minutes):
+            key = (origin, destination)
+            if key not in fastest or edge_minutes < fastest[key]:
+                fastest[key] = edge_minutes
+        keys = list(fastest)
+        adjacency = csr_matrix(
+            # Zero-length edges would be dropped as missing, so floor them at a millisecond
+            (np.maximum([fastest[key] for key in keys], 1e-5),
+             ([key[0] for key in keys], [key[1] for key in keys])),
+            shape=(len(node_ids), len(node_ids))
+        )
+
+        reference_lat = lats.mean()
+        return {
+            "adjacency": adjacency,
+            "reverse_adjacency": adjacency.T.tocsr(),
+            "lats": lats,
+            "lngs": lngs,
+            "reference_lat": reference_lat,
+            "tree": cKDTree(project_equirectangular(lats, lngs, reference_lat))
+        }
+
+    def snap(self, locations):
+        """Nearest graph node of each location and the access time to it in minutes (inf when off the network)"""
+        graph = self._load()
+        lats, lngs = locations_to_arrays(locations)
+        _, nodes = graph['tree'].query(project_equirectangular(lats, lngs, graph['reference_lat']), k=1)
+        access_km = haversine_km(lats, lngs, graph['lats'][nodes], graph['lngs'][nodes])
+        access_minutes = np.where(access_km <= self.max_snap_km, access_km / self.access_speed_kmh * 60, np.inf)
+        return nodes, access_minutes
+
+    def build_matrix(self, locations, mask=None):
+        """Build a travel-time matrix (minutes, int32) between all locations.
+
+        mask optionally selects the cells that are needed. They are covered
+        with as few searches as possible: whole rows from their origins and
+        whole columns from their destinations, so a location new to an
+        existing matrix costs two searches. Other cells, and pairs the graph
+        cannot connect, are set to MISSING.
+        """
+        n = len(locations)
+        matrix = np.full((n, n), MISSING, dtype=np.int32)
+        np.fill_diagonal(matrix, 0)
+        if n == 0:
+            return matrix
+
+        nodes, access_minutes = self.snap(locations)
+        on_network = np.isfinite(access_minutes)
+        if mask is None:
+            origins, destinations = np.flatnonzero(on_network), np.array([], dtype=int)
+        else:
+            origins, destinations = self._search_cover(mask & on_network[:, None] & on_network[None, :])
+
+        graph = self._load()
+        for origin, node_minutes in self._search(graph['adjacency'], nodes, origins):
+            minutes = access_minutes[origin] + node_minutes + access_minutes
+            reachable = on_network & np.isfinite(minutes)
+            reachable[origin] = False
+            matrix[origin, reachable] = np.rint(minutes[reachable]).astype(np.int32)
+        for destination, node_minutes in self._search(graph['reverse_adjacency'], nodes, destinations):
+            minutes = access_minutes + node_minutes + access_minutes[destination]
+            reachable = on_network & np.isfinite(minutes)
+            reachable[destination] = False
+            matrix[reachable, destination] = np.rint(minutes[reachable]).astype(np.int32)
+
+        return matrix
+
+    def _search_cover(self, needed):
+        """Rows and columns that together hold every needed cell, taking the one with most uncovered cells first"""
+        needed = needed.copy()
+        np.fill_diagonal(needed, False)
+        row_counts = needed.sum(axis=1)
+        needed_origins = row_counts > 0
+        column_counts = needed.sum(axis=0)
+        rows, columns = [], []
+        while row_counts.any():
+            row, column = int(row_counts.argmax()), int(column_counts.argmax())
+            if row_counts[row] >= column_counts[column]:
+                rows.append(row)
+                column_counts -= needed[row]
+                row_counts[row] = 0
+                needed[row, :] = False
+            else:
+                columns.append(column)
+                row_counts -= needed[:, column]
+                column_counts[column] = 0
+                needed[:, column] = False
+        # Scattered cells are covered no better than by searching every origin with one
+        origins = np.flatnonzero(needed_origins)
+        if len(rows) + len(columns) >= len(origins):
+            return origins, np.array([], dtype=int)
+        return np.array(rows, dtype=int), np.array(columns, dtype=int)
+
+    def _search(self, adjacency, nodes, sources):
+        """Yield (source location, minutes from its node to every location's node) for each source"""
+        # Locations sharing a node share a search
+        source_nodes, source_of_location = np.unique(nodes[sources], return_inverse=True)
+        for start in range(0, len(source_nodes), SOURCE_BATCH_SIZE):
+            batch = source_nodes[start:start + SOURCE_BATCH_SIZE]
+            node_minutes = dijkstra(adjacency, directed=True, indices=batch)[:, nodes]
+            self.search_count += len(batch)
+
+            in_batch = (source_of_location >= start) & (source_of_location < start + len(batch))
+            for source, row in zip(sources[in_batch], source_of_location[in_batch] - start):
+                yield source, node_minutes[row]
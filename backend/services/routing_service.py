@@ -1,16 +1,56 @@
 import os
-import requests
+import numpy as np
+from scipy.spatial import cKDTree
 from datetime import datetime, timedelta
-from haversine import haversine
 from ortools.constraint_solver import routing_enums_pb2
 from ortools.constraint_solver import pywrapcp
 from services.job_service import JobService
 from services.technician_service import TechnicianService
+from services.distance_matrix_service import DistanceMatrixService, MISSING, UNAVAILABLE
+from services.travel_time_cache import TravelTimeCache
+from services.travel_time_profile import TravelTimeProfile
+from services.optimization_result_cache import OptimizationResultCache, fingerprint
+from services.road_network_service import RoadNetworkService
+from services.day_matrix_cache import DayMatrixCache
+from services.decomposition_service import DecompositionService
+from services.multi_day_service import MultiDayService
+from services.scenario_service import ScenarioService
+from services.portfolio_service import PortfolioService
+from services.metrics_service import PhaseRecorder, metrics_registry
+from utils.geo_utils import locations_to_arrays, haversine_time_matrix, haversine_km, minutes_from_km, \
+    project_equirectangular
+from utils.route_utils import MAX_ROUTE_MINUTES, MAX_WAITING_MINUTES, schedule_route, best_insertion
+from utils.search_utils import SearchTracker
+from utils.feasibility_utils import screen_jobs, NO_QUALIFIED_TECHNICIAN
+from utils.skill_utils import build_skill_index, required_skills, eligible_bitset, bitset_members
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+MINUTES_PER_DAY = 24 * 60
+
+# Extra arc cost, in minutes, of travelling between locations that are not near neighbors in a
+# sparse model. Two hours outweighs any in-city detour, and keeps most penalized entries at or
+# below 256, which CPython shares instead of allocating when the matrix is handed to OR-Tools.
+SPARSE_ARC_PENALTY = 120
+
+# Objective cost of leaving a servable job out of the plan. Far above any detour a job adds, so the
+# solver only drops jobs the fleet cannot fit, but it still returns a partial plan when it must.
+DROP_PENALTY = 10 * MINUTES_PER_DAY
+
+# Share of the search budget kept for re-solving once a plan's departures are known
+PROFILE_REFINEMENT_SHARE = 0.2
+
+# Share of the search budget a decomposed solve keeps for re-solving the zones around dropped jobs
+REINSERTION_SHARE = 0.2
+
+# Job fields a saved plan writes; everything else about a job is an input it leaves as it was
+PLAN_FIELDS = ('status', 'technician_id', 'estimated_arrival_time', 'estimated_departure_time', 'updated_at')
+
+class OptimizationCancelled(Exception):
+    """Raised when an optimization is cancelled and its plan discarded"""
+
 class RoutingService:
     """Service for optimizing technician routes"""
     
@@ -18,59 +58,750 @@ class RoutingService:
         self.job_service = JobService()
         self.technician_service = TechnicianService()
         self.google_maps_api_key = os.environ.get('GOOGLE_MAPS_API_KEY')
+        self.distance_matrix_service = DistanceMatrixService(api_key=self.google_maps_api_key)
+        # A local road graph, when configured, is used instead of the Distance Matrix API
+        self.road_network_service = RoadNetworkService() if os.environ.get('ROAD_NETWORK_PATH') else None
+        self.travel_time_cache = TravelTimeCache()
+        # Each date's matrix is kept between optimizations and only extended for new locations
+        self.day_matrices = DayMatrixCache()
+        # Time-of-day multipliers applied to base travel times, when configured
+        self.travel_time_profile = TravelTimeProfile.from_environment(self.travel_time_cache)
+        self.result_cache = OptimizationResultCache()
+        metrics_registry.register_gauge_callback(
+            "routing_result_cache_hit_ratio", "Share of optimizations answered with a stored plan",
+            lambda: self.result_cache.stats()['hit_rate']
+        )
+        metrics_registry.register_gauge_callback(
+            "routing_result_cache_entries", "Stored optimization plans", lambda: self.result_cache.stats()['entries']
+        )
+        self.decomposition_service = DecompositionService()
+        self.multi_day_service = MultiDayService()
+        self.scenario_service = ScenarioService()
+        self.portfolio_service = PortfolioService()
+        # Smallest ETA change, in minutes, that live updates write back
+        self.eta_update_threshold = int(os.environ.get('ETA_UPDATE_THRESHOLD_MINUTES', 5))
     
-    def optimize_routes_for_date(self, date, technician_ids=None, consider_traffic=True, consider_weather=True):
-        """Optimize routes for technicians on a specific date"""
+    def optimize_routes_for_date(self, date, technician_ids=None, consider_traffic=True, consider_weather=True,
+                                 progress_callback=None, decompose=False, warm_start=True,
+                                 time_limit_seconds=None, solution_limit=None, plateau_percent=None,
+                                 plateau_seconds=None, solution_callback=None, cancel_check=None,
+                                 sparse_neighbors=None, memoize=True, dry_run=False, exclude_technician_ids=None,
+                                 overtime_minutes=0, portfolio=False):
+        """Optimize routes for technicians on a specific date.
+        
+        progress_callback, if given, is called as progress_callback(phase, progress)
+        with progress between 0 and 1 as each phase starts. With decompose=True
+        the day is split into geographic zones solved in parallel processes.
+        With warm_start=True, jobs already assigned for the date are re-optimized
+        together with the pending ones, starting from the persisted plan.
+        With sparse_neighbors=k, travel times are only looked up between each job
+        and its k nearest jobs and its qualified technicians; other arcs get a
+        straight-line estimate plus SPARSE_ARC_PENALTY (not with decompose=True).
+        With consider_traffic and a travel-time profile configured, each stop's
+        travel times come from the profile bucket of its departure time;
+        otherwise traffic-aware travel times are for the planned day, not now.
+        With portfolio=True several search configurations race in parallel
+        processes and the best plan wins (not with decompose=True; with a
+        travel-time profile the plan is then not refined).
+        
+        The search stops at time_limit_seconds, after solution_limit solutions, or
+        once the objective has not improved by plateau_percent in plateau_seconds.
+        
+        solution_callback, if given, receives each improved solution found by the
+        search as {"objective", "assigned_jobs", "elapsed_seconds", "routes"}
+        (not with decompose=True or portfolio=True). cancel_check() returns None to keep going,
+        'accept' to stop the search and save the best plan so far, or 'discard'
+        to stop and raise OptimizationCancelled without saving anything.
+        
+        With memoize and warm_start, a plan saved from exactly the same job and
+        technician documents and parameters (within ROUTING_RESULT_CACHE_TTL)
+        is returned without solving or writing anything.
+        
+        What-if options: exclude_technician_ids leaves technicians out and
+        re-plans their jobs, and overtime_minutes extends every shift and the
+        maximum route length. With dry_run=True nothing is written; the result
+        carries the plan's "assignments" for commit_assignments instead.
+        """
         try:
-            # Get all jobs for the date
-            jobs = self.job_service.get_all_jobs(date=date, status="pending")
+            recorder = PhaseRecorder()
+            params = {
+                "technician_ids": technician_ids, "consider_traffic": consider_traffic,
+                "consider_weather": consider_weather, "decompose": decompose,
+                "time_limit_seconds": time_limit_seconds, "solution_limit": solution_limit,
+                "plateau_percent": plateau_percent, "plateau_seconds": plateau_seconds,
+                "sparse_neighbors": sparse_neighbors, "exclude_technician_ids": exclude_technician_ids,
+                "overtime_minutes": overtime_minutes, "portfolio": portfolio
+            }
+            
+            # Get all jobs for the date and available technicians
+            self._report_progress(progress_callback, 'fetching', 0.0)
+            with recorder.phase('fetch'):
+                jobs, technicians = self._fetch_day_inputs(date, technician_ids, warm_start, exclude_technician_ids)
             
             # If no jobs, return empty result
             if not jobs:
-                return {"routes": [], "metrics": {"total_jobs": 0, "assigned_jobs": 0}}
+                return {"routes": [], "metrics": {"total_jobs": 0, "assigned_jobs": 0, "phases": recorder.phases}}
             
-            # Get available technicians
-            if technician_ids:
-                technicians = [self.technician_service.get_technician_by_id(tech_id) for tech_id in technician_ids]
-                technicians = [tech for tech in technicians if tech and tech.get('status') == 'available']
-            else:
-                technicians = self.technician_service.get_all_technicians(status="available")
+            # Unchanged inputs: return the plan already saved from them
+            memoize = memoize and warm_start and not dry_run and bool(technicians)
+            if memoize:
+                with recorder.phase('fingerprint'):
+                    cached = self.result_cache.get(self._input_fingerprint(date, jobs, technicians, params))
+                if cached:
+                    cached['metrics']['result_cache'] = 'hit'
+                    cached['metrics']['phases'] = recorder.phases
+                    return cached
+            input_jobs = jobs
             
             # If no technicians, return empty result
             if not technicians:
-                return {"routes": [], "metrics": {"total_jobs": len(jobs), "assigned_jobs": 0}}
+                return {"routes": [], "metrics": {"total_jobs": len(jobs), "assigned_jobs": 0,
+                                                  "phases": recorder.phases}}
+            
+            # Jobs nobody is qualified for stay pending instead of making the model infeasible
+            total_jobs = len(jobs)
+            jobs, unqualified_jobs = self._split_unqualified_jobs(jobs, technicians)
+            if not jobs:
+                return {"routes": [], "metrics": {"total_jobs": total_jobs, "assigned_jobs": 0,
+                                                  "unservable_jobs": self._unqualified_metrics(unqualified_jobs),
+                                                  "phases": recorder.phases}}
             
-            # Build distance matrix
-            distance_matrix, locations = self._build_distance_matrix(jobs, technicians, consider_traffic)
+            # Build distance matrix; a profile varies base travel times by time of day instead of live traffic
+            self._report_progress(progress_callback, 'matrix', 0.1)
+            time_dependent = consider_traffic and self.travel_time_profile is not None
+            matrix_traffic = consider_traffic and not time_dependent
+            departure = self._planned_departure(date, technicians)
+            with recorder.phase('matrix') as matrix_phase:
+                api_calls_before = self.distance_matrix_service.request_count
+                candidate_arcs = None
+                if sparse_neighbors and not decompose:
+                    candidate_arcs = self._candidate_arcs(jobs, technicians, sparse_neighbors)
+                    distance_matrix, locations = self._build_sparse_distance_matrix(
+                        jobs, technicians, candidate_arcs, matrix_traffic, departure
+                    )
+                    matrix_phase['candidate_arcs'] = int(candidate_arcs.sum())
+                else:
+                    distance_matrix, locations, reused = self._build_day_distance_matrix(
+                        date, jobs, technicians, matrix_traffic, departure
+                    )
+                    matrix_phase['reused_locations'] = reused
+                matrix_phase['api_calls'] = self.distance_matrix_service.request_count - api_calls_before
+                matrix_phase['matrix_locations'] = len(locations)
             
             # Create data model for OR-Tools
-            data = self._create_data_model(distance_matrix, jobs, technicians)
+            self._report_progress(progress_callback, 'model', 0.3)
+            with recorder.phase('model'):
+                data = self._create_data_model(distance_matrix, jobs, technicians, date, candidate_arcs,
+                                               overtime_minutes)
+                if time_dependent:
+                    self._apply_travel_time_profile(data)
+                search_parameters = self._search_parameters(time_limit_seconds, solution_limit)
+                plateau = (plateau_percent, plateau_seconds) if plateau_seconds else None
+                initial_routes = (
+                    self._initial_routes(data, jobs, technicians) if warm_start and not decompose else None
+                )
+            
+            # Nothing to keep if cancelled before the search starts
+            if cancel_check and cancel_check():
+                raise OptimizationCancelled("Optimization cancelled before solving")
+            
+            # Stream improved solutions in the routes response shape
+            def on_solution(objective, elapsed_seconds, sequences):
+                partial_routes = self._build_routes(sequences, jobs, technicians)
+                solution_callback({
+                    "objective": objective,
+                    "assigned_jobs": sum(len(route['jobs']) for route in partial_routes),
+                    "elapsed_seconds": round(elapsed_seconds, 3),
+                    "routes": partial_routes
+                })
             
             # Solve the VRP problem
-            solution = self._solve_vrp(data)
+            self._report_progress(progress_callback, 'solving', 0.35)
+            solve_metrics = {}
+            with recorder.phase('solve'):
+                if decompose:
+                    sequences, solve_metrics = self._solve_decomposed(
+                        data, jobs, technicians, search_parameters, plateau
+                    )
+                    routes = self._build_routes(sequences, jobs, technicians)
+                elif portfolio:
+                    sequences, solve_metrics = self.portfolio_service.solve(
+                        data, jobs, technicians, search_parameters, plateau, initial_routes,
+                        (lambda: cancel_check() is not None) if cancel_check else None
+                    )
+                    solve_metrics = solve_metrics or {"stop_reason": "no_solution"}
+                    if sequences and candidate_arcs is not None:
+                        solve_metrics['non_candidate_arcs'] = self._count_non_candidate_arcs(sequences, candidate_arcs)
+                    routes = self._build_routes(sequences, jobs, technicians) if sequences else []
+                else:
+                    solve = self._solve_time_dependent if time_dependent else self._solve_vrp
+                    solution = solve(data, search_parameters, initial_routes, plateau,
+                                     on_solution if solution_callback else None,
+                                     (lambda: cancel_check() is not None) if cancel_check else None)
+                    if solution:
+                        solve_metrics = solution.solve_metrics
+                        if candidate_arcs is not None:
+                            solve_metrics['non_candidate_arcs'] = self._count_non_candidate_arcs(
+                                self._extract_sequences(solution, data), candidate_arcs
+                            )
+                    routes = self._process_solution(solution, data, jobs, technicians, locations)
+                solve_metrics.update(self._screening_metrics(data, jobs, technicians, routes, unqualified_jobs))
             
-            # Process solution
-            routes = self._process_solution(solution, data, jobs, technicians, locations)
+            if cancel_check and cancel_check() == 'discard':
+                raise OptimizationCancelled("Optimization cancelled, plan discarded")
             
             # Assign jobs to technicians based on the solution
-            assigned_jobs = self._assign_jobs_to_technicians(routes)
+            self._report_progress(progress_callback, 'saving', 0.9)
+            assignments = self._plan_assignments(routes, jobs)
+            if dry_run:
+                assigned_jobs, skipped_jobs = len(assignments), []
+            else:
+                with recorder.phase('save'):
+                    assigned_jobs, skipped_jobs = self.commit_assignments(assignments)
             
             # Return the optimized routes and metrics
-            return {
+            result = {
                 "routes": routes,
                 "metrics": {
-                    "total_jobs": len(jobs),
-                    "assigned_jobs": assigned_jobs
+                    "total_jobs": total_jobs,
+                    "assigned_jobs": assigned_jobs,
+                    "skipped_jobs": skipped_jobs,
+                    **solve_metrics,
+                    "phases": recorder.phases
                 }
             }
             
+            if dry_run:
+                result['assignments'] = assignments
+                result['metrics']['dry_run'] = True
+            
+            # A plan cut short by a cancellation is not what re-running would give
+            if memoize and not skipped_jobs and solve_metrics.get('stop_reason') != 'cancelled':
+                with recorder.phase('memoize'):
+                    stored = self._memoize_result(date, params, input_jobs, technicians, routes, result)
+                if stored:
+                    result['metrics']['result_cache'] = 'miss'
+            
+            return result
+            
+        except OptimizationCancelled:
+            raise
         except Exception as e:
             print(f"Error optimizing routes: {e}")
             raise
     
-    def _build_distance_matrix(self, jobs, technicians, consider_traffic=True):
-        """Build distance matrix between all locations"""
-        # Collect all locations (technician starting points + job locations)
+    def optimize_routes_for_date_range(self, start_date, end_date, technician_ids=None, consider_traffic=True,
+                                       consider_weather=True, progress_callback=None, warm_start=True,
+                                       time_limit_seconds=None, solution_limit=None, plateau_percent=None,
+                                       plateau_seconds=None, solution_callback=None, cancel_check=None):
+        """Optimize routes for every date from start_date to end_date (inclusive) in one batch.
+        
+        Jobs and technicians are fetched once, one travel-time matrix covering
+        the locations of every day is built once, and the days are solved in
+        parallel processes that share it. Each day's search gets the full
+        search budget. The plan of all days is saved in a single bulk write.
+        
+        Intermediate solutions are not reported (solution_callback is accepted
+        so queued batches run like single dates); cancel_check is honoured
+        before solving and before saving.
+        """
+        try:
+            recorder = PhaseRecorder()
+            first_day = datetime.strptime(start_date, '%Y-%m-%d')
+            dates = [
+                (first_day + timedelta(days=offset)).strftime('%Y-%m-%d')
+                for offset in range((datetime.strptime(end_date, '%Y-%m-%d') - first_day).days + 1)
+            ]
+            
+            # Get all jobs of the range and the technicians once
+            self._report_progress(progress_callback, 'fetching', 0.0)
+            with recorder.phase('fetch'):
+                jobs = self.job_service.get_jobs_for_date_range(start_date, end_date, status="pending")
+                if warm_start:
+                    jobs = self.job_service.get_jobs_for_date_range(start_date, end_date, status="assigned") + jobs
+                technicians = self._get_available_technicians(technician_ids) if jobs else []
+            
+            # Jobs assigned to technicians outside this optimization keep their plan
+            selected_ids = {tech['_id'] for tech in technicians}
+            jobs = [job for job in jobs if job.get('status') == 'pending' or job.get('technician_id') in selected_ids]
+            total_jobs = len(jobs)
+            job_dates = {job['_id']: job['scheduled_date'] for job in jobs}
+            jobs, unqualified_jobs = (
+                self._split_unqualified_jobs(jobs, technicians) if technicians else ([], [job['_id'] for job in jobs])
+            )
+            
+            days = {date: [] for date in dates}
+            for job_idx, job in enumerate(jobs):
+                days[job['scheduled_date']].append(job_idx)
+            
+            # One matrix over every technician and every job of the range
+            distance_matrix = None
+            time_dependent = consider_traffic and self.travel_time_profile is not None
+            if jobs:
+                self._report_progress(progress_callback, 'matrix', 0.1)
+                with recorder.phase('matrix') as matrix_phase:
+                    api_calls_before = self.distance_matrix_service.request_count
+                    distance_matrix, locations = self._build_distance_matrix(
+                        jobs, technicians, consider_traffic and not time_dependent,
+                        mask=self._day_blocks_mask(len(technicians), len(jobs), days.values()),
+                        departure=self._planned_departure(start_date, technicians)
+                    )
+                    matrix_phase['api_calls'] = self.distance_matrix_service.request_count - api_calls_before
+                    matrix_phase['matrix_locations'] = len(locations)
+            
+            if cancel_check and cancel_check():
+                raise OptimizationCancelled("Optimization cancelled before solving")
+            
+            # Solve the days in parallel
+            self._report_progress(progress_callback, 'solving', 0.35)
+            day_results = {}
+            with recorder.phase('solve'):
+                if jobs:
+                    search_parameters = self._search_parameters(time_limit_seconds, solution_limit)
+                    plateau = (plateau_percent, plateau_seconds) if plateau_seconds else None
+                    day_results = self.multi_day_service.solve(
+                        distance_matrix, jobs, technicians, {date: nodes for date, nodes in days.items() if nodes},
+                        search_parameters, plateau, warm_start, time_dependent
+                    )
+            
+            if cancel_check and cancel_check() == 'discard':
+                raise OptimizationCancelled("Optimization cancelled, plan discarded")
+            
+            day_routes = {}
+            for date in dates:
+                sequences, _ = day_results.get(date, (None, None))
+                day_routes[date] = self._build_routes(sequences, jobs, technicians) if sequences else []
+            
+            # Save every day's plan at once
+            self._report_progress(progress_callback, 'saving', 0.9)
+            with recorder.phase('save'):
+                all_routes = [route for routes in day_routes.values() for route in routes]
+                assigned_jobs, skipped_jobs = (
+                    self.commit_assignments(self._plan_assignments(all_routes, jobs)) if all_routes else (0, [])
+                )
+            
+            # Per-day metrics
+            skipped = set(skipped_jobs)
+            day_summaries = []
+            for date in dates:
+                _, solve_metrics = day_results.get(date, (None, None))
+                routed = [job_info['job_id'] for route in day_routes[date] for job_info in route['jobs']]
+                day_unqualified = [job_id for job_id in unqualified_jobs if job_dates[job_id] == date]
+                day_metrics = {
+                    "total_jobs": len(days[date]) + len(day_unqualified),
+                    "assigned_jobs": sum(1 for job_id in routed if job_id not in skipped),
+                    "skipped_jobs": [job_id for job_id in routed if job_id in skipped],
+                    **(solve_metrics or ({"stop_reason": "no_solution"} if days[date] else {}))
+                }
+                day_metrics['unservable_jobs'] = (self._unqualified_metrics(day_unqualified)
+                                                  + day_metrics.get('unservable_jobs', []))
+                day_summaries.append({"date": date, "routes": day_routes[date], "metrics": day_metrics})
+            
+            return {
+                "days": day_summaries,
+                "metrics": {
+                    "total_jobs": total_jobs,
+                    "assigned_jobs": assigned_jobs,
+                    "unservable_jobs": [job for day in day_summaries for job in day['metrics']['unservable_jobs']],
+                    "skipped_jobs": skipped_jobs,
+                    "days": len(dates),
+                    "phases": recorder.phases
+                }
+            }
+            
+        except OptimizationCancelled:
+            raise
+        except Exception as e:
+            print(f"Error optimizing routes for {start_date} to {end_date}: {e}")
+            raise
+    
+    def compare_scenarios(self, date, scenarios, progress_callback=None, solution_callback=None, cancel_check=None):
+        """Solve what-if scenarios of a date concurrently without saving any of them.
+        
+        scenarios is a list of {"name", "params"}, params being
+        optimize_routes_for_date arguments. Each result has the plan's
+        assignments, which commit_assignments writes once one is chosen.
+        Intermediate solutions are not reported; cancel_check is honoured
+        before solving, and 'discard' drops the results.
+        """
+        try:
+            recorder = PhaseRecorder()
+            if cancel_check and cancel_check():
+                raise OptimizationCancelled("Optimization cancelled before solving")
+            
+            self._report_progress(progress_callback, 'solving', 0.0)
+            with recorder.phase('solve'):
+                results = self.scenario_service.solve(date, scenarios)
+            
+            if cancel_check and cancel_check() == 'discard':
+                raise OptimizationCancelled("Optimization cancelled, scenarios discarded")
+            
+            return {
+                "date": date,
+                "scenarios": results,
+                "comparison": self.scenario_service.compare(results),
+                "metrics": {"scenarios": len(results), "phases": recorder.phases}
+            }
+            
+        except OptimizationCancelled:
+            raise
+        except Exception as e:
+            print(f"Error comparing routing scenarios for {date}: {e}")
+            raise
+    
+    def insert_job(self, job_id, consider_traffic=True):
+        """Insert one pending job into the current routes of its date at the cheapest feasible position.
+        
+        Only the new job's travel times to the existing stops are looked up
+        (and the arcs of the current routes, unless the date's travel times
+        are still kept), and only jobs whose ETA moves are written back. Returns the assignment, or None if no technician can fit it.
+        """
+        job = self.job_service.get_job_by_id(job_id)
+        if not job or job.get('status') != 'pending':
+            return None
+        
+        technicians = self.technician_service.get_all_technicians(status="available")
+        if not technicians:
+            return None
+        
+        # Current routes: assigned jobs of the date ordered by their ETA
+        tech_index = {tech['_id']: vehicle_id for vehicle_id, tech in enumerate(technicians)}
+        assigned_jobs = [
+            assigned_job for assigned_job in self.job_service.get_all_jobs(date=job['scheduled_date'], status="assigned")
+            if assigned_job.get('technician_id') in tech_index
+        ]
+        assigned_jobs.sort(key=lambda assigned_job: (
+            tech_index[assigned_job['technician_id']],
+            self._time_to_minutes(assigned_job.get('estimated_arrival_time') or '23:59')
+        ))
+        jobs = assigned_jobs + [job]
+        num_technicians = len(technicians)
+        new_node = num_technicians + len(assigned_jobs)
+        
+        routes = [[] for _ in technicians]
+        for offset, assigned_job in enumerate(assigned_jobs):
+            routes[tech_index[assigned_job['technician_id']]].append(num_technicians + offset)
+        
+        departure = self._planned_departure(job['scheduled_date'], technicians)
+        day_keys = self._day_matrix_keys(assigned_jobs, technicians, self._collect_locations(assigned_jobs, technicians))
+        day_matrix = self.day_matrices.get(self._day_matrix_key(job['scheduled_date'], consider_traffic, departure))
+        if (day_matrix.positions(day_keys) >= 0).all():
+            # The date's travel times are kept from its optimization, so only the new job is looked up
+            distance_matrix, _, _ = self._build_day_distance_matrix(job['scheduled_date'], jobs, technicians,
+                                                                    consider_traffic, departure)
+        else:
+            # Only the new job's row/column and the arcs of the current routes are needed
+            mask = np.zeros((new_node + 1, new_node + 1), dtype=bool)
+            mask[new_node, :] = True
+            for vehicle_id, route in enumerate(routes):
+                stops = [vehicle_id] + route + [vehicle_id]
+                mask[stops[:-1], stops[1:]] = True
+            np.fill_diagonal(mask, False)
+            distance_matrix, _ = self._build_distance_matrix(jobs, technicians, consider_traffic, mask=mask,
+                                                             departure=departure)
+        data = self._create_data_model(distance_matrix, jobs, technicians, job['scheduled_date'])
+        
+        # Cheapest feasible position over all technicians
+        best = None
+        for vehicle_id, route in enumerate(routes):
+            insertion = best_insertion(data, vehicle_id, route, new_node)
+            if insertion and (best is None or insertion[0] < best[0]):
+                best = (insertion[0], insertion[1], vehicle_id)
+        
+        if best is None:
+            return None
+        
+        added_minutes, position, vehicle_id = best
+        route = routes[vehicle_id]
+        route.insert(position, new_node)
+        arrivals = self._push_forward_arrivals(data, vehicle_id, route, position, jobs)
+        technician_id = technicians[vehicle_id]['_id']
+        
+        # Write the new job and any job whose ETA moved
+        assignments = []
+        for node, arrival_time in zip(route, arrivals):
+            route_job = jobs[node - num_technicians]
+            arrival_time_str = self._minutes_to_time(arrival_time)
+            if node != new_node and route_job.get('estimated_arrival_time') == arrival_time_str:
+                continue
+            
+            assignments.append({
+                "job_id": route_job['_id'],
+                "technician_id": technician_id,
+                "estimated_arrival_time": arrival_time_str,
+                "estimated_departure_time": self._minutes_to_time(arrival_time + route_job.get('estimated_duration', 60)),
+                "expected": self._expected_job_state(route_job)
+            })
+        
+        result = self.job_service.bulk_assign_jobs(assignments)
+        skipped = set(result["skipped_job_ids"])
+        if job['_id'] in skipped:
+            return None
+        updated_jobs = [assignment["job_id"] for assignment in assignments if assignment["job_id"] not in skipped]
+        
+        return {
+            "job_id": job['_id'],
+            "technician_id": technician_id,
+            "estimated_arrival_time": self._minutes_to_time(arrivals[position]),
+            "added_travel_minutes": added_minutes,
+            "updated_jobs": updated_jobs
+        }
+    
+    def _push_forward_arrivals(self, data, vehicle_id, route, position, jobs):
+        """Arrival minutes after inserting route[position]: earlier stops keep their ETAs, later ones move only if needed"""
+        num_technicians = len(data['starts'])
+        stored = [
+            self._time_to_minutes(jobs[node - num_technicians]['estimated_arrival_time'])
+            if jobs[node - num_technicians].get('estimated_arrival_time') else None
+            for node in route
+        ]
+        travel = data['distance_matrix']
+        time_windows = data['time_windows']
+        service_times = data['service_times']
+        
+        arrivals = stored[:position]
+        if position == 0:
+            # Leave just in time for the new first stop
+            current_time = max(time_windows[vehicle_id][0] + int(travel[vehicle_id][route[0]]), time_windows[route[0]][0])
+            arrivals.append(current_time)
+        previous = route[position - 1] if position else route[0]
+        current_time = arrivals[-1] + service_times[previous]
+        
+        for offset, node in enumerate(route[len(arrivals):], start=len(arrivals)):
+            current_time = max(current_time + int(travel[previous][node]), time_windows[node][0])
+            if stored[offset] is not None:
+                current_time = max(current_time, stored[offset])
+            arrivals.append(current_time)
+            current_time += service_times[node]
+            previous = node
+        
+        # Stored ETAs can leave less room than the earliest schedule; re-time the whole route then
+        if None in arrivals or any(arrival > time_windows[node][1] for node, arrival in zip(route, arrivals)):
+            return schedule_route(data, vehicle_id, route)
+        return arrivals
+    
+    def refresh_etas(self, technician_id, location=None, consider_traffic=True):
+        """Re-time a technician's remaining stops of today from where they are, without re-solving.
+        
+        The stops keep their order. Only the legs between consecutive stops are
+        looked up, so the work depends on the technician's route and not on the
+        fleet, and only jobs whose ETA moved by more than eta_update_threshold
+        minutes are written. Returns the refreshed and late job IDs, or None if
+        the technician does not exist.
+        """
+        technician = self.technician_service.get_technician_by_id(technician_id)
+        if not technician:
+            return None
+        if location:
+            technician['current_location'] = location
+        
+        now = datetime.now()
+        route_jobs = self.job_service.get_technician_route(technician_id, now.strftime('%Y-%m-%d'))
+        remaining = [job for job in route_jobs if job.get('status') == 'assigned']
+        result = {"technician_id": technician_id, "remaining_stops": len(remaining), "updated_jobs": [], "late_jobs": []}
+        if not remaining:
+            return result
+        
+        # Legs from the technician's position through the remaining stops
+        legs = np.zeros((len(remaining) + 1, len(remaining) + 1), dtype=bool)
+        legs[np.arange(len(remaining)), np.arange(1, len(remaining) + 1)] = True
+        travel, _ = self._build_distance_matrix(remaining, [technician], consider_traffic, mask=legs, departure=now)
+        
+        # Leave now, after a job in progress is done, or at the start of the shift
+        current_time = max(now.hour * 60 + now.minute,
+                           self._working_hours(technician, now.strftime('%A').lower())[0])
+        for job in route_jobs:
+            if job.get('status') == 'in_progress' and job.get('estimated_departure_time'):
+                current_time = max(current_time, self._time_to_minutes(job['estimated_departure_time']))
+        
+        assignments = []
+        for offset, job in enumerate(remaining):
+            time_window = job.get('scheduled_time_window', {"start": "09:00", "end": "17:00"})
+            arrival_time = max(current_time + int(travel[offset][offset + 1]), self._time_to_minutes(time_window['start']))
+            current_time = arrival_time + job.get('estimated_duration', 60)
+            if arrival_time > self._time_to_minutes(time_window['end']):
+                result["late_jobs"].append(job['_id'])
+            
+            stored = job.get('estimated_arrival_time')
+            if stored and abs(arrival_time - self._time_to_minutes(stored)) <= self.eta_update_threshold:
+                continue
+            assignments.append({
+                "job_id": job['_id'],
+                "technician_id": technician_id,
+                "estimated_arrival_time": self._minutes_to_time(arrival_time),
+                "estimated_departure_time": self._minutes_to_time(current_time),
+                "expected": self._expected_job_state(job)
+            })
+        
+        if assignments:
+            skipped = set(self.job_service.bulk_assign_jobs(assignments)["skipped_job_ids"])
+            result["updated_jobs"] = [assignment["job_id"] for assignment in assignments
+                                      if assignment["job_id"] not in skipped]
+        return result
+    
+    def _fetch_day_inputs(self, date, technician_ids=None, warm_start=True, exclude_technician_ids=None):
+        """Jobs to plan for date (pending, plus assigned ones with warm_start) and the available technicians.
+        
+        Excluded technicians are left out, and their assigned jobs are re-planned.
+        """
+        jobs = self.job_service.get_all_jobs(date=date, status="pending")
+        if warm_start:
+            jobs = self.job_service.get_all_jobs(date=date, status="assigned") + jobs
+        technicians = self._get_available_technicians(technician_ids) if jobs else []
+        excluded_ids = set(exclude_technician_ids or [])
+        technicians = [tech for tech in technicians if tech['_id'] not in excluded_ids]
+        
+        # Jobs assigned to technicians outside this optimization keep their plan
+        selected_ids = {tech['_id'] for tech in technicians} | excluded_ids
+        jobs = [job for job in jobs if job.get('status') == 'pending' or job.get('technician_id') in selected_ids]
+        return jobs, technicians
+    
+    def _input_fingerprint(self, date, jobs, technicians, params):
+        """Content hash of an optimization's job and technician documents, parameters and travel-time setup"""
+        return fingerprint({
+            "date": date,
+            "jobs": sorted(jobs, key=lambda job: str(job['_id'])),
+            "technicians": sorted(technicians, key=lambda tech: str(tech['_id'])),
+            "params": params,
+            "travel_times": {
+                "road_network": self.road_network_service.graph_path if self.road_network_service else None,
+                "google": bool(self.google_maps_api_key),
+                "profile": self.travel_time_profile.factors.tolist() if self.travel_time_profile else None
+            }
+        })
+    
+    def _memoize_result(self, date, params, jobs, technicians, routes, result):
+        """Store a saved plan under the fingerprint of the inputs it leaves behind.
+        
+        Re-running the optimization starts from those inputs, so the plan is
+        only stored when nothing but its own writes changed them since they
+        were read. Returns whether it was stored.
+        """
+        try:
+            saved_jobs, saved_technicians = self._fetch_day_inputs(date, params['technician_ids'],
+                                                                   exclude_technician_ids=params['exclude_technician_ids'])
+            if saved_technicians != technicians or not self._saved_as_planned(jobs, saved_jobs, routes):
+                return False
+            self.result_cache.put(self._input_fingerprint(date, saved_jobs, saved_technicians, params), date, result)
+            return True
+        except Exception as e:
+            print(f"Error memoizing optimization result: {e}")
+            return False
+    
+    def _saved_as_planned(self, jobs, saved_jobs, routes):
+        """Whether saved_jobs are jobs with exactly the plan of routes written over them"""
+        planned = {
+            job_info['job_id']: ("assigned", route['technician_id'], job_info['estimated_arrival_time'],
+                                 job_info['estimated_departure_time'])
+            for route in routes for job_info in route['jobs']
+        }
+        inputs = {job['_id']: {k: v for k, v in job.items() if k not in PLAN_FIELDS} for job in jobs}
+        if {job['_id'] for job in saved_jobs} != inputs.keys():
+            return False
+        
+        for job in saved_jobs:
+            if {k: v for k, v in job.items() if k not in PLAN_FIELDS} != inputs[job['_id']]:
+                return False
+            if job['_id'] in planned and planned[job['_id']] != (
+                job.get('status'), job.get('technician_id'), job.get('estimated_arrival_time'),
+                job.get('estimated_departure_time')
+            ):
+                return False
+        return True
+    
+    def _get_available_technicians(self, technician_ids=None):
+        """Available technicians, all of them or only those in technician_ids"""
+        if technician_ids:
+            technicians = [self.technician_service.get_technician_by_id(tech_id) for tech_id in technician_ids]
+            return [tech for tech in technicians if tech and tech.get('status') == 'available']
+        return self.technician_service.get_all_technicians(status="available")
+    
+    def _split_unqualified_jobs(self, jobs, technicians):
+        """Separate jobs no technician has the required skills for; returns (jobs, unqualified job IDs)"""
+        skill_index = build_skill_index(technicians)
+        qualified, unqualified = [], []
+        for job in jobs:
+            if eligible_bitset(required_skills(job, skill_index), skill_index, len(technicians)):
+                qualified.append(job)
+            else:
+                unqualified.append(job['_id'])
+        return qualified, unqualified
+    
+    def _report_progress(self, progress_callback, phase, progress):
+        """Forward progress to the caller without letting its errors break the solve"""
+        if progress_callback:
+            try:
+                progress_callback(phase, progress)
+            except Exception as e:
+                print(f"Error reporting optimization progress: {e}")
+    
+    def _build_distance_matrix(self, jobs, technicians, consider_traffic=True, mask=None, departure=None,
+                               estimate_unavailable=True):
+        """Build distance matrix between all locations.
+        
+        mask optionally selects the pairs that are actually needed (either
+        direction); other off-diagonal cells are left as MISSING. departure
+        (a datetime) is when traffic-aware travel times apply, default now.
+        Pairs the travel-time provider cannot connect get straight-line
+        estimates, and so do pairs whose lookup failed unless
+        estimate_unavailable is False, which leaves them UNAVAILABLE for
+        callers that keep travel times and must not keep estimates.
+        """
+        locations = self._collect_locations(jobs, technicians)
+        needed = None if mask is None else mask | mask.T
+        
+        # Local road network first: realistic travel times without network calls
+        if self.road_network_service:
+            try:
+                distance_matrix = self.road_network_service.build_matrix(locations, needed)
+            except Exception as e:
+                print(f"Error using road network: {e}")
+                distance_matrix = self._unavailable_matrix(len(locations), needed)
+        # If Google Maps API key is available, use Distance Matrix API
+        elif self.google_maps_api_key:
+            try:
+                # Reuse cached pairs and fetch the rest in batched, concurrent requests
+                distance_matrix = self._build_google_distance_matrix(locations, consider_traffic, mask, departure)
+            except Exception as e:
+                print(f"Error using Google Maps API: {e}")
+                distance_matrix = self._unavailable_matrix(len(locations), needed)
+        else:
+            # Use haversine distance if no API key
+            return self._build_haversine_distance_matrix(locations, mask), locations
+        
+        # Fill pairs the provider could not route (and, by default, failed lookups) with haversine estimates
+        missing = (distance_matrix == MISSING) | (estimate_unavailable & (distance_matrix == UNAVAILABLE))
+        if needed is not None:
+            missing &= needed
+        if missing.any():
+            distance_matrix[missing] = self._build_haversine_distance_matrix(locations, missing)[missing]
+        
+        return distance_matrix, locations
+    
+    def _day_blocks_mask(self, num_technicians, num_jobs, days):
+        """Pairs a batch of days needs: technicians to and from everything, and jobs within their own day.
+        
+        days is an iterable of job index lists, one per day.
+        """
+        size = num_technicians + num_jobs
+        mask = np.zeros((size, size), dtype=bool)
+        mask[:num_technicians, :] = True
+        mask[:, :num_technicians] = True
+        for job_indices in days:
+            nodes = num_technicians + np.asarray(job_indices, dtype=int)
+            mask[np.ix_(nodes, nodes)] = True
+        np.fill_diagonal(mask, False)
+        return mask
+    
+    def _unavailable_matrix(self, n, needed=None):
+        """Matrix of a failed lookup: every needed pair (default all) UNAVAILABLE"""
+        distance_matrix = np.full((n, n), MISSING, dtype=np.int32)
+        distance_matrix[np.ones((n, n), dtype=bool) if needed is None else needed] = UNAVAILABLE
+        np.fill_diagonal(distance_matrix, 0)
+        return distance_matrix
+    
+    def _collect_locations(self, jobs, technicians):
+        """All locations of a matrix: technician starting points, then job locations"""
         locations = []
         
         # Add technician starting locations
@@ -87,108 +818,180 @@ class RoutingService:
         for job in jobs:
             locations.append(job['location'])
         
-        # Initialize distance matrix
+        return locations
+    
+    def _build_day_distance_matrix(self, date, jobs, technicians, consider_traffic=True, departure=None):
+        """Distance matrix of a date's locations, looking up travel times only for locations new to the date.
+        
+        The date's DayMatrix keeps the travel times of its earlier optimizations
+        in any process, keyed by location identity (ID and coordinates, so a
+        technician who moved is a new location). Returns (distance_matrix,
+        locations, number of locations whose travel times were reused).
+        """
+        locations = self._collect_locations(jobs, technicians)
+        keys = self._day_matrix_keys(jobs, technicians, locations)
+        day_key = self._day_matrix_key(date, consider_traffic, departure)
+        day_matrix = self.day_matrices.get(day_key)
+        
+        with day_matrix.lock:
+            known_before = len(day_matrix.slots)
+            new = day_matrix.positions(keys) < 0
+            fetched = None
+            unavailable = np.zeros((len(keys), len(keys)), dtype=bool)
+            if new.any():
+                # Rows (and by symmetry columns) of the new locations only
+                mask = np.zeros((len(keys), len(keys)), dtype=bool)
+                mask[new, :] = True
+                np.fill_diagonal(mask, False)
+                fetched, _ = self._build_distance_matrix(jobs, technicians, consider_traffic, mask=mask,
+                                                         departure=departure, estimate_unavailable=False)
+                unavailable = fetched == UNAVAILABLE
+                if unavailable.any():
+                    fetched[unavailable] = self._build_haversine_distance_matrix(locations, unavailable)[unavailable]
+            distance_matrix = day_matrix.update(keys, fetched, new)
+            
+            # Estimates for failed lookups are used this time only; those locations are looked up again next time
+            retry = new & (unavailable.any(axis=0) | unavailable.any(axis=1))
+            day_matrix.discard([keys[position] for position in np.flatnonzero(retry)])
+            if new.any() or len(day_matrix.slots) != known_before:
+                self.day_matrices.save(day_key, day_matrix)
+        
+        return distance_matrix, locations, int((~new).sum())
+    
+    def _day_matrix_key(self, date, consider_traffic=True, departure=None):
+        """DayMatrixCache key of a date; travel times depend on the traffic setting and the departure's bucket"""
+        bucket = self.travel_time_cache.bucket_for((departure or datetime.now()) if consider_traffic else None)
+        return (date, consider_traffic, bucket)
+    
+    def _day_matrix_keys(self, jobs, technicians, locations):
+        """DayMatrix keys of a matrix's locations: ID and coordinates"""
+        keys = [("technician", tech['_id']) for tech in technicians] + [("job", job['_id']) for job in jobs]
+        return [key + (location['lat'], location['lng']) for key, location in zip(keys, locations)]
+    
+    def _build_google_distance_matrix(self, locations, consider_traffic=True, mask=None, departure=None):
+        """Build distance matrix from the travel-time cache, fetching only missing pairs from the API.
+        
+        Pairs the API could not route are MISSING, and pairs whose request
+        failed are UNAVAILABLE; neither is cached.
+        """
         n = len(locations)
-        distance_matrix = [[0 for _ in range(n)] for _ in range(n)]
+        upper = np.triu(np.ones((n, n), dtype=bool), 1)
+        needed = upper if mask is None else upper & (mask | mask.T)
+        bucket = self.travel_time_cache.bucket_for((departure or datetime.now()) if consider_traffic else None)
         
-        # If Google Maps API key is available, use Distance Matrix API
-        if self.google_maps_api_key:
-            try:
-                # Build distance matrix using Google Maps API
-                for i in range(n):
-                    for j in range(i+1, n):
-                        if i != j:
-                            origin = f"{locations[i]['lat']},{locations[i]['lng']}"
-                            destination = f"{locations[j]['lat']},{locations[j]['lng']}"
-                            
-                            # API parameters
-                            params = {
-                                "origins": origin,
-                                "destinations": destination,
-                                "key": self.google_maps_api_key
-                            }
-                            
-                            if consider_traffic:
-                                params["departure_time"] = "now"
-                                params["traffic_model"] = "best_guess"
-                            
-                            # Make API request
-                            response = requests.get(
-                                "https://maps.googleapis.com/maps/api/distancematrix/json",
-                                params=params
-                            )
-                            
-                            if response.status_code == 200:
-                                result = response.json()
-                                if result["status"] == "OK":
-                                    # Get duration in seconds
-                                    duration = result["rows"][0]["elements"][0]["duration"]["value"]
-                                    
-                                    # If traffic info is available
-                                    if consider_traffic and "duration_in_traffic" in result["rows"][0]["elements"][0]:
-                                        duration = result["rows"][0]["elements"][0]["duration_in_traffic"]["value"]
-                                    
-                                    # Convert to minutes and round
-                                    duration_minutes = round(duration / 60)
-                                    
-                                    # Update distance matrix (symmetric)
-                                    distance_matrix[i][j] = duration_minutes
-                                    distance_matrix[j][i] = duration_minutes
-            except Exception as e:
-                print(f"Error using Google Maps API: {e}")
-                # Fall back to haversine distance
-                self._build_haversine_distance_matrix(distance_matrix, locations)
-        else:
-            # Use haversine distance if no API key
-            self._build_haversine_distance_matrix(distance_matrix, locations)
+        distance_matrix, missing = self.travel_time_cache.lookup(locations, 'google', bucket, mask=needed)
+        if missing.any():
+            fetched = self.distance_matrix_service.build_matrix(locations, consider_traffic, mask=missing,
+                                                                departure_time=departure)
+            distance_matrix[missing] = fetched[missing]
+            
+            # Cache both directions of every pair the API answered; failed lookups are asked again next time
+            fetched_mask = missing & (fetched >= 0)
+            self.travel_time_cache.store(locations, fetched, 'google', bucket, mask=fetched_mask | fetched_mask.T)
+        
+        # Mirror the upper triangle (symmetric matrix)
+        distance_matrix.T[upper] = distance_matrix[upper]
+        return distance_matrix
+    
+    def _candidate_arcs(self, jobs, technicians, neighbors):
+        """Arcs worth exact travel times in a sparse model, as a boolean location x location mask.
         
+        Each job is connected (both ways) to its nearest jobs, found with a
+        k-d tree on projected coordinates, and to the technicians qualified for it.
+        """
+        num_technicians = len(technicians)
+        n = num_technicians + len(jobs)
+        candidate_arcs = np.zeros((n, n), dtype=bool)
+        
+        # Nearest jobs (the first neighbor of each job is itself)
+        lats, lngs = locations_to_arrays([job['location'] for job in jobs])
+        points = project_equirectangular(lats, lngs)
+        _, nearest = cKDTree(points).query(points, k=min(neighbors + 1, len(jobs)))
+        nearest = nearest.reshape(len(jobs), -1)  # k=1 gives a flat array
+        origins = np.repeat(np.arange(len(jobs)), nearest.shape[1]) + num_technicians
+        candidate_arcs[origins, nearest.ravel() + num_technicians] = True
+        
+        # Depot arcs to and from the technicians who may take the job
+        skill_index = build_skill_index(technicians)
+        for job_idx, job in enumerate(jobs):
+            skills = required_skills(job, skill_index)
+            vehicles = (
+                bitset_members(eligible_bitset(skills, skill_index, num_technicians)) if skills
+                else range(num_technicians)
+            )
+            candidate_arcs[num_technicians + job_idx, list(vehicles)] = True
+        
+        candidate_arcs |= candidate_arcs.T
+        np.fill_diagonal(candidate_arcs, False)
+        return candidate_arcs
+    
+    def _build_sparse_distance_matrix(self, jobs, technicians, candidate_arcs, consider_traffic=True, departure=None):
+        """Travel times for candidate arcs, straight-line estimates for the rest"""
+        # Without a travel-time provider every travel time is a straight-line estimate anyway
+        if not (self.road_network_service or self.google_maps_api_key):
+            return self._build_distance_matrix(jobs, technicians, consider_traffic)
+        
+        distance_matrix, locations = self._build_distance_matrix(jobs, technicians, consider_traffic,
+                                                                 mask=candidate_arcs, departure=departure)
+        missing = distance_matrix == MISSING
+        if missing.any():
+            distance_matrix[missing] = self._build_haversine_distance_matrix(locations)[missing]
         return distance_matrix, locations
     
-    def _build_haversine_distance_matrix(self, distance_matrix, locations):
-        """Build distance matrix using haversine formula"""
-        n = len(locations)
-        for i in range(n):
-            for j in range(i+1, n):
-                if i != j:
-                    # Calculate haversine distance
-                    point1 = (locations[i]['lat'], locations[i]['lng'])
-                    point2 = (locations[j]['lat'], locations[j]['lng'])
-                    
-                    # Get distance in km
-                    distance_km = haversine(point1, point2)
-                    
-                    # Estimate time in minutes (assuming 40 km/h average speed)
-                    time_minutes = round(distance_km / 40 * 60)
-                    
-                    # Update distance matrix (symmetric)
-                    distance_matrix[i][j] = time_minutes
-                    distance_matrix[j][i] = time_minutes
-    
-    def _create_data_model(self, distance_matrix, jobs, technicians):
-        """Create data model for OR-Tools VRP solver"""
+    def _count_non_candidate_arcs(self, sequences, candidate_arcs):
+        """Arcs of the routes that are not candidate arcs, i.e. rely on straight-line estimates"""
+        count = 0
+        for vehicle_id, sequence in enumerate(sequences):
+            stops = [vehicle_id] + [node for node, _ in sequence] + [vehicle_id]
+            count += sum(
+                1 for origin, destination in zip(stops[:-1], stops[1:])
+                if origin != destination and not candidate_arcs[origin, destination]
+            )
+        return count
+    
+    def _build_haversine_distance_matrix(self, locations, mask=None):
+        """Build distance matrix using haversine formula (vectorized, 40 km/h)"""
+        lats, lngs = locations_to_arrays(locations)
+        if mask is None:
+            return haversine_time_matrix(lats, lngs)
+        
+        # Only the selected pairs (and their mirror cells)
+        origins, destinations = np.nonzero(mask | mask.T)
+        distance_matrix = np.full((len(locations), len(locations)), MISSING, dtype=np.int32)
+        np.fill_diagonal(distance_matrix, 0)
+        distance_matrix[origins, destinations] = minutes_from_km(
+            haversine_km(lats[origins], lngs[origins], lats[destinations], lngs[destinations])
+        )
+        return distance_matrix
+    
+    def _create_data_model(self, distance_matrix, jobs, technicians, date=None, candidate_arcs=None,
+                           overtime_minutes=0):
+        """Create data model for OR-Tools VRP solver; working hours are those of date's weekday (default today).
+        
+        With candidate_arcs (a sparse model's boolean mask), every other arc
+        costs SPARSE_ARC_PENALTY more. overtime_minutes extends every shift
+        and the maximum route length.
+        """
         data = {}
+        data['date'] = date
+        data['overtime_minutes'] = overtime_minutes
+        data['max_route_minutes'] = MAX_ROUTE_MINUTES + overtime_minutes
         data['distance_matrix'] = distance_matrix
+        data['candidate_arcs'] = candidate_arcs
         data['num_vehicles'] = len(technicians)
-        data['depot'] = 0  # Start from the first location (technician's location)
+        
+        # Each technician starts and ends the day at their own location
+        data['starts'] = list(range(len(technicians)))
+        data['ends'] = list(range(len(technicians)))
         
         # Time windows for each location
         data['time_windows'] = []
         
-        # Add time windows for technician starting points (depot)
+        # Add time windows for technician starting points (working hours)
+        day_name = (datetime.strptime(date, '%Y-%m-%d') if date else datetime.now()).strftime('%A').lower()
         for tech in technicians:
-            # Default working hours if not specified
-            working_hours = tech.get('working_hours', {})
-            today_name = datetime.now().strftime('%A').lower()
-            
-            if today_name in working_hours and working_hours[today_name]:
-                start_time = self._time_to_minutes(working_hours[today_name]['start'])
-                end_time = self._time_to_minutes(working_hours[today_name]['end'])
-            else:
-                # Default: 9 AM to 5 PM
-                start_time = 9 * 60
-                end_time = 17 * 60
-            
-            data['time_windows'].append((start_time, end_time))
+            start_time, end_time = self._working_hours(tech, day_name)
+            data['time_windows'].append((start_time, min(end_time + overtime_minutes, MINUTES_PER_DAY)))
         
         # Add time windows for jobs
         for job in jobs:
@@ -204,134 +1007,469 @@ class RoutingService:
             duration = job.get('estimated_duration', 60)
             data['service_times'].append(duration)
         
-        # Vehicle capacities (skills matching)
-        data['vehicle_capacities'] = [1] * len(technicians)  # Default capacity
-        
-        # Job requirements (skills needed)
-        data['job_requirements'] = [0] * len(technicians)  # No requirements for technician starting points
+        # Job requirements (skills needed) and the technicians qualified for them
+        skill_index = build_skill_index(technicians)
+        data['job_requirements'] = [()] * len(technicians)  # No requirements for technician starting points
+        data['allowed_vehicles'] = [None] * len(technicians)  # None means any technician
+        eligible_by_skills = {}
         for job in jobs:
-            # For simplicity, we're using a binary skill match
-            # In a real system, this would be more complex
-            data['job_requirements'].append(1)  # All jobs require skill level 1
+            skills = required_skills(job, skill_index)
+            if skills not in eligible_by_skills:
+                eligible_by_skills[skills] = (
+                    bitset_members(eligible_bitset(skills, skill_index, len(technicians))) if skills else None
+                )
+            data['job_requirements'].append(skills)
+            data['allowed_vehicles'].append(eligible_by_skills[skills])
+        
+        self._set_arc_matrices(data)
+        
+        # Jobs no technician can serve are left out of the search up front
+        data['unservable'], data['capacity'] = screen_jobs(data)
         
         return data
     
-    def _solve_vrp(self, data):
-        """Solve the Vehicle Routing Problem using OR-Tools"""
+    def _set_arc_matrices(self, data):
+        """Precomputed integer matrices for OR-Tools' native transit evaluators.
+        
+        Arc cost is travel time, and the time transit folds in the service
+        time spent at the origin before leaving it.
+        """
+        data['cost_matrix'] = np.asarray(data['distance_matrix'], dtype=np.int64)
+        data['time_matrix'] = data['cost_matrix'] + np.asarray(data['service_times'], dtype=np.int64)[:, None]
+        if data.get('candidate_arcs') is not None:
+            # Penalties steer the search only; travel times stay as they are
+            data['cost_matrix'][~data['candidate_arcs']] += SPARSE_ARC_PENALTY
+            np.fill_diagonal(data['cost_matrix'], 0)
+    
+    def _working_hours(self, tech, day_name):
+        """A technician's (start, end) minutes on a weekday, 9 AM to 5 PM by default"""
+        working_hours = tech.get('working_hours', {})
+        if day_name in working_hours and working_hours[day_name]:
+            return (self._time_to_minutes(working_hours[day_name]['start']),
+                    self._time_to_minutes(working_hours[day_name]['end']))
+        return (9 * 60, 17 * 60)
+    
+    def _planned_departure(self, date, technicians):
+        """When the first technician leaves on date, or None when that is not in the future"""
+        day = datetime.strptime(date, '%Y-%m-%d')
+        day_name = day.strftime('%A').lower()
+        departure = day + timedelta(minutes=min(self._working_hours(tech, day_name)[0] for tech in technicians))
+        return departure if departure > datetime.now() else None
+    
+    def _apply_travel_time_profile(self, data, sequences=None):
+        """Give each origin of a data model the travel times of its departure's profile bucket.
+        
+        The first call keeps the base matrix's profile tensor in the data model
+        and estimates departures from time windows; later calls take them from
+        the sequences of a solved plan. Returns how many origins changed bucket.
+        """
+        profile = self.travel_time_profile
+        if 'profile_tensor' not in data:
+            windows = np.asarray(data['time_windows'])
+            data['profile_tensor'], data['profile_levels'] = profile.tensor(
+                data['distance_matrix'], windows[:, 0].min(), windows[:, 1].max()
+            )
+            data['profile_slices'] = None
+        
+        node_slices = profile.slices_for(data['profile_levels'], self._estimated_departures(data, sequences))
+        previous = data['profile_slices']
+        changed = len(node_slices) if previous is None else int((node_slices != previous).sum())
+        if changed:
+            data['profile_slices'] = node_slices
+            data['distance_matrix'] = profile.departure_matrix(data['profile_tensor'], node_slices)
+            self._set_arc_matrices(data)
+            if previous is None:
+                # Screen against the profile's travel times (kept as is when refining, so seeds stay valid)
+                data['unservable'], data['capacity'] = screen_jobs(data)
+        return changed
+    
+    def _estimated_departures(self, data, sequences=None):
+        """Minute each node is left at: from time windows, or as scheduled by sequences.
+        
+        Without sequences technicians leave at the start of their shift and jobs
+        after being served from the middle of their window.
+        """
+        num_vehicles = data['num_vehicles']
+        windows = np.asarray(data['time_windows'], dtype=np.int64)
+        service_times = np.asarray(data['service_times'], dtype=np.int64)
+        departures = (windows[:, 0] + windows[:, 1]) // 2 + service_times
+        departures[:num_vehicles] = windows[:num_vehicles, 0]
+        
+        for vehicle_id, sequence in enumerate(sequences or []):
+            if sequence:
+                # Leave just in time for the first stop
+                first_node, first_arrival = sequence[0]
+                departures[vehicle_id] = max(windows[vehicle_id, 0],
+                                             first_arrival - data['distance_matrix'][vehicle_id][first_node])
+            for node, arrival in sequence:
+                departures[node] = arrival + service_times[node]
+        return departures
+    
+    def _build_routing_model(self, data):
+        """Build the OR-Tools routing model with native matrix transits"""
         # Create the routing index manager
         manager = pywrapcp.RoutingIndexManager(
             len(data['distance_matrix']),
             data['num_vehicles'],
-            data['depot']
+            data['starts'],
+            data['ends']
         )
         
         # Create Routing Model
         routing = pywrapcp.RoutingModel(manager)
         
-        # Define transit callback
-        def distance_callback(from_index, to_index):
-            from_node = manager.IndexToNode(from_index)
-            to_node = manager.IndexToNode(to_index)
-            return data['distance_matrix'][from_node][to_node]
-        
-        transit_callback_index = routing.RegisterTransitCallback(distance_callback)
+        # Register precomputed matrices so arc evaluation stays in C++
+        transit_callback_index = routing.RegisterTransitMatrix(data['cost_matrix'].tolist())
         
         # Define cost of each arc
         routing.SetArcCostEvaluatorOfAllVehicles(transit_callback_index)
         
         # Add Time Windows constraint
-        def time_callback(from_index, to_index):
-            from_node = manager.IndexToNode(from_index)
-            to_node = manager.IndexToNode(to_index)
-            return data['distance_matrix'][from_node][to_node] + data['service_times'][from_node]
-        
-        time_callback_index = routing.RegisterTransitCallback(time_callback)
+        time_callback_index = routing.RegisterTransitMatrix(data['time_matrix'].tolist())
         
-        # Add time window constraints
+        # Add time window constraints (cumul values are minutes since midnight)
         routing.AddDimension(
             time_callback_index,
-            30,  # Allow waiting time
-            480,  # Maximum time per vehicle (8 hours)
+            MAX_WAITING_MINUTES,  # Allow waiting time
+            MINUTES_PER_DAY,  # Horizon
             False,  # Don't force start cumul to zero
             'Time'
         )
         time_dimension = routing.GetDimensionOrDie('Time')
         
-        # Add time window constraints for each location
-        for location_idx, time_window in enumerate(data['time_windows']):
-            if location_idx == data['depot']:
-                continue  # Skip depot
+        # Add time window constraints for each job location
+        for location_idx in range(data['num_vehicles'], len(data['time_windows'])):
+            time_window = data['time_windows'][location_idx]
             index = manager.NodeToIndex(location_idx)
             time_dimension.CumulVar(index).SetRange(time_window[0], time_window[1])
         
-        # Add resource constraints (skills)
-        # This is a simplified version; in a real system, this would be more complex
+        # Technicians work within their working hours, at most 8 hours per day plus any overtime
+        for vehicle_id in range(data['num_vehicles']):
+            time_window = data['time_windows'][data['starts'][vehicle_id]]
+            time_dimension.CumulVar(routing.Start(vehicle_id)).SetRange(time_window[0], time_window[1])
+            time_dimension.CumulVar(routing.End(vehicle_id)).SetRange(time_window[0], time_window[1])
+            time_dimension.SetSpanUpperBoundForVehicle(data['max_route_minutes'], vehicle_id)
+        
+        # Jobs are optional: the solver may drop one at DROP_PENALTY rather than find no plan,
+        # and the ones the pre-screen found unservable are dropped from the start
+        unservable = data.get('unservable', {})
+        for node in range(data['num_vehicles'], len(data['time_windows'])):
+            index = manager.NodeToIndex(node)
+            if node in unservable:
+                routing.AddDisjunction([index], 0)
+                routing.ActiveVar(index).SetValue(0)
+            else:
+                routing.AddDisjunction([index], DROP_PENALTY)
+        
+        # Only technicians with the required skills may take a job (restricting the
+        # vehicle variable also lets the local search filter out moves to anyone else;
+        # -1 is the vehicle of a dropped job)
+        for node, vehicles in enumerate(data['allowed_vehicles']):
+            if vehicles is not None:
+                routing.VehicleVar(manager.NodeToIndex(node)).SetValues([-1] + vehicles)
         
-        # Setting first solution heuristic
+        return manager, routing
+    
+    def _default_search_parameters(self):
+        """Search parameters used when the caller does not supply any"""
         search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+        # Insertion copes with skill and time-window restrictions where
+        # PATH_CHEAPEST_ARC often finds no feasible first solution
         search_parameters.first_solution_strategy = (
-            routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+            routing_enums_pb2.FirstSolutionStrategy.PARALLEL_CHEAPEST_INSERTION
         )
         search_parameters.local_search_metaheuristic = (
             routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
         )
-        search_parameters.time_limit.seconds = 30  # Limit solution time
+        search_parameters.time_limit.seconds = int(os.environ.get('ROUTING_TIME_LIMIT_SECONDS', 30))  # Limit solution time
+        return search_parameters
+    
+    def _search_parameters(self, time_limit_seconds=None, solution_limit=None):
+        """Default search parameters with the caller's time budget and solution limit"""
+        search_parameters = self._default_search_parameters()
+        if time_limit_seconds:
+            search_parameters.time_limit.FromMilliseconds(int(time_limit_seconds * 1000))
+        if solution_limit:
+            search_parameters.solution_limit = int(solution_limit)
+        return search_parameters
+    
+    def _with_time_limit(self, search_parameters, seconds):
+        """Copy of search_parameters with another time limit"""
+        limited = type(search_parameters)()
+        limited.CopyFrom(search_parameters)
+        limited.time_limit.FromMilliseconds(max(1, int(seconds * 1000)))
+        return limited
+    
+    def _solve_vrp(self, data, search_parameters=None, initial_routes=None, plateau=None, solution_callback=None,
+                   should_stop=None, objective_callback=None):
+        """Solve the Vehicle Routing Problem using OR-Tools.
+        
+        initial_routes (per-vehicle node lists) seed the search instead of the
+        first solution strategy when they form a feasible solution. plateau is an
+        optional (improvement_percent, seconds) early-stop rule.
+        solution_callback(objective, elapsed_seconds, sequences) is called with
+        improved solutions during the search, at most once per half second;
+        objective_callback(objective) is called with every improved objective
+        without reading the routes. The search stops early once should_stop()
+        returns True.
+        """
+        manager, routing = self._build_routing_model(data)
+        search_parameters = search_parameters or self._default_search_parameters()
+        
+        initial_solution = None
+        if initial_routes:
+            routing.CloseModelWithParameters(search_parameters)
+            initial_solution = routing.ReadAssignmentFromRoutes(
+                [[manager.NodeToIndex(node) for node in route] for route in initial_routes], True
+            )
+            if not initial_solution:
+                print("Error seeding route optimization: initial routes are infeasible, solving from scratch")
+        
+        # Track the objective and stop early on a plateau or request
+        def on_improvement(objective):
+            # Variables hold the solution just found while the callback runs
+            sequences = self._read_sequences(manager, routing, data, lambda var: var.Value(), lambda var: var.Min())
+            solution_callback(objective, tracker.elapsed(), sequences)
+        tracker = SearchTracker(routing, *(plateau or (None, None)),
+                                on_improvement=on_improvement if solution_callback else None,
+                                should_stop=should_stop, on_objective=objective_callback)
+        tracker.attach()
         
         # Solve the problem
-        solution = routing.SolveWithParameters(search_parameters)
+        if initial_solution:
+            solution = routing.SolveFromAssignmentWithParameters(initial_solution, search_parameters)
+        else:
+            solution = routing.SolveWithParameters(search_parameters)
+        
+        # Keep the model with the solution for _process_solution
+        if solution:
+            solution.routing_index_manager = manager
+            solution.routing_model = routing
+            solution.solve_metrics = self._solve_metrics(solution, initial_solution, tracker, search_parameters)
         
         return solution
     
+    def _solve_time_dependent(self, data, search_parameters=None, initial_routes=None, plateau=None,
+                              solution_callback=None, should_stop=None):
+        """Solve a data model with a travel-time profile applied (see _solve_vrp for the arguments).
+        
+        Departures are only estimated before the search, so once a plan is found
+        the origins whose departure falls in another bucket get that bucket's
+        travel times and the plan is re-solved from itself with
+        PROFILE_REFINEMENT_SHARE of the time budget.
+        """
+        search_parameters = search_parameters or self._default_search_parameters()
+        budget_seconds = search_parameters.time_limit.ToMilliseconds() / 1000
+        solution = self._solve_vrp(
+            data, self._with_time_limit(search_parameters, budget_seconds * (1 - PROFILE_REFINEMENT_SHARE)),
+            initial_routes, plateau, solution_callback, should_stop
+        )
+        if not solution:
+            return solution
+        
+        sequences = self._extract_sequences(solution, data)
+        rebucketed = self._apply_travel_time_profile(data, sequences)
+        profile_metrics = {
+            "bucket_minutes": self.travel_time_profile.bucket_minutes,
+            "profile_levels": len(data['profile_tensor']),
+            "rebucketed_origins": rebucketed,
+            "refined": False
+        }
+        if rebucketed and not (should_stop and should_stop()):
+            refined = self._solve_vrp(
+                data, self._with_time_limit(search_parameters, budget_seconds * PROFILE_REFINEMENT_SHARE),
+                [[node for node, _ in sequence] for sequence in sequences], plateau, solution_callback, should_stop
+            )
+            if refined:
+                refined.solve_metrics['solve_seconds'] = round(
+                    refined.solve_metrics['solve_seconds'] + solution.solve_metrics['solve_seconds'], 3
+                )
+                solution = refined
+                profile_metrics['refined'] = True
+        
+        solution.solve_metrics['time_profile'] = profile_metrics
+        return solution
+    
+    def _solve_metrics(self, solution, initial_solution, tracker, search_parameters):
+        """Objective, timing and stop reason of a solve, with the improvement over the seed when warm-started"""
+        metrics = {
+            "warm_start": initial_solution is not None,
+            "objective": solution.ObjectiveValue(),
+            "solve_seconds": round(tracker.elapsed(), 3),
+            "stop_reason": tracker.stop_reason(search_parameters),
+            "solutions": tracker.solutions,
+            "objective_trajectory": tracker.trajectory
+        }
+        if initial_solution is not None:
+            initial_objective = initial_solution.ObjectiveValue()
+            metrics["initial_objective"] = initial_objective
+            metrics["improvement_percent"] = (
+                round(100.0 * (initial_objective - metrics["objective"]) / initial_objective, 2)
+                if initial_objective else 0.0
+            )
+        return metrics
+    
+    def _solve_decomposed(self, data, jobs, technicians, search_parameters, plateau=None):
+        """Solve the day zone by zone; returns (sequences, solve_metrics).
+        
+        Unless the day is over capacity, the zones search for the first part
+        of the time budget and the last REINSERTION_SHARE is kept for
+        re-solving only the zones around jobs they leave unassigned. The whole
+        day is never solved as one model.
+        """
+        budget_seconds = search_parameters.time_limit.ToMilliseconds() / 1000
+        reinsertion_parameters = None
+        if not data['capacity']['over_capacity']:
+            reinsertion_parameters = self._with_time_limit(search_parameters, budget_seconds * REINSERTION_SHARE)
+            search_parameters = self._with_time_limit(search_parameters, budget_seconds * (1 - REINSERTION_SHARE))
+        sequences, solve_metrics = self.decomposition_service.solve(
+            data, jobs, technicians, search_parameters, plateau, reinsertion_parameters=reinsertion_parameters
+        )
+        solve_metrics['objective'], dropped = self._plan_objective(data, sequences)
+        if dropped and not data['capacity']['over_capacity']:
+            print(f"Warning: routing zones left {dropped} jobs unassigned for {data.get('date')}")
+        return sequences, solve_metrics
+    
+    def _plan_objective(self, data, sequences):
+        """Travel minutes of a plan plus DROP_PENALTY per servable job it leaves out; returns (objective, dropped)"""
+        num_technicians = data['num_vehicles']
+        routed = {node for sequence in sequences for node, _ in sequence}
+        dropped = sum(
+            1 for node in range(num_technicians, len(data['distance_matrix']))
+            if node not in routed and node not in data['unservable']
+        )
+        travel = self.decomposition_service.total_travel_minutes(data, sequences)
+        return travel + DROP_PENALTY * dropped, dropped
+    
+    def _screening_metrics(self, data, jobs, technicians, routes, unqualified_jobs=()):
+        """Pre-screen findings of a data model and the servable jobs its routes left out.
+        
+        unqualified_jobs, the IDs of jobs filtered out before the model was
+        built, are listed first among the unservable jobs. Unservable and
+        dropped jobs keep the status they had.
+        """
+        num_technicians = len(technicians)
+        routed = {job_info['job_id'] for route in routes for job_info in route['jobs']}
+        capacity = dict(data['capacity'])
+        capacity['overloaded_groups'] = [
+            {"technician_ids": [technicians[vehicle_id]['_id'] for vehicle_id in group['vehicles']],
+             "required_minutes": group['required_minutes'], "available_minutes": group['available_minutes']}
+            for group in capacity['overloaded_groups']
+        ]
+        return {
+            "unservable_jobs": self._unqualified_metrics(unqualified_jobs) + [
+                {"job_id": jobs[node - num_technicians]['_id'], "reason": reason}
+                for node, reason in sorted(data['unservable'].items())
+            ],
+            "dropped_jobs": [
+                job['_id'] for job_idx, job in enumerate(jobs)
+                if job['_id'] not in routed and num_technicians + job_idx not in data['unservable']
+            ],
+            "capacity": capacity
+        }
+    
+    def _unqualified_metrics(self, job_ids):
+        """Unservable-job entries for jobs no technician has the skills for"""
+        return [{"job_id": job_id, "reason": NO_QUALIFIED_TECHNICIAN} for job_id in job_ids]
+    
+    def _initial_routes(self, data, jobs, technicians):
+        """Seed routes from the persisted plan, with pending jobs added by cheapest insertion.
+        
+        Unservable jobs and jobs that fit nowhere are left out, as the solver
+        may drop them. Returns per-vehicle node lists, or None when there is no plan.
+        """
+        num_technicians = len(technicians)
+        tech_index = {tech['_id']: vehicle_id for vehicle_id, tech in enumerate(technicians)}
+        unservable = data.get('unservable', {})
+        
+        # Assigned jobs in ETA order form the current routes
+        planned = sorted(
+            (tech_index[job['technician_id']], self._time_to_minutes(job.get('estimated_arrival_time') or '23:59'),
+             num_technicians + job_idx)
+            for job_idx, job in enumerate(jobs)
+            if job.get('status') == 'assigned' and job.get('technician_id') in tech_index
+            and num_technicians + job_idx not in unservable
+        )
+        if not planned:
+            return None
+        
+        routes = [[] for _ in technicians]
+        for vehicle_id, _, node in planned:
+            routes[vehicle_id].append(node)
+        
+        # Jobs added since the plan was made go where they are cheapest
+        planned_nodes = {node for _, _, node in planned}
+        for node in range(num_technicians, num_technicians + len(jobs)):
+            if node in planned_nodes or node in unservable:
+                continue
+            best = None
+            for vehicle_id, route in enumerate(routes):
+                insertion = best_insertion(data, vehicle_id, route, node)
+                if insertion and (best is None or insertion[0] < best[0]):
+                    best = (insertion[0], insertion[1], vehicle_id)
+            if best is not None:
+                routes[best[2]].insert(best[1], node)
+        
+        return routes
+    
     def _process_solution(self, solution, data, jobs, technicians, locations):
         """Process the solution from OR-Tools"""
-        routes = []
-        
         if not solution:
-            return routes
+            return []
         
-        # Get the routing model
-        manager = solution.routing_index_manager
-        routing = solution.routing_model
+        return self._build_routes(self._extract_sequences(solution, data), jobs, technicians)
+    
+    def _extract_sequences(self, solution, data):
+        """Read each vehicle's visited nodes and arrival minutes from an OR-Tools solution"""
+        return self._read_sequences(solution.routing_index_manager, solution.routing_model, data,
+                                    solution.Value, solution.Min)
+    
+    def _read_sequences(self, manager, routing, data, value, earliest):
+        """Per-vehicle (node, arrival minutes) lists, reading variables through value() and earliest()"""
         time_dimension = routing.GetDimensionOrDie('Time')
         
-        # Process each vehicle route
+        sequences = []
         for vehicle_id in range(data['num_vehicles']):
+            sequence = []
+            index = value(routing.NextVar(routing.Start(vehicle_id)))
+            while not routing.IsEnd(index):
+                # Earliest feasible arrival at this stop
+                sequence.append((manager.IndexToNode(index), earliest(time_dimension.CumulVar(index))))
+                index = value(routing.NextVar(index))
+            sequences.append(sequence)
+        
+        return sequences
+    
+    def _build_routes(self, sequences, jobs, technicians):
+        """Build the routes response from per-technician (node, arrival minutes) sequences"""
+        routes = []
+        
+        # Process each vehicle route
+        for vehicle_id, sequence in enumerate(sequences):
             route = {
                 "technician_id": technicians[vehicle_id]['_id'],
                 "technician_name": technicians[vehicle_id]['name'],
                 "jobs": []
             }
             
-            index = routing.Start(vehicle_id)
-            while not routing.IsEnd(index):
-                node_index = manager.IndexToNode(index)
+            for node_index, arrival_time in sequence:
+                # Skip technician starting points
+                if node_index < len(technicians):
+                    continue
                 
-                # Skip the depot (technician starting point)
-                if node_index >= len(technicians):
-                    job_index = node_index - len(technicians)
-                    job = jobs[job_index]
-                    
-                    # Get the time window
-                    time_var = time_dimension.CumulVar(index)
-                    arrival_time = solution.Min(time_var)
-                    departure_time = arrival_time + job.get('estimated_duration', 60)
-                    
-                    # Format times
-                    arrival_time_str = self._minutes_to_time(arrival_time)
-                    departure_time_str = self._minutes_to_time(departure_time)
-                    
-                    # Add job to route
-                    route["jobs"].append({
-                        "job_id": job['_id'],
-                        "customer_id": job['customer_id'],
-                        "service_type": job['service_type'],
-                        "location": job['location'],
-                        "estimated_arrival_time": arrival_time_str,
-                        "estimated_departure_time": departure_time_str,
-                        "estimated_duration": job.get('estimated_duration', 60)
-                    })
+                job = jobs[node_index - len(technicians)]
+                departure_time = arrival_time + job.get('estimated_duration', 60)
                 
-                index = solution.Value(routing.NextVar(index))
+                # Add job to route
+                route["jobs"].append({
+                    "job_id": job['_id'],
+                    "customer_id": job['customer_id'],
+                    "service_type": job['service_type'],
+                    "location": job['location'],
+                    "estimated_arrival_time": self._minutes_to_time(arrival_time),
+                    "estimated_departure_time": self._minutes_to_time(departure_time),
+                    "estimated_duration": job.get('estimated_duration', 60)
+                })
             
             # Only add routes with jobs
             if route["jobs"]:
@@ -339,29 +1477,40 @@ class RoutingService:
         
         return routes
     
-    def _assign_jobs_to_technicians(self, routes):
-        """Assign jobs to technicians based on the optimized routes"""
-        assigned_jobs = 0
+    def commit_assignments(self, assignments):
+        """Write a plan's assignments (see _plan_assignments) in one bulk write.
+        
+        Jobs whose status or technician changed since the plan was made are
+        left alone. Returns (number of jobs assigned, IDs of skipped jobs).
+        """
+        result = self.job_service.bulk_assign_jobs(assignments)
+        return result["matched"], result["skipped_job_ids"]
+    
+    def _plan_assignments(self, routes, jobs):
+        """Job assignments of the optimized routes, each with the job state it was planned from"""
+        jobs_by_id = {job['_id']: job for job in jobs}
+        assignments = []
         
         for route in routes:
             technician_id = route["technician_id"]
             
             for job_info in route["jobs"]:
-                job_id = job_info["job_id"]
-                
                 # Update job with technician assignment and estimated times
-                update_data = {
+                assignments.append({
+                    "job_id": job_info["job_id"],
                     "technician_id": technician_id,
-                    "status": "assigned",
                     "estimated_arrival_time": job_info["estimated_arrival_time"],
-                    "estimated_departure_time": job_info["estimated_departure_time"]
-                }
-                
-                success = self.job_service.update_job(job_id, update_data)
-                if success:
-                    assigned_jobs += 1
+                    "estimated_departure_time": job_info["estimated_departure_time"],
+                    "expected": self._expected_job_state(jobs_by_id[job_info["job_id"]])
+                })
         
-        return assigned_jobs
+        return assignments
+    
+    def _expected_job_state(self, job):
+        """Fields a job must still have for a plan made from it to be written"""
+        if job.get('status') == 'assigned':
+            return {"status": "assigned", "technician_id": job.get('technician_id')}
+        return {"status": job.get('status', 'pending')}
     
     def _time_to_minutes(self, time_str):
         """Convert time string (HH:MM) to minutes since midnight"""
@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Per-process routing service of worker processes
+_worker_routing_service = None
+
+def _solve_scenario(date, params):
+    """Dry-run one scenario inside a worker process; returns the optimize_routes_for_date result"""
+    global _worker_routing_service
+
+    if _worker_routing_service is None:
+        # Imported here so the MongoDB client is created inside the worker
+        from services.routing_service import RoutingService
+        _worker_routing_service = RoutingService()
+
+    return _worker_routing_service.optimize_routes_for_date(date, dry_run=True, memoize=False, **params)
+
+class ScenarioService:
+    """Service for solving what-if variants of one date side by side.
+
+    Each scenario is a set of optimize_routes_for_date arguments (e.g.
+    overtime_minutes, exclude_technician_ids or consider_traffic). The
+    scenarios are dry runs solved concurrently in worker processes, so
+    nothing is written; a chosen scenario's assignments can be committed
+    later with RoutingService.commit_assignments.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or int(os.environ.get('ROUTING_MAX_WORKERS', os.cpu_count() or 1))
+
+    def solve(self, date, scenarios):
+        """Solve scenarios ([{"name", "params"}]) for date.
+
+        Returns a result per scenario, in order, with its name, params,
+        routes, assignments and metrics, or its error if it failed.
+        """
+        results = []
+        if not scenarios:
+            return results
+
+        workers = min(self.max_workers, len(scenarios))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(_solve_scenario, date, scenario['params']) for scenario in scenarios]
+
+            for scenario, future in zip(scenarios, futures):
+                try:
+                    result = future.result()
+                    results.append({"name": scenario['name'], "params": scenario['params'], **result})
+                except Exception as e:
+                    print(f"Error solving routing scenario {scenario['name']}: {e}")
+                    results.append({"name": scenario['name'], "params": scenario['params'], "error": str(e)})
+
+        return results
+
+    def compare(self, results):
+        """One row of headline figures per scenario result, for side-by-side display"""
+        rows = []
+        for result in results:
+            if 'error' in result:
+                rows.append({"name": result['name'], "error": result['error']})
+                continue
+
+            metrics = result['metrics']
+            routes = result['routes']
+            rows.append({
+                "name": result['name'],
+                "total_jobs": metrics.get('total_jobs', 0),
+                "assigned_jobs": metrics.get('assigned_jobs', 0),
+                "unassigned_jobs": metrics.get('total_jobs', 0) - metrics.get('assigned_jobs', 0),
+                "objective": metrics.get('objective'),
+                "technicians_used": len(routes),
+                "last_departure_time": max(
+                    (job_info['estimated_departure_time'] for route in routes for job_info in route['jobs']),
+                    default=None
+                ),
+                "stop_reason": metrics.get('stop_reason')
+            })
+        return rows
@@ -0,0 +1,238 @@
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from dotenv import load_dotenv
+from services.distance_matrix_service import MISSING
+
+# Load environment variables
+load_dotenv()
+
+# Bucket used for travel times that do not depend on the departure time
+NO_BUCKET = -1
+
+class TravelTimeCache:
+    """Persistent SQLite store of travel times between snapped coordinates.
+
+    Keys are (source, origin, destination, departure bucket), with
+    coordinates snapped to `precision` decimal places and stored as
+    integers. Entries expire after `ttl` seconds. Recency is tracked per
+    origin point, and the rows of the least recently used origins are
+    evicted once the store grows past `max_entries`.
+    """
+
+    def __init__(self, db_path=None, precision=None, bucket_minutes=None, ttl=None, max_entries=None):
+        self.db_path = db_path or os.environ.get('TRAVEL_TIME_CACHE_PATH', 'travel_time_cache.sqlite3')
+        self.precision = precision if precision is not None else int(os.environ.get('TRAVEL_TIME_CACHE_PRECISION', 4))
+        self.bucket_minutes = bucket_minutes or int(os.environ.get('TRAVEL_TIME_CACHE_BUCKET_MINUTES', 60))
+        self.ttl = ttl if ttl is not None else int(os.environ.get('TRAVEL_TIME_CACHE_TTL', 7 * 24 * 3600))
+        self.max_entries = max_entries or int(os.environ.get('TRAVEL_TIME_CACHE_MAX_ENTRIES', 2000000))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._create_schema()
+
+    def _create_schema(self):
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS travel_times (
+                    source TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    olat INTEGER NOT NULL,
+                    olng INTEGER NOT NULL,
+                    dlat INTEGER NOT NULL,
+                    dlng INTEGER NOT NULL,
+                    minutes INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (source, bucket, olat, olng, dlat, dlng)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS origin_usage (
+                    source TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    lat INTEGER NOT NULL,
+                    lng INTEGER NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (source, bucket, lat, lng)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_origin_usage_last_used ON origin_usage (last_used)")
+            self._conn.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS lookup_points (
+                    idx INTEGER PRIMARY KEY,
+                    lat INTEGER NOT NULL,
+                    lng INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS temp.idx_lookup_points_lat_lng ON lookup_points (lat, lng)")
+
+    def bucket_for(self, departure):
+        """Time-of-day bucket for a departure datetime (or minutes since midnight)"""
+        if departure is None:
+            return NO_BUCKET
+        minutes = departure if isinstance(departure, (int, float)) else departure.hour * 60 + departure.minute
+        return int(minutes) // self.bucket_minutes
+
+    def snap(self, locations):
+        """Snap locations to the cache grid; returns unique points and each location's point index"""
+        scale = 10 ** self.precision
+        coords = np.array([(loc['lat'], loc['lng']) for loc in locations], dtype=np.float64).reshape(-1, 2)
+        snapped = np.rint(coords * scale).astype(np.int64)
+        points, inverse = np.unique(snapped, axis=0, return_inverse=True)
+        return points, inverse.reshape(-1)
+
+    def lookup(self, locations, source, bucket=NO_BUCKET, mask=None):
+        """Look up every requested cell in one pass.
+
+        Returns (matrix, missing): an int32 matrix with cached minutes (MISSING
+        where absent) and a boolean mask of requested cells that missed.
+        """
+        n = len(locations)
+        if mask is None:
+            mask = ~np.eye(n, dtype=bool)
+
+        matrix = np.full((n, n), MISSING, dtype=np.int32)
+        np.fill_diagonal(matrix, 0)
+        if n == 0:
+            return matrix, mask.copy()
+
+        points, inverse = self.snap(locations)
+        point_matrix = np.full((len(points), len(points)), MISSING, dtype=np.int32)
+        now = time.time()
+
+        with self._lock, self._conn:
+            self._load_points(points)
+            # CROSS JOIN pins the join order: scan the points, then seek the primary key
+            rows = self._conn.execute("""
+                SELECT o.idx, d.idx, t.minutes
+                FROM lookup_points o
+                CROSS JOIN travel_times t
+                  ON t.source = ? AND t.bucket = ? AND t.olat = o.lat AND t.olng = o.lng
+                CROSS JOIN lookup_points d
+                  ON d.lat = t.dlat AND d.lng = t.dlng
+                WHERE t.created_at >= ?
+            """, (source, bucket, now - self.ttl)).fetchall()
+
+            if rows:
+                self._touch_origins(source, bucket, points, now)
+
+        if rows:
+            cells = np.array(rows, dtype=np.int64)
+            point_matrix[cells[:, 0], cells[:, 1]] = cells[:, 2]
+
+        cached = point_matrix[np.ix_(inverse, inverse)]
+        matrix[mask] = cached[mask]
+        missing = mask & (matrix == MISSING)
+
+        requested = int(mask.sum())
+        missed = int(missing.sum())
+        with self._lock:
+            self.hits += requested - missed
+            self.misses += missed
+
+        return matrix, missing
+
+    def store(self, locations, matrix, source, bucket=NO_BUCKET, mask=None):
+        """Store the cells selected by mask (default: every off-diagonal cell that is not MISSING)"""
+        n = len(locations)
+        if mask is None:
+            mask = ~np.eye(n, dtype=bool)
+        mask = mask & (matrix != MISSING)
+        if not mask.any():
+            return 0
+
+        points, inverse = self.snap(locations)
+        origins, destinations = np.nonzero(mask)
+        o_points = points[inverse[origins]]
+        d_points = points[inverse[destinations]]
+        values = matrix[origins, destinations]
+        now = time.time()
+
+        entries = [
+            (source, bucket, int(o[0]), int(o[1]), int(d[0]), int(d[1]), int(v), now)
+            for o, d, v in zip(o_points, d_points, values)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany("""
+                INSERT OR REPLACE INTO travel_times
+                    (source, bucket, olat, olng, dlat, dlng, minutes, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, entries)
+            self._touch_origins(source, bucket, np.unique(o_points, axis=0), now)
+
+        self.evict()
+        return len(entries)
+
+    def evict(self):
+        """Drop expired entries, then the rows of least recently used origins beyond max_entries"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM travel_times WHERE created_at < ?", (time.time() - self.ttl,))
+            excess = self._conn.execute("SELECT COUNT(*) FROM travel_times").fetchone()[0] - self.max_entries
+            if excess <= 0:
+                return
+
+            oldest = self._conn.execute(
+                "SELECT source, bucket, lat, lng FROM origin_usage ORDER BY last_used"
+            ).fetchall()
+            for key in oldest:
+                deleted = self._conn.execute(
+                    "DELETE FROM travel_times WHERE source = ? AND bucket = ? AND olat = ? AND olng = ?", key
+                ).rowcount
+                self._conn.execute(
+                    "DELETE FROM origin_usage WHERE source = ? AND bucket = ? AND lat = ? AND lng = ?", key
+                )
+                excess -= deleted
+                if excess <= 0:
+                    break
+
+    def bucket_ratios(self, source):
+        """Per departure bucket: (bucket, mean ratio of its travel times to each pair's mean, pairs).
+
+        Only unexpired pairs cached for at least two buckets are compared.
+        """
+        with self._lock:
+            return self._conn.execute("""
+                SELECT t.bucket, AVG(t.minutes / p.mean_minutes), COUNT(*)
+                FROM travel_times t
+                JOIN (
+                    SELECT olat, olng, dlat, dlng, AVG(minutes) AS mean_minutes
+                    FROM travel_times
+                    WHERE source = ? AND bucket != ? AND created_at >= ?
+                    GROUP BY olat, olng, dlat, dlng
+                    HAVING COUNT(*) >= 2 AND AVG(minutes) > 0
+                ) p ON p.olat = t.olat AND p.olng = t.olng AND p.dlat = t.dlat AND p.dlng = t.dlng
+                WHERE t.source = ? AND t.bucket != ? AND t.created_at >= ?
+                GROUP BY t.bucket
+            """, (source, NO_BUCKET, time.time() - self.ttl, source, NO_BUCKET, time.time() - self.ttl)).fetchall()
+
+    def stats(self):
+        """Hit/miss counters for this process"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0
+            }
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM travel_times")
+            self._conn.execute("DELETE FROM origin_usage")
+
+    def _touch_origins(self, source, bucket, points, now):
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO origin_usage (source, bucket, lat, lng, last_used) VALUES (?, ?, ?, ?, ?)",
+            [(source, bucket, int(lat), int(lng), now) for lat, lng in points]
+        )
+
+    def _load_points(self, points):
+        self._conn.execute("DELETE FROM lookup_points")
+        self._conn.executemany(
+            "INSERT INTO lookup_points (idx, lat, lng) VALUES (?, ?, ?)",
+            [(i, int(lat), int(lng)) for i, (lat, lng) in enumerate(points)]
+        )
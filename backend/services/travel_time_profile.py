@@ -0,0 +1,97 @@
+import json
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+MINUTES_PER_DAY = 24 * 60
+
+class TravelTimeProfile:
+    """Time-of-day multipliers for travel times.
+
+    The day is split into buckets of `bucket_minutes`, each with a factor
+    that scales the base (time-independent) travel time, e.g. 1.4 in the
+    morning rush. Profiles come from a JSON file
+    ({"bucket_minutes": 60, "factors": [...one per bucket...]}) or are
+    learned from the departure-bucketed travel times in the travel-time cache.
+    """
+
+    def __init__(self, factors, bucket_minutes=60):
+        self.bucket_minutes = bucket_minutes
+        self.factors = np.asarray(factors, dtype=np.float64)
+        if len(self.factors) != MINUTES_PER_DAY // bucket_minutes:
+            raise ValueError(f"Expected {MINUTES_PER_DAY // bucket_minutes} factors, got {len(self.factors)}")
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as profile_file:
+            raw = json.load(profile_file)
+        return cls(raw['factors'], raw.get('bucket_minutes', 60))
+
+    @classmethod
+    def from_history(cls, travel_time_cache, source="google", min_samples=100):
+        """Learn factors from cached travel times of pairs seen in several departure buckets.
+
+        Each bucket's factor is the mean ratio of its travel times to the same
+        pairs' mean over all buckets; buckets with fewer than min_samples
+        pairs keep a factor of 1.
+        """
+        bucket_minutes = travel_time_cache.bucket_minutes
+        factors = np.ones(MINUTES_PER_DAY // bucket_minutes)
+        for bucket, factor, samples in travel_time_cache.bucket_ratios(source):
+            if samples >= min_samples and 0 <= bucket < len(factors):
+                factors[bucket] = factor
+        return cls(factors, bucket_minutes)
+
+    @classmethod
+    def from_environment(cls, travel_time_cache=None):
+        """Profile named by TRAVEL_TIME_PROFILE: a JSON file path, 'history', or unset for none"""
+        setting = os.environ.get('TRAVEL_TIME_PROFILE')
+        if not setting:
+            return None
+        try:
+            if setting == 'history':
+                return cls.from_history(travel_time_cache)
+            return cls.from_file(setting)
+        except Exception as e:
+            print(f"Error loading travel-time profile: {e}")
+            return None
+
+    def bucket_for(self, minutes):
+        """Bucket of minutes since midnight (scalar or array)"""
+        return np.clip(np.asarray(minutes) // self.bucket_minutes, 0, len(self.factors) - 1).astype(np.int64)
+
+    def tensor(self, base_matrix, first_minute=0, last_minute=MINUTES_PER_DAY - 1):
+        """Travel times for every distinct factor between two times of day.
+
+        Returns (tensor, levels): a (distinct factors x n x n) int32 array and,
+        for every bucket of the day, the tensor slice it uses (-1 outside the
+        range). Buckets with equal factors share one slice.
+        """
+        buckets = np.arange(self.bucket_for(first_minute), self.bucket_for(last_minute) + 1)
+        distinct, slices = np.unique(self.factors[buckets], return_inverse=True)
+        levels = np.full(len(self.factors), -1, dtype=np.int64)
+        levels[buckets] = slices
+
+        base = np.asarray(base_matrix)
+        tensor = np.empty((len(distinct), *base.shape), dtype=np.int32)
+        for level, factor in enumerate(distinct):
+            tensor[level] = np.rint(base * factor)
+        return tensor, levels
+
+    def slices_for(self, levels, departures):
+        """Tensor slice of each departure minute (departures outside the tensor's range use the nearest slice)"""
+        node_slices = levels[self.bucket_for(departures)]
+        outside = node_slices < 0
+        if outside.any():
+            in_range = np.flatnonzero(levels >= 0)
+            buckets = self.bucket_for(np.asarray(departures)[outside])
+            nearest = in_range[np.abs(in_range[None, :] - buckets[:, None]).argmin(axis=1)]
+            node_slices[outside] = levels[nearest]
+        return node_slices
+
+    def departure_matrix(self, tensor, node_slices):
+        """n x n travel times where row i comes from node i's slice"""
+        return tensor[node_slices, np.arange(tensor.shape[1])]
@@ -0,0 +1,62 @@
+import random
+import mongomock
+import pytest
+from services.db_service import DatabaseService
+
+# A Monday, so technicians have their default working hours
+PLAN_DATE = "2030-01-07"
+
+@pytest.fixture(autouse=True)
+def environment(tmp_path, monkeypatch):
+    """Offline travel times and stores under tmp_path"""
+    for name in ('GOOGLE_MAPS_API_KEY', 'ROAD_NETWORK_PATH', 'TRAVEL_TIME_PROFILE', 'ROUTING_SHARED_MATRIX_DIR'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('TRAVEL_TIME_CACHE_PATH', str(tmp_path / "travel_time_cache.sqlite3"))
+    monkeypatch.setenv('ROUTING_RESULT_CACHE_PATH', str(tmp_path / "routing_result_cache.sqlite3"))
+    monkeypatch.setenv('ROUTING_DAY_MATRIX_PATH', str(tmp_path / "routing_day_matrices.sqlite3"))
+    monkeypatch.setenv('OPTIMIZATION_QUEUE_PATH', str(tmp_path / "optimization_queue.sqlite3"))
+
+@pytest.fixture(autouse=True)
+def db(monkeypatch):
+    """In-memory MongoDB behind DatabaseService"""
+    client = mongomock.MongoClient()
+    service = object.__new__(DatabaseService)
+    service.client = client
+    service.db = client.get_database("isp_routing_test")
+    monkeypatch.setattr(DatabaseService, '_instance', service)
+    return service.db
+
+@pytest.fixture
+def routing_service():
+    from services.routing_service import RoutingService
+    return RoutingService()
+
+@pytest.fixture
+def plan_date():
+    return PLAN_DATE
+
+@pytest.fixture
+def seed_day(routing_service):
+    """Create technicians and pending jobs around a city center on PLAN_DATE; returns their IDs"""
+    def seed(num_technicians=3, num_jobs=12, seed=7, center=(14.5995, 120.9842), spread=0.05):
+        rng = random.Random(seed)
+
+        def location():
+            return {"lat": center[0] + rng.uniform(-spread, spread), "lng": center[1] + rng.uniform(-spread, spread)}
+
+        technician_ids = [
+            routing_service.technician_service.create_technician({
+                "name": f"Technician {i}", "email": f"tech{i}@example.com", "phone": f"+63 900 000 {i:04d}",
+                "skills": [], "location": location()
+            })
+            for i in range(num_technicians)
+        ]
+        job_ids = [
+            routing_service.job_service.create_job({
+                "customer_id": f"customer{i}", "service_type": "repair", "location": location(),
+                "scheduled_date": PLAN_DATE, "estimated_duration": rng.choice([30, 45, 60])
+            })
+            for i in range(num_jobs)
+        ]
+        return technician_ids, job_ids
+    return seed
@@ -0,0 +1,72 @@
+import numpy as np
+from services.day_matrix_cache import DayMatrix, DayMatrixCache
+from services.distance_matrix_service import MISSING
+
+def test_only_new_locations_take_their_travel_times_from_the_fetched_matrix():
+    day_matrix = DayMatrix()
+    full = np.arange(16, dtype=np.int32).reshape(4, 4)
+    day_matrix.update(["a", "b", "c"], full[:3, :3], np.ones(3, dtype=bool))
+
+    # Known cells of the fetched matrix are ignored
+    keys, order = ["a", "c", "d"], [0, 2, 3]
+    fetched = np.full((3, 3), MISSING, dtype=np.int32)
+    fetched[2, :] = full[3, order]
+    fetched[:, 2] = full[order, 3]
+    new = day_matrix.positions(keys) < 0
+
+    assert new.tolist() == [False, False, True]
+    np.testing.assert_array_equal(day_matrix.update(keys, fetched, new), full[np.ix_(order, order)])
+
+def test_unchanged_locations_need_no_fetched_matrix():
+    day_matrix = DayMatrix()
+    matrix = np.array([[0, 5], [6, 0]], dtype=np.int32)
+    day_matrix.update(["a", "b"], matrix, np.ones(2, dtype=bool))
+
+    np.testing.assert_array_equal(day_matrix.update(["b", "a"], None, np.zeros(2, dtype=bool)),
+                                  [[0, 6], [5, 0]])
+
+def test_removed_locations_free_their_slots():
+    day_matrix = DayMatrix()
+    keys = [f"job{i}" for i in range(16)]
+    day_matrix.update(keys, np.zeros((16, 16), dtype=np.int32), np.ones(16, dtype=bool))
+
+    keys = keys[1:] + ["job16"]
+    day_matrix.update(keys, np.zeros((16, 16), dtype=np.int32), day_matrix.positions(keys) < 0)
+
+    assert len(day_matrix.matrix) == 16
+    assert day_matrix.positions(["job0"]).tolist() == [-1]
+
+def test_cache_drops_least_recently_used_and_invalidated_days():
+    cache = DayMatrixCache(max_days=2, ttl=3600)
+    monday = cache.get(("2030-01-07", True, 9))
+    cache.get(("2030-01-08", True, 9))
+    assert cache.get(("2030-01-07", True, 9)) is monday
+
+    cache.get(("2030-01-09", True, 9))
+    assert cache.get(("2030-01-07", True, 9)) is monday
+    cache.invalidate("2030-01-07")
+    assert cache.get(("2030-01-07", True, 9)) is not monday
+
+def test_expired_days_start_over():
+    cache = DayMatrixCache(max_days=2, ttl=0)
+    monday = cache.get(("2030-01-07", True, 9))
+    monday.update(["a"], np.zeros((1, 1), dtype=np.int32), np.ones(1, dtype=bool))
+
+    assert cache.get(("2030-01-07", True, 9)).positions(["a"]).tolist() == [-1]
+
+def test_saved_days_are_shared_with_other_processes():
+    key = ("2030-01-07", True, 9)
+    keys = [("job", "a", 14.6, 121.0), ("job", "b", 14.5, 121.1)]
+    writer, reader = DayMatrixCache(), DayMatrixCache()
+    assert reader.get(key).positions(keys).tolist() == [-1, -1]
+
+    monday = writer.get(key)
+    monday.update(keys, np.array([[0, 7], [9, 0]], dtype=np.int32), np.ones(2, dtype=bool))
+    writer.save(key, monday)
+
+    shared = reader.get(key)
+    assert (shared.positions(keys) >= 0).all()
+    assert shared.update(keys, None, np.zeros(2, dtype=bool)).tolist() == [[0, 7], [9, 0]]
+    assert reader.get(key) is shared
+    writer.invalidate("2030-01-07")
+    assert reader.get(key).positions(keys).tolist() == [-1, -1]
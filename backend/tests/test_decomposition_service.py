@@ -0,0 +1,82 @@
+import numpy as np
+from concurrent.futures import Future
+from types import SimpleNamespace
+import services.decomposition_service as decomposition_module
+from services.decomposition_service import DecompositionService
+from utils.route_utils import schedule_route
+
+def _two_zone_day():
+    """Technicians 0 and 1 in their own zones; jobs 2 and 3 on technician 0, job 2 next to technician 1"""
+    data = {
+        "distance_matrix": np.array([[0, 10, 30, 10],
+                                     [10, 0, 5, 15],
+                                     [30, 5, 0, 20],
+                                     [10, 15, 20, 0]], dtype=np.int32),
+        "time_windows": [(480, 1020)] * 4,
+        "service_times": [0, 0, 60, 60],
+        "allowed_vehicles": [None] * 4
+    }
+    layout = {
+        "zones": [([0], [1]), ([1], [0])],
+        "centroids": np.array([[0.0, 0.0], [10.0, 0.0]]),
+        "job_points": np.array([[5.5, 0.0], [1.0, 0.0]])
+    }
+    sequences = [list(zip([3, 2], schedule_route(data, 0, [3, 2]))), []]
+    return data, layout, sequences
+
+def test_repair_moves_a_boundary_job_to_the_cheaper_neighboring_route():
+    data, layout, sequences = _two_zone_day()
+
+    repaired, unassigned = DecompositionService().repair_boundaries(data, layout, sequences, [], 2)
+
+    assert [[node for node, _ in sequence] for sequence in repaired] == [[3], [2]]
+    assert [arrival for _, arrival in repaired[1]] == schedule_route(data, 1, [2])
+    assert unassigned == []
+
+def test_repair_keeps_the_routes_when_a_move_cannot_be_timed(monkeypatch):
+    data, layout, sequences = _two_zone_day()
+    monkeypatch.setattr(decomposition_module, 'schedule_route',
+                        lambda data, vehicle_node, route: None if vehicle_node == 0 else schedule_route(
+                            data, vehicle_node, route))
+
+    repaired, _ = DecompositionService().repair_boundaries(data, layout, sequences, [], 2)
+
+    assert repaired == sequences
+
+class InlineExecutor:
+    """Runs zone tasks in the test process"""
+
+    def submit(self, function, *args):
+        future = Future()
+        future.set_result(function(*args))
+        return future
+
+def test_reinsertion_re_solves_only_the_zones_around_a_dropped_job(routing_service, seed_day, plan_date,
+                                                                    monkeypatch):
+    seed_day()
+    jobs, technicians = routing_service._fetch_day_inputs(plan_date)
+    matrix, _, _ = routing_service._build_day_distance_matrix(plan_date, jobs, technicians)
+    data = routing_service._create_data_model(matrix, jobs, technicians, plan_date)
+    monkeypatch.setattr(decomposition_module, '_worker_routing_service', routing_service)
+    monkeypatch.setattr(decomposition_module, '_worker_shared_matrix', SimpleNamespace(array=matrix))
+    decomposition = DecompositionService(zone_size=4)
+    layout = decomposition.build_zones(jobs, technicians)
+    search_parameters = routing_service._search_parameters(time_limit_seconds=1)
+    sequences = routing_service._extract_sequences(routing_service._solve_vrp(data, search_parameters), data)
+
+    # Take one job off its route
+    vehicle_id = next(vehicle_id for vehicle_id, sequence in enumerate(sequences) if sequence)
+    dropped = sequences[vehicle_id][0][0]
+    route = [node for node, _ in sequences[vehicle_id][1:]]
+    sequences[vehicle_id] = list(zip(route, schedule_route(data, vehicle_id, route)))
+
+    reinserted, metrics = decomposition.reinsert(InlineExecutor(), data, layout, jobs, technicians, sequences,
+                                                 [dropped], search_parameters)
+
+    assert metrics['zones'] == 2 and metrics['reinserted_jobs'] == 1
+    assert dropped in {node for sequence in reinserted for node, _ in sequence}
+    job_point = layout['job_points'][dropped - len(technicians)]
+    closest = np.argsort(np.linalg.norm(layout['centroids'] - job_point, axis=1))[:2]
+    outside = [tech_idx for zone, (zone_technicians, _) in enumerate(layout['zones']) if zone not in closest
+               for tech_idx in zone_technicians]
+    assert outside and all(reinserted[tech_idx] is sequences[tech_idx] for tech_idx in outside)
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+import requests
+from services.distance_matrix_service import DistanceMatrixService, MISSING, UNAVAILABLE
+
+LOCATIONS = [{"lat": 14.55, "lng": 121.02}, {"lat": 14.60, "lng": 120.98}, {"lat": 14.65, "lng": 121.05}]
+
+class _Response:
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return self.body
+
+class ScriptedSession:
+    """Answers requests with the scripted responses in turn (an exception is raised); the last one repeats"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        response = self.responses[min(self.calls, len(self.responses) - 1)]
+        self.calls += 1
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+def _ok(minutes):
+    origins, destinations = minutes.shape
+    return _Response(body={"status": "OK", "rows": [
+        {"elements": [{"status": "OK", "duration": {"value": int(minutes[i, j]) * 60}} for j in range(destinations)]}
+        for i in range(origins)
+    ]})
+
+@pytest.fixture
+def service():
+    return DistanceMatrixService(api_key="test", max_workers=1, max_retries=2, retry_backoff=0)
+
+def _upper_mask():
+    return np.triu(np.ones((3, 3), dtype=bool), 1)
+
+def test_rate_limited_requests_are_retried(service):
+    service.session = ScriptedSession(_Response(body={"status": "OVER_QUERY_LIMIT", "rows": []}),
+                                      _Response(503), _ok(np.full((1, 1), 7)))
+
+    matrix = service.build_matrix(LOCATIONS[:2], consider_traffic=False)
+
+    assert service.session.calls == 3
+    assert matrix[0, 1] == 7 and matrix[1, 0] == 7
+
+def test_network_errors_are_retried(service):
+    service.session = ScriptedSession(requests.ConnectionError("reset"), _ok(np.full((1, 1), 4)))
+
+    matrix = service.build_matrix(LOCATIONS[:2], consider_traffic=False)
+
+    assert matrix[0, 1] == 4
+
+def test_cells_of_requests_that_keep_failing_are_unavailable(service):
+    service.session = ScriptedSession(_Response(500))
+
+    matrix = service.build_matrix(LOCATIONS, consider_traffic=False)
+
+    assert service.session.calls == 3 * len(service._plan_batches(_upper_mask()))
+    assert (matrix[~np.eye(3, dtype=bool)] == UNAVAILABLE).all()
+
+def test_rejected_requests_are_not_retried(service):
+    service.session = ScriptedSession(_Response(body={"status": "REQUEST_DENIED", "rows": []}))
+
+    matrix = service.build_matrix(LOCATIONS[:2], consider_traffic=False)
+
+    assert service.session.calls == 1
+    assert matrix[0, 1] == UNAVAILABLE
+
+def test_unroutable_pairs_are_missing_not_unavailable(service):
+    service.session = ScriptedSession(_Response(body={"status": "OK", "rows": [
+        {"elements": [{"status": "ZERO_RESULTS"}]}
+    ]}))
+
+    matrix = service.build_matrix(LOCATIONS[:2], consider_traffic=False)
+
+    assert matrix[0, 1] == MISSING
+
+def test_failed_lookups_are_estimated_but_not_kept(routing_service, seed_day, plan_date, monkeypatch):
+    seed_day(num_technicians=2, num_jobs=4)
+    jobs, technicians = routing_service._fetch_day_inputs(plan_date)
+    routing_service.google_maps_api_key = "test"
+    routing_service.distance_matrix_service.retry_backoff = 0
+    routing_service.distance_matrix_service.session = ScriptedSession(_Response(503))
+
+    matrix, locations, _ = routing_service._build_day_distance_matrix(plan_date, jobs, technicians, False)
+
+    np.testing.assert_array_equal(matrix, routing_service._build_haversine_distance_matrix(locations))
+    _, uncached = routing_service.travel_time_cache.lookup(locations, 'google')
+    assert uncached.sum() == len(locations) * (len(locations) - 1)
+    _, _, reused = routing_service._build_day_distance_matrix(plan_date, jobs, technicians, False)
+    assert reused == 0
@@ -0,0 +1,134 @@
+import os
+import signal
+import threading
+import time
+import pytest
+import services.optimization_queue_service as queue_module
+from services.optimization_queue_service import OptimizationJobStore, OptimizationQueueService
+
+@pytest.fixture
+def store(tmp_path):
+    return OptimizationJobStore(str(tmp_path / "queue.sqlite3"))
+
+class RecordingExecutor:
+    """Stands in for the process pool; keeps what was submitted"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, function, *args):
+        self.submitted.append(args)
+        return _DoneFuture()
+
+class _DoneFuture:
+    def add_done_callback(self, callback):
+        pass
+
+def test_cancelling_a_queued_optimization_stops_it_before_it_runs(store):
+    job_id = store.create({"date": "2030-01-07"}, os.getpid())
+
+    assert store.request_cancel(job_id)
+    assert store.get(job_id)['status'] == 'cancelled'
+    assert [event['event'] for event in store.events(job_id)] == ['cancelled']
+    assert not store.mark_running(job_id)
+
+def test_cancelling_a_running_optimization_is_left_to_the_worker(store):
+    job_id = store.create({"date": "2030-01-07"}, os.getpid())
+    assert store.mark_running(job_id)
+
+    assert store.request_cancel(job_id, accept_current=True)
+    assert store.get(job_id)['status'] == 'running'
+    assert store.cancel_requested(job_id) == 'accept'
+
+def test_finished_optimizations_cannot_be_cancelled(store):
+    job_id = store.create({"date": "2030-01-07"}, os.getpid())
+    store.mark_running(job_id)
+    store.mark_completed(job_id, {"routes": []})
+
+    assert not store.request_cancel(job_id)
+    assert store.get(job_id)['result'] == {"routes": []}
+
+def test_events_resume_after_the_last_seen_id(store):
+    job_id = store.create({"date": "2030-01-07"}, os.getpid())
+    store.update_progress(job_id, "matrix", 0.1)
+    store.update_progress(job_id, "solving", 0.35)
+    first = store.events(job_id)
+
+    assert [event['data']['phase'] for event in store.events(job_id, first[0]['id'])] == ["solving"]
+
+def test_jobs_of_a_dead_process_are_recovered(tmp_path, monkeypatch):
+    queue = OptimizationQueueService(db_path=str(tmp_path / "queue.sqlite3"))
+    dead_pid = os.getpid() + 1
+    monkeypatch.setattr(queue_module, '_process_alive', lambda pid: pid == os.getpid())
+    queued_id = queue.store.create({"date": "2030-01-07"}, dead_pid)
+    running_id = queue.store.create({"date": "2030-01-08"}, dead_pid)
+    queue.store.mark_running(running_id)
+    alive_id = queue.store.create({"date": "2030-01-09"}, os.getpid())
+
+    queue._executor = RecordingExecutor()
+    queue._recover_interrupted()
+
+    assert [args[1] for args in queue._executor.submitted] == [queued_id]
+    assert queue.get_job(running_id)['status'] == 'failed'
+    assert queue.get_job(queued_id)['status'] == 'queued'
+    assert queue.get_job(alive_id)['status'] == 'queued'
+    # Another process recovering at the same time does not get the job too
+    assert not queue.store.claim(queued_id, dead_pid, os.getpid())
+
+def test_worker_runs_an_optimization_and_records_the_result(store, routing_service, seed_day, plan_date,
+                                                            monkeypatch):
+    seed_day()
+    monkeypatch.setattr(queue_module, '_worker_routing_service', routing_service)
+    job_id = store.create({"date": plan_date, "time_limit_seconds": 1}, os.getpid())
+
+    status, metrics = queue_module._run_optimization(store.db_path, job_id, store.get(job_id)['params'])
+
+    assert status == 'completed'
+    assert metrics['assigned_jobs'] == 12
+    job = store.get(job_id)
+    assert job['status'] == 'completed' and job['result']['metrics']['assigned_jobs'] == 12
+    assert store.events(job_id)[-1]['event'] == 'completed'
+
+def test_discarded_optimization_saves_nothing(store, routing_service, seed_day, plan_date, monkeypatch):
+    seed_day()
+    monkeypatch.setattr(queue_module, '_worker_routing_service', routing_service)
+    job_id = store.create({"date": plan_date, "time_limit_seconds": 30, "warm_start": False}, os.getpid())
+
+    outcome = {}
+    worker = threading.Thread(target=lambda: outcome.setdefault(
+        'status', queue_module._run_optimization(store.db_path, job_id, store.get(job_id)['params'])[0]
+    ))
+    worker.start()
+    deadline = time.time() + 20
+    while store.get(job_id)['phase'] != 'solving' and time.time() < deadline:
+        time.sleep(0.05)
+    store.request_cancel(job_id)
+    worker.join(20)
+
+    assert outcome['status'] == 'cancelled'
+    assert store.get(job_id)['status'] == 'cancelled'
+    assert routing_service.job_service.get_all_jobs(status="assigned") == []
+
+def test_a_killed_worker_fails_its_job_and_the_queue_keeps_working(tmp_path, monkeypatch):
+    # Workers cannot reach MongoDB, so each optimization takes a few seconds to find no jobs
+    monkeypatch.setenv('MONGO_URI', 'mongodb://127.0.0.1:1/isp_routing?serverSelectionTimeoutMS=3000')
+    queue = OptimizationQueueService(db_path=str(tmp_path / "queue.sqlite3"), max_workers=1)
+    try:
+        job_id = queue.enqueue({"date": "2030-01-07"})
+        deadline = time.time() + 60
+        while queue.get_job(job_id)['status'] != 'running' and time.time() < deadline:
+            time.sleep(0.05)
+        for process in list(queue._executor._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+        while queue.get_job(job_id)['status'] == 'running' and time.time() < deadline:
+            time.sleep(0.05)
+
+        assert queue.get_job(job_id)['status'] == 'failed'
+        next_id = queue.enqueue({"date": "2030-01-08"})
+        while queue.get_job(next_id)['status'] in ('queued', 'running') and time.time() < deadline:
+            time.sleep(0.05)
+        # A new pool ran it
+        assert queue.get_job(next_id)['status'] == 'completed'
+        assert queue.store.count('queued') == 0 and queue.store.count('running') == 0
+    finally:
+        queue.shutdown()
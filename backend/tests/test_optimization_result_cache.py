@@ -0,0 +1,42 @@
+from services.optimization_result_cache import OptimizationResultCache
+
+def test_put_and_get_round_trip(tmp_path):
+    cache = OptimizationResultCache(db_path=str(tmp_path / "results.sqlite3"))
+    cache.put("abc", "2030-01-07", {"routes": [], "metrics": {"objective": 12}})
+
+    assert cache.get("abc") == {"routes": [], "metrics": {"objective": 12}}
+    assert cache.get("other") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5, "entries": 1}
+
+def test_storing_a_date_replaces_its_older_results(tmp_path):
+    cache = OptimizationResultCache(db_path=str(tmp_path / "results.sqlite3"))
+    cache.put("first", "2030-01-07", {"routes": []})
+    cache.put("second", "2030-01-07", {"routes": []})
+
+    assert cache.get("first") is None
+    assert cache.stats()['entries'] == 1
+
+def test_identical_optimization_is_answered_from_the_stored_plan(routing_service, seed_day, plan_date):
+    seed_day()
+
+    first = routing_service.optimize_routes_for_date(plan_date, time_limit_seconds=1)
+    second = routing_service.optimize_routes_for_date(plan_date, time_limit_seconds=1)
+
+    assert first['metrics']['assigned_jobs'] == 12
+    assert first['metrics']['result_cache'] == 'miss'
+    assert second['metrics']['result_cache'] == 'hit'
+    assert second['routes'] == first['routes']
+    assert routing_service.result_cache.stats()['hits'] == 1
+
+def test_changed_inputs_are_solved_again(routing_service, seed_day, plan_date):
+    seed_day()
+    routing_service.optimize_routes_for_date(plan_date, time_limit_seconds=1)
+    routing_service.job_service.create_job({
+        "customer_id": "late-customer", "service_type": "repair", "location": {"lat": 14.6, "lng": 120.98},
+        "scheduled_date": plan_date
+    })
+
+    result = routing_service.optimize_routes_for_date(plan_date, time_limit_seconds=1)
+
+    assert result['metrics']['result_cache'] == 'miss'
+    assert result['metrics']['assigned_jobs'] == 13
@@ -0,0 +1,40 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future
+from services.portfolio_service import PortfolioService
+
+def _race():
+    context = multiprocessing.get_context('spawn')
+    return context.Value('i', 0), context.Event(), context.Value('d', 0.0)
+
+def test_race_clock_starts_once_every_worker_is_ready(routing_service):
+    race = _race()
+    ready_count, start_event, deadline = race
+    futures = [Future(), Future()]
+    search_parameters = routing_service._search_parameters(10)
+
+    def start_workers():
+        for _ in futures:
+            time.sleep(0.2)
+            with ready_count.get_lock():
+                ready_count.value += 1
+    threading.Thread(target=start_workers).start()
+    submitted = time.time()
+
+    start = PortfolioService()._start_race(race, futures, search_parameters, multiprocessing.Event())
+
+    assert start - submitted >= 0.4
+    assert start_event.is_set()
+    assert abs(deadline.value - (start + 10)) < 1e-6
+
+def test_race_starts_without_a_worker_that_failed(routing_service):
+    race = _race()
+    failed = Future()
+    failed.set_exception(RuntimeError("worker died"))
+
+    start = PortfolioService()._start_race(race, [Future(), failed], routing_service._search_parameters(5),
+                                           multiprocessing.Event())
+
+    assert race[1].is_set()
+    assert abs(race[2].value - (start + 5)) < 1e-6
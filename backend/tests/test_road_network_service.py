@@ -0,0 +1,46 @@
+import os
+import numpy as np
+import pytest
+from services.road_network_service import RoadNetworkService
+
+SAMPLE_GRAPH = os.path.join(os.path.dirname(__file__), '..', 'data', 'sample_road_network.json')
+
+@pytest.fixture
+def road_network():
+    return RoadNetworkService(SAMPLE_GRAPH)
+
+@pytest.fixture
+def locations(road_network):
+    graph = road_network._load()
+    rng = np.random.default_rng(1)
+    return [
+        {"lat": float(rng.uniform(graph['lats'].min(), graph['lats'].max())),
+         "lng": float(rng.uniform(graph['lngs'].min(), graph['lngs'].max()))}
+        for _ in range(40)
+    ]
+
+def test_new_location_costs_one_forward_and_one_reverse_search(road_network, locations):
+    full = road_network.build_matrix(locations)
+    needed = np.zeros((len(locations), len(locations)), dtype=bool)
+    needed[7, :] = True
+    needed[:, 7] = True
+    np.fill_diagonal(needed, False)
+
+    road_network.search_count = 0
+    matrix = road_network.build_matrix(locations, needed)
+
+    assert road_network.search_count == 2
+    assert np.array_equal(matrix[needed], full[needed])
+    assert (matrix[~needed & ~np.eye(len(locations), dtype=bool)] == -1).all()
+
+def test_scattered_cells_search_each_origin_once(road_network, locations):
+    full = road_network.build_matrix(locations)
+    needed = np.random.default_rng(2).random((len(locations), len(locations))) < 0.05
+    np.fill_diagonal(needed, False)
+    origins = np.unique(road_network.snap(locations)[0][needed.any(axis=1)])
+
+    road_network.search_count = 0
+    matrix = road_network.build_matrix(locations, needed)
+
+    assert road_network.search_count <= len(origins)
+    assert np.array_equal(matrix[needed], full[needed])
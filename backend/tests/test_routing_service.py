@@ -0,0 +1,161 @@
+import numpy as np
+
+def _window_end(job):
+    return job['scheduled_time_window']['end']
+
+def test_insert_job_adds_a_pending_job_to_the_current_routes(routing_service, seed_day, plan_date):
+    technician_ids, _ = seed_day()
+    routing_service.optimize_routes_for_date(plan_date, time_limit_seconds=1)
+    job_id = routing_service.job_service.create_job({
+        "customer_id": "new-customer", "service_type": "repair", "location": {"lat": 14.6, "lng": 120.98},
+        "scheduled_date": plan_date, "estimated_duration": 30
+    })
+
+    result = routing_service.insert_job(job_id)
+
+    assert result['technician_id'] in technician_ids
+    assert job_id in result['updated_jobs']
+    job = routing_service.job_service.get_job_by_id(job_id)
+    assert job['status'] == 'assigned'
+    assert job['technician_id'] == result['technician_id']
+    assert job['estimated_arrival_time'] == result['estimated_arrival_time']
+    for assigned_job in routing_service.job_service.get_all_jobs(date=plan_date, status="assigned"):
+        assert assigned_job['estimated_arrival_time'] <= _window_end(assigned_job)
+
+def test_insert_job_only_looks_up_the_new_job_after_an_optimization(routing_service, seed_day, plan_date, monkeypatch):
+    seed_day()
+    routing_service.optimize_routes_for_date(plan_date, time_limit_seconds=1)
+    job_id = routing_service.job_service.create_job({
+        "customer_id": "new-customer", "service_type": "repair", "location": {"lat": 14.6, "lng": 120.98},
+        "scheduled_date": plan_date
+    })
+    masks = []
+    build = routing_service._build_distance_matrix
+    monkeypatch.setattr(routing_service, '_build_distance_matrix',
+                        lambda *args, **kwargs: masks.append(kwargs['mask']) or build(*args, **kwargs))
+
+    routing_service.insert_job(job_id)
+
+    # The date's travel times were kept, so only the new job's row (and, by symmetry, column) is looked up
+    mask = masks[0]
+    assert mask.shape == (16, 16)
+    assert mask[15, :15].all()
+    assert not mask[:15].any()
+
+def test_insert_job_reuses_the_travel_times_of_an_optimization_in_another_process(routing_service, seed_day,
+                                                                                 plan_date, monkeypatch):
+    from services.routing_service import RoutingService
+    seed_day()
+    routing_service.optimize_routes_for_date(plan_date, time_limit_seconds=1)
+    web_service = RoutingService()
+    job_id = web_service.job_service.create_job({
+        "customer_id": "new-customer", "service_type": "repair", "location": {"lat": 14.6, "lng": 120.98},
+        "scheduled_date": plan_date
+    })
+    masks = []
+    build = web_service._build_distance_matrix
+    monkeypatch.setattr(web_service, '_build_distance_matrix',
+                        lambda *args, **kwargs: masks.append(kwargs['mask']) or build(*args, **kwargs))
+
+    assert web_service.insert_job(job_id)['technician_id']
+    assert len(masks) == 1 and masks[0][15, :15].all() and not masks[0][:15].any()
+
+def test_insert_job_only_looks_up_the_new_job_and_the_current_arcs(routing_service, seed_day, plan_date, monkeypatch):
+    seed_day()
+    routing_service.optimize_routes_for_date(plan_date, time_limit_seconds=1)
+    routing_service.day_matrices.invalidate()
+    job_id = routing_service.job_service.create_job({
+        "customer_id": "new-customer", "service_type": "repair", "location": {"lat": 14.6, "lng": 120.98},
+        "scheduled_date": plan_date
+    })
+    masks = []
+    build = routing_service._build_distance_matrix
+    monkeypatch.setattr(routing_service, '_build_distance_matrix',
+                        lambda *args, **kwargs: masks.append(kwargs['mask']) or build(*args, **kwargs))
+
+    routing_service.insert_job(job_id)
+
+    # 3 technicians and 12 jobs: the new job's row, and one arc into each stop and each route's end
+    routed_technicians = {job['technician_id'] for job in routing_service.job_service.get_all_jobs(status="assigned")}
+    mask = masks[0]
+    assert mask.shape == (16, 16)
+    assert mask[15, :15].all()
+    assert mask[:15].sum() == 12 + len(routed_technicians)
+
+def test_insert_job_ignores_jobs_that_are_not_pending(routing_service, seed_day, plan_date):
+    _, job_ids = seed_day()
+    routing_service.optimize_routes_for_date(plan_date, time_limit_seconds=1)
+
+    assert routing_service.insert_job(job_ids[0]) is None
+
+def test_day_matrix_only_looks_up_locations_new_to_the_date(routing_service, seed_day, plan_date, monkeypatch):
+    seed_day()
+    jobs, technicians = routing_service._fetch_day_inputs(plan_date)
+    masks = []
+    build = routing_service._build_distance_matrix
+    monkeypatch.setattr(routing_service, '_build_distance_matrix',
+                        lambda *args, **kwargs: masks.append(kwargs['mask']) or build(*args, **kwargs))
+
+    _, _, first_reused = routing_service._build_day_distance_matrix(plan_date, jobs[1:], technicians)
+    matrix, locations, reused = routing_service._build_day_distance_matrix(plan_date, jobs, technicians)
+
+    assert first_reused == 0
+    assert reused == len(technicians) + len(jobs) - 1
+    # The first job sits right after the technicians
+    assert np.flatnonzero(masks[1].any(axis=1)).tolist() == [len(technicians)]
+    np.testing.assert_array_equal(matrix, routing_service._build_haversine_distance_matrix(locations))
+
+def test_day_matrix_is_not_looked_up_again_for_unchanged_locations(routing_service, seed_day, plan_date, monkeypatch):
+    seed_day()
+    jobs, technicians = routing_service._fetch_day_inputs(plan_date)
+    first, _, _ = routing_service._build_day_distance_matrix(plan_date, jobs, technicians)
+    monkeypatch.setattr(routing_service, '_build_distance_matrix', None)
+
+    second, _, reused = routing_service._build_day_distance_matrix(plan_date, jobs[::-1], technicians)
+
+    assert reused == len(technicians) + len(jobs)
+    order = list(range(len(technicians))) + list(range(len(technicians) + len(jobs) - 1, len(technicians) - 1, -1))
+    np.testing.assert_array_equal(second, first[np.ix_(order, order)])
+
+def test_decomposed_plan_keeps_part_of_the_budget_for_the_zones_around_dropped_jobs(routing_service, seed_day,
+                                                                                   plan_date, monkeypatch):
+    _, job_ids = seed_day()
+    budgets = {}
+
+    def solve(data, jobs, technicians, search_parameters, plateau=None, reinsertion_parameters=None):
+        budgets['zones'] = search_parameters.time_limit.ToMilliseconds()
+        budgets['reinsertion'] = reinsertion_parameters.time_limit.ToMilliseconds()
+        return [[] for _ in technicians], {"solve_seconds": 0.1, "stop_reason": "time_limit", "solutions": 1,
+                                           "decomposition": {"zones": [], "reinsertion": None}}
+    monkeypatch.setattr(routing_service.decomposition_service, 'solve', solve)
+    # The whole day is never solved as one model
+    monkeypatch.setattr(routing_service, '_solve_vrp', None)
+
+    result = routing_service.optimize_routes_for_date(plan_date, time_limit_seconds=10, decompose=True)
+
+    assert budgets == {"zones": 8000, "reinsertion": 2000}
+    assert len(result['metrics']['dropped_jobs']) == len(job_ids)
+
+def test_date_range_matrix_only_covers_technicians_and_jobs_of_the_same_day(routing_service):
+    # 2 technicians, jobs 0 and 2 on one day and job 1 on another
+    mask = routing_service._day_blocks_mask(2, 3, [[0, 2], [1]])
+
+    assert mask[0, 1] and mask[1, 0]
+    assert mask[:2, 2:].all() and mask[2:, :2].all()
+    assert mask[2, 4] and mask[4, 2]
+    assert not mask[2, 3] and not mask[3, 4] and not mask[4, 3]
+    assert not mask.diagonal().any()
+
+def test_jobs_nobody_is_qualified_for_are_reported_as_unservable(routing_service, seed_day, plan_date):
+    seed_day()
+    job_id = routing_service.job_service.create_job({
+        "customer_id": "fiber-customer", "service_type": "repair", "required_skills": ["fiber_splicing"],
+        "location": {"lat": 14.6, "lng": 120.98}, "scheduled_date": plan_date, "estimated_duration": 30
+    })
+
+    metrics = routing_service.optimize_routes_for_date(plan_date, time_limit_seconds=1)['metrics']
+
+    assert metrics['unservable_jobs'] == [{"job_id": job_id, "reason": "no_qualified_technician"}]
+    assert 'unqualified_jobs' not in metrics
+    assert metrics['total_jobs'] == 13 and metrics['assigned_jobs'] == 12
+    assert routing_service.job_service.get_job_by_id(job_id)['status'] == 'pending'
@@ -0,0 +1,90 @@
+"""Pre-screening of a routing data model for jobs no plan can include.
+
+Checks run on whole technician x job arrays before the model is handed to
+OR-Tools: a job is unservable when no qualified technician can reach it
+within its time window, or serve it and get home within working hours and
+the route length limit, even on a route with no other stop. Fleet capacity
+is compared with the total service time as well, but since the solver
+decides which jobs to leave out of an overloaded day, that only yields a
+report.
+"""
+import numpy as np
+from utils.route_utils import MAX_ROUTE_MINUTES
+
+# Reasons a job is unservable, from the first check it fails
+NO_QUALIFIED_TECHNICIAN = "no_qualified_technician"
+TIME_WINDOW_UNREACHABLE = "time_window_unreachable"
+EXCEEDS_WORKING_HOURS = "exceeds_working_hours"
+
+def screen_jobs(data):
+    """Unservable job nodes of a data model and the fleet's capacity.
+
+    Returns (unservable, capacity): unservable maps job nodes to their
+    reason, and capacity is {"required_minutes", "available_minutes",
+    "over_capacity", "overloaded_groups"} for the servable jobs, where each
+    overloaded group is the vehicles a set of jobs is restricted to.
+    """
+    num_vehicles = data['num_vehicles']
+    windows = np.asarray(data['time_windows'], dtype=np.int64)
+    service_times = np.asarray(data['service_times'], dtype=np.int64)
+    travel = np.asarray(data['distance_matrix'])
+    jobs = np.arange(num_vehicles, len(windows))
+    shift_start, shift_end = windows[:num_vehicles, 0], windows[:num_vehicles, 1]
+    max_route_minutes = data.get('max_route_minutes', MAX_ROUTE_MINUTES)
+
+    # Vehicles x jobs: qualified, on time, and home in time on a single-stop route
+    eligible = np.ones((num_vehicles, len(jobs)), dtype=bool)
+    for column, node in enumerate(jobs):
+        allowed = data['allowed_vehicles'][node]
+        if allowed is not None:
+            eligible[:, column] = False
+            eligible[allowed, column] = True
+    outbound = travel[:num_vehicles, num_vehicles:].astype(np.int64)
+    inbound = travel[num_vehicles:, :num_vehicles].T.astype(np.int64)
+    arrival = np.maximum(shift_start[:, None] + outbound, windows[jobs, 0][None, :])
+    on_time = eligible & (arrival <= windows[jobs, 1][None, :])
+    round_trip = outbound + service_times[jobs][None, :] + inbound
+    fits = on_time & (arrival + service_times[jobs][None, :] + inbound <= shift_end[:, None]) \
+        & (round_trip <= max_route_minutes)
+
+    unservable = {}
+    for reason, possible in ((NO_QUALIFIED_TECHNICIAN, eligible), (TIME_WINDOW_UNREACHABLE, on_time),
+                             (EXCEEDS_WORKING_HOURS, fits)):
+        for column in np.flatnonzero(~possible.any(axis=0)):
+            unservable.setdefault(int(jobs[column]), reason)
+
+    return unservable, _capacity(data, unservable, shift_start, shift_end, max_route_minutes)
+
+def _capacity(data, unservable, shift_start, shift_end, max_route_minutes):
+    """Service minutes of the servable jobs against the working minutes of the vehicles they may use"""
+    num_vehicles = data['num_vehicles']
+    vehicle_minutes = np.minimum(shift_end - shift_start, max_route_minutes).clip(min=0)
+
+    # Service minutes by the set of vehicles allowed to do the job (None: any)
+    demand = {}
+    for node in range(num_vehicles, len(data['time_windows'])):
+        if node not in unservable:
+            allowed = data['allowed_vehicles'][node]
+            key = None if allowed is None else frozenset(allowed)
+            demand[key] = demand.get(key, 0) + int(data['service_times'][node])
+
+    # Jobs restricted to a subset of vehicles must fit in that subset's hours
+    overloaded_groups = []
+    for group in demand:
+        if group is None or len(group) == num_vehicles:
+            continue
+        required = sum(minutes for key, minutes in demand.items() if key is not None and key <= group)
+        available = int(vehicle_minutes[list(group)].sum())
+        if required > available:
+            overloaded_groups.append({
+                "vehicles": sorted(group), "required_minutes": required, "available_minutes": available
+            })
+
+    required = sum(demand.values())
+    available = int(vehicle_minutes.sum())
+    return {
+        "required_minutes": required,
+        "available_minutes": available,
+        "over_capacity": required > available or bool(overloaded_groups),
+        "overloaded_groups": overloaded_groups
+    }
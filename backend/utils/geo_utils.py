@@ -0,0 +1,101 @@
+import numpy as np
+
+# Mean earth radius in km (same constant the haversine package uses)
+EARTH_RADIUS_KM = 6371.0088
+
+# Average driving speed used to turn straight-line distance into travel time
+AVERAGE_SPEED_KMH = 40
+
+def locations_to_arrays(locations):
+    """Split a list of {"lat", "lng"} dicts into float64 latitude and longitude arrays"""
+    n = len(locations)
+    lats = np.fromiter((loc['lat'] for loc in locations), dtype=np.float64, count=n)
+    lngs = np.fromiter((loc['lng'] for loc in locations), dtype=np.float64, count=n)
+    return lats, lngs
+
+def haversine_km(lats1, lngs1, lats2, lngs2):
+    """Haversine distance in km between points (NumPy broadcasting rules apply)"""
+    lat1 = np.radians(np.asarray(lats1, dtype=np.float64))
+    lng1 = np.radians(np.asarray(lngs1, dtype=np.float64))
+    lat2 = np.radians(np.asarray(lats2, dtype=np.float64))
+    lng2 = np.radians(np.asarray(lngs2, dtype=np.float64))
+
+    # Same operation order as haversine.haversine so results round identically
+    d = np.sin((lat2 - lat1) * 0.5) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) * 0.5) ** 2
+    return EARTH_RADIUS_KM * (2 * np.arcsin(np.sqrt(d)))
+
+def haversine_distance_km(lats1, lngs1, lats2, lngs2):
+    """Pairwise haversine distance in km between two sets of points (len1 x len2)"""
+    return haversine_km(
+        np.asarray(lats1, dtype=np.float64)[:, None], np.asarray(lngs1, dtype=np.float64)[:, None],
+        np.asarray(lats2, dtype=np.float64)[None, :], np.asarray(lngs2, dtype=np.float64)[None, :]
+    )
+
+def minutes_from_km(distance_km, speed_kmh=AVERAGE_SPEED_KMH):
+    """Convert distances in km to whole travel minutes at a constant speed"""
+    # np.rint rounds half to even, exactly like the built-in round()
+    return np.rint(distance_km / speed_kmh * 60).astype(np.int32)
+
+def haversine_time_matrix(lats, lngs, speed_kmh=AVERAGE_SPEED_KMH, block_rows=1024):
+    """Build the symmetric travel-time matrix (minutes, int32) between all points.
+
+    Rows are computed in broadcasted blocks so the float64 temporaries stay
+    bounded at block_rows x n instead of n x n.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    n = len(lats)
+    matrix = np.zeros((n, n), dtype=np.int32)
+
+    for start in range(0, n, block_rows):
+        stop = min(start + block_rows, n)
+        distance_km = haversine_distance_km(lats[start:stop], lngs[start:stop], lats, lngs)
+        matrix[start:stop] = minutes_from_km(distance_km, speed_kmh)
+
+    return matrix
+
+def project_equirectangular(lats, lngs, reference_lat=None):
+    """Project coordinates to a local plane in km (good enough within a city).
+
+    Pass the same reference_lat to project several point sets onto one plane;
+    it defaults to the mean latitude of the points.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    if reference_lat is None:
+        reference_lat = lats.mean() if len(lats) else 0.0
+    km_per_degree = np.pi * EARTH_RADIUS_KM / 180
+    x = lngs * np.cos(np.radians(reference_lat)) * km_per_degree
+    y = lats * km_per_degree
+    return np.column_stack((x, y))
+
+def kmeans(points, k, seed=0, iterations=25):
+    """Cluster points (n x 2) into k groups; returns (labels, centroids)"""
+    points = np.asarray(points, dtype=np.float64)
+    n = len(points)
+    k = max(1, min(k, n))
+    rng = np.random.default_rng(seed)
+
+    # k-means++ seeding
+    centroids = np.empty((k, points.shape[1]))
+    centroids[0] = points[rng.integers(n)]
+    closest = ((points - centroids[0]) ** 2).sum(axis=1)
+    for cluster in range(1, k):
+        total = closest.sum()
+        choice = rng.choice(n, p=closest / total) if total > 0 else rng.integers(n)
+        centroids[cluster] = points[choice]
+        closest = np.minimum(closest, ((points - centroids[cluster]) ** 2).sum(axis=1))
+
+    labels = None
+    for iteration in range(iterations):
+        distances = ((points[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        new_labels = distances.argmin(axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for cluster in range(k):
+            members = points[labels == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+
+    return labels, centroids
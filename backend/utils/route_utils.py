@@ -0,0 +1,93 @@
+"""Schedule helpers for routes expressed as node sequences of a routing data model.
+
+A route is the list of job nodes a technician visits; the technician's own
+node (their start location) is implied at both ends. Schedules match the
+OR-Tools time dimension: every stop is reached within its window, waiting
+before a stop is capped at MAX_WAITING_MINUTES (the technician leaves later
+instead), and the day fits within working hours and MAX_ROUTE_MINUTES.
+"""
+
+# Longest working day for one technician, in minutes
+MAX_ROUTE_MINUTES = 8 * 60
+
+# Longest a technician may wait at a stop for its time window to open
+MAX_WAITING_MINUTES = 30
+
+def schedule_route(data, vehicle_node, route, depart_at=None):
+    """Earliest feasible arrival minute at every stop of a route, or None if infeasible.
+
+    depart_at pins the departure time (e.g. a technician already on the road);
+    otherwise the technician leaves within their working hours.
+    """
+    travel = data['distance_matrix']
+    time_windows = data['time_windows']
+    service_times = data['service_times']
+    shift_start, shift_end = time_windows[vehicle_node]
+    if not route:
+        return []
+
+    # Forward pass: earliest arrival everywhere, waiting as long as needed
+    current_time = shift_start if depart_at is None else depart_at
+    previous = vehicle_node
+    arrivals = []
+    for node in route:
+        current_time = max(current_time + int(travel[previous][node]), time_windows[node][0])
+        arrivals.append(current_time)
+        current_time += service_times[node]
+        previous = node
+
+    # Backward pass: start earlier stops later so no wait exceeds the cap
+    if depart_at is None:
+        for position in range(len(route) - 2, -1, -1):
+            node, next_node = route[position], route[position + 1]
+            latest_gap = MAX_WAITING_MINUTES + service_times[node] + int(travel[node][next_node])
+            arrivals[position] = max(arrivals[position], arrivals[position + 1] - latest_gap)
+
+    if any(arrival > time_windows[node][1] for node, arrival in zip(route, arrivals)):
+        return None
+
+    if depart_at is None:
+        departure = arrivals[0] - int(travel[vehicle_node][route[0]])
+        day_end = arrivals[-1] + service_times[route[-1]] + int(travel[route[-1]][vehicle_node])
+        if day_end > shift_end or day_end - departure > data.get('max_route_minutes', MAX_ROUTE_MINUTES):
+            return None
+    return arrivals
+
+def route_travel_minutes(data, vehicle_node, route):
+    """Total travel minutes of a route, including the trip home"""
+    travel = data['distance_matrix']
+    total = 0
+    previous = vehicle_node
+    for node in route:
+        total += int(travel[previous][node])
+        previous = node
+    if route:
+        total += int(travel[previous][vehicle_node])
+    return total
+
+def best_insertion(data, vehicle_node, route, node):
+    """Cheapest feasible position for node in route; returns (added_minutes, position) or None"""
+    allowed_vehicles = data.get('allowed_vehicles')
+    if allowed_vehicles and allowed_vehicles[node] is not None and vehicle_node not in allowed_vehicles[node]:
+        return None
+
+    travel = data['distance_matrix']
+    stops = [vehicle_node] + list(route) + [vehicle_node]
+    candidates = []
+    for position in range(len(route) + 1):
+        before, after = stops[position], stops[position + 1]
+        added = int(travel[before][node]) + int(travel[node][after]) - int(travel[before][after])
+        candidates.append((added, position))
+
+    # Check feasibility only in order of increasing cost
+    for added, position in sorted(candidates):
+        if schedule_route(data, vehicle_node, route[:position] + [node] + route[position:]) is not None:
+            return added, position
+    return None
+
+def removal_gain(data, vehicle_node, route, position):
+    """Travel minutes saved by removing the stop at position from route"""
+    travel = data['distance_matrix']
+    stops = [vehicle_node] + list(route) + [vehicle_node]
+    before, node, after = stops[position], stops[position + 1], stops[position + 2]
+    return int(travel[before][node]) + int(travel[node][after]) - int(travel[before][after])
@@ -0,0 +1,108 @@
+"""Search monitoring for OR-Tools routing solves.
+
+SearchTracker records the best objective over time through an at-solution
+callback and, through a custom search limit, stops the search once the
+objective has not improved by plateau_percent within plateau_seconds, or
+when should_stop() says so. Improvements can be forwarded to a callback,
+at most once per improvement_interval seconds, and their objective alone
+to another callback every time.
+"""
+import time
+
+# How often the custom limit asks should_stop(), in seconds
+STOP_CHECK_INTERVAL = 0.25
+
+class SearchTracker:
+    """Objective trajectory, improvement reporting and early stopping for one routing model"""
+
+    def __init__(self, routing, plateau_percent=None, plateau_seconds=None, on_improvement=None,
+                 improvement_interval=0.5, should_stop=None, on_objective=None):
+        self.routing = routing
+        self.plateau_percent = plateau_percent
+        self.plateau_seconds = plateau_seconds
+        self.on_improvement = on_improvement
+        self.improvement_interval = improvement_interval
+        self.should_stop = should_stop
+        self.on_objective = on_objective
+        self.trajectory = []
+        self.solutions = 0
+        self.plateau_reached = False
+        self.stop_requested = False
+        self._start = None
+        self._best = None
+        self._reference = None
+        self._reference_time = None
+        self._last_reported = None
+        self._last_stop_check = 0.0
+
+    def attach(self):
+        """Register the callbacks; call before solving"""
+        self.routing.AddAtSolutionCallback(self._on_solution)
+        if self.plateau_seconds or self.should_stop:
+            self.routing.AddSearchMonitor(self.routing.solver().CustomLimit(self._limit))
+        self._start = time.perf_counter()
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def _on_solution(self):
+        self.solutions += 1
+        objective = self.routing.CostVar().Max()
+        if self._best is not None and objective >= self._best:
+            return
+
+        now = self.elapsed()
+        self._best = objective
+        self.trajectory.append([round(now, 3), objective])
+
+        # Restart the plateau clock only on a large enough improvement
+        threshold = 1 - (self.plateau_percent or 0) / 100.0
+        if self._reference is None or objective <= self._reference * threshold:
+            self._reference = objective
+            self._reference_time = now
+
+        if self.on_objective:
+            try:
+                self.on_objective(objective)
+            except Exception as e:
+                print(f"Error reporting improved objective: {e}")
+
+        if self.on_improvement and (self._last_reported is None
+                                    or now - self._last_reported >= self.improvement_interval):
+            self._last_reported = now
+            try:
+                self.on_improvement(objective)
+            except Exception as e:
+                print(f"Error reporting improved solution: {e}")
+
+    def _limit(self):
+        # Polled very often by the solver, so keep it cheap
+        now = self.elapsed()
+        if self.plateau_seconds and self._reference_time is not None \
+                and now - self._reference_time >= self.plateau_seconds:
+            self.plateau_reached = True
+            return True
+
+        if self.should_stop and now - self._last_stop_check >= STOP_CHECK_INTERVAL:
+            self._last_stop_check = now
+            try:
+                self.stop_requested = bool(self.should_stop())
+            except Exception as e:
+                print(f"Error checking whether to stop the search: {e}")
+        return self.stop_requested
+
+    def stop_reason(self, search_parameters):
+        """Why the search ended: cancelled, plateau, solution_limit, time_limit, local_optimum or no_solution"""
+        if not self.solutions:
+            return "no_solution"
+        if self.stop_requested:
+            return "cancelled"
+        if self.plateau_reached:
+            return "plateau"
+        solution_limit = search_parameters.solution_limit
+        if solution_limit and self.solutions >= solution_limit:
+            return "solution_limit"
+        time_limit = search_parameters.time_limit.ToTimedelta().total_seconds()
+        if time_limit and self.elapsed() >= time_limit * 0.98:
+            return "time_limit"
+        return "local_optimum"
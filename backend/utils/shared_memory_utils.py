@@ -0,0 +1,101 @@
+"""Travel-time matrices shared with worker processes without copying.
+
+The process that creates a SharedMatrix owns its storage: a named
+shared-memory segment, or a memory-mapped file in ROUTING_SHARED_MATRIX_DIR
+when that is set (e.g. where /dev/shm is small). Workers attach to it by
+its handle and get a read-only view. Only the owner unlinks the storage, on
+close or at exit, so a worker that crashes cannot leak it or pull it from
+under the others.
+"""
+import atexit
+import os
+import uuid
+import numpy as np
+from multiprocessing import shared_memory
+
+# Storage created by this process and not yet unlinked, by handle
+_owned = {}
+
+def _unlink_owned():
+    for shared in list(_owned.values()):
+        shared.close()
+
+atexit.register(_unlink_owned)
+
+class SharedMatrix:
+    """A numpy matrix in storage that other processes can map by name.
+
+    Use create() in the owning process (as a context manager, so the storage
+    is unlinked when the work is done) and pass `handle` to workers, which
+    call attach(handle).
+    """
+
+    def __init__(self, handle, array, storage, owner):
+        self.handle = handle
+        self.array = array
+        self._storage = storage
+        self._owner = owner
+
+    @classmethod
+    def create(cls, matrix, directory=None):
+        """Copy matrix into new shared storage owned by this process"""
+        matrix = np.ascontiguousarray(matrix)
+        directory = directory or os.environ.get('ROUTING_SHARED_MATRIX_DIR')
+        if directory:
+            path = os.path.join(directory, f"routing-matrix-{uuid.uuid4().hex}.npy")
+            array = np.lib.format.open_memmap(path, mode='w+', dtype=matrix.dtype, shape=matrix.shape)
+            array[:] = matrix
+            array.flush()
+            handle, storage = ("file", path, matrix.shape, matrix.dtype.str), path
+        else:
+            # Zero-size segments are not allowed
+            segment = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+            array = np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=segment.buf)
+            array[:] = matrix
+            handle, storage = ("shm", segment.name, matrix.shape, matrix.dtype.str), segment
+
+        shared = cls(handle, array, storage, owner=True)
+        _owned[handle] = shared
+        return shared
+
+    @classmethod
+    def attach(cls, handle):
+        """Read-only view of the shared storage another process created"""
+        kind, name, shape, dtype = handle
+        if kind == "file":
+            array = np.load(name, mmap_mode='r')
+            storage = None
+        else:
+            storage = shared_memory.SharedMemory(name=name)
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=storage.buf)
+            array.setflags(write=False)
+        return cls(handle, array, storage, owner=False)
+
+    def close(self):
+        """Drop this process's mapping, and unlink the storage if this process owns it"""
+        self.array = None
+        storage, self._storage = self._storage, None
+        if isinstance(storage, shared_memory.SharedMemory):
+            try:
+                storage.close()
+            except BufferError:
+                # Views of the matrix are still alive; the mapping goes with them
+                pass
+            if self._owner:
+                try:
+                    storage.unlink()
+                except FileNotFoundError:
+                    pass
+        elif storage is not None and self._owner:
+            try:
+                os.remove(storage)
+            except FileNotFoundError:
+                pass
+        if self._owner:
+            _owned.pop(self.handle, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
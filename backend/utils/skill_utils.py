@@ -0,0 +1,39 @@
+"""Skill index mapping job requirements to the technicians qualified for them.
+
+Technician sets are kept as integer bitsets (bit i set = technician i has the
+skill), so a job's eligible technicians are the AND of the bitsets of its
+required skills.
+"""
+
+def build_skill_index(technicians):
+    """Map each skill to the bitset of technicians that have it"""
+    index = {}
+    for tech_idx, tech in enumerate(technicians):
+        for skill in tech.get('skills') or []:
+            index[skill] = index.get(skill, 0) | (1 << tech_idx)
+    return index
+
+def required_skills(job, skill_index):
+    """Skills a job needs: its explicit required_skills, else its service_type if some technician lists it"""
+    if job.get('required_skills'):
+        return tuple(sorted(set(job['required_skills'])))
+    service_type = job.get('service_type')
+    if service_type in skill_index:
+        return (service_type,)
+    return ()
+
+def eligible_bitset(skills, skill_index, num_technicians):
+    """Bitset of technicians that have all the given skills"""
+    bitset = (1 << num_technicians) - 1
+    for skill in skills:
+        bitset &= skill_index.get(skill, 0)
+    return bitset
+
+def bitset_members(bitset):
+    """Indices of the set bits, in increasing order"""
+    members = []
+    while bitset:
+        low_bit = bitset & -bitset
+        members.append(low_bit.bit_length() - 1)
+        bitset ^= low_bit
+    return members
@@ -262,10 +262,30 @@ class DemoSetup:
                 "consider_weather": False
             }, headers=headers)
             
-            if response.status_code == 200:
-                result = response.json()
-                print(f"  ✅ Route optimization completed")
-                print(f"  📊 Optimized routes for {len(result.get('routes', []))} technicians")
+            if response.status_code == 202:
+                optimization_id = response.json()["optimization_id"]
+                print(f"  ⏳ Route optimization queued: {optimization_id}")
+                
+                # The solve runs on a background worker; poll until it finishes
+                status = {}
+                deadline = time.time() + 120
+                while time.time() < deadline:
+                    status = requests.get(f"{API_BASE}/routing/optimizations/{optimization_id}",
+                                          headers=headers).json()
+                    if status.get("status") in ("completed", "failed", "cancelled"):
+                        break
+                    print(f"  … {status.get('phase', 'queued')} ({status.get('progress', 0):.0%})")
+                    time.sleep(1)
+                
+                response = requests.get(f"{API_BASE}/routing/optimizations/{optimization_id}/result",
+                                        headers=headers)
+                if response.status_code == 200:
+                    result = response.json()
+                    print("  ✅ Route optimization completed")
+                    print(f"  📊 Optimized routes for {len(result.get('optimized_routes', []))} technicians")
+                else:
+                    print(f"❌ Route optimization {status.get('status', 'did not finish')}: "
+                          f"{response.json().get('message', response.status_code)}")
             else:
                 print(f"❌ Route optimization failed: {response.status_code}")
         except Exception as e: